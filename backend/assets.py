@@ -0,0 +1,108 @@
+"""
+Content-addressed asset index
+Photos are stored once per SHA-256 (see photos.py); this index records which
+owners (saved sites) reference each hash. References are only written by
+SiteStore, in the same database and transaction as the site. Reference counts are derived from
+the reference rows, so re-saving a site or retrying a request never makes
+them drift. Assets nobody references are collected after a grace period that
+leaves time for a fresh upload to be attached to a site.
+"""
+
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    hash TEXT PRIMARY KEY,
+    bytes INTEGER NOT NULL,
+    uploads INTEGER NOT NULL DEFAULT 1,
+    last_upload REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS asset_refs (
+    owner TEXT NOT NULL,
+    hash TEXT NOT NULL REFERENCES assets(hash),
+    PRIMARY KEY (owner, hash)
+);
+CREATE INDEX IF NOT EXISTS asset_refs_by_hash ON asset_refs(hash);
+"""
+
+
+def replace_refs(db, owner, hashes):
+    """Make `owner` reference exactly the known `hashes`; returns the unknown ones
+
+    Runs inside the caller's transaction on `db`, a connection to the index
+    database: saved sites write their references with the site itself.
+    """
+    hashes = set(hashes)
+    known = {row[0] for row in db.execute(
+        f"SELECT hash FROM assets WHERE hash IN ({','.join('?' * len(hashes))})", tuple(hashes)
+    )} if hashes else set()
+    db.execute("DELETE FROM asset_refs WHERE owner = ?", (owner,))
+    db.executemany("INSERT INTO asset_refs (owner, hash) VALUES (?, ?)", [(owner, digest) for digest in known])
+    return sorted(hashes - known)
+
+
+def release_refs(db, owner):
+    """Drop every reference held by `owner`, inside the caller's transaction on `db`"""
+    db.execute("DELETE FROM asset_refs WHERE owner = ?", (owner,))
+
+
+class AssetIndex:
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def record_upload(self, digest, size):
+        """Register an upload; a known hash only gets its counters bumped"""
+        self.db.execute(
+            "INSERT INTO assets (hash, bytes, last_upload) VALUES (?, ?, ?) "
+            "ON CONFLICT(hash) DO UPDATE SET uploads = uploads + 1, last_upload = excluded.last_upload",
+            (digest, size, self.clock())
+        )
+
+    def refcount(self, digest):
+        return self.db.execute("SELECT COUNT(*) FROM asset_refs WHERE hash = ?", (digest,)).fetchone()[0]
+
+    def collect(self, grace_seconds):
+        """Forget unreferenced assets older than the grace period
+
+        Returns the collected hashes; the caller deletes their files. The
+        delete re-checks the references, so nothing referenced in between
+        is lost.
+        """
+        cutoff = self.clock() - grace_seconds
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            candidates = [row[0] for row in self.db.execute(
+                "SELECT hash FROM assets WHERE last_upload < ? "
+                "AND NOT EXISTS (SELECT 1 FROM asset_refs WHERE asset_refs.hash = assets.hash)",
+                (cutoff,)
+            )]
+            self.db.executemany("DELETE FROM assets WHERE hash = ?", [(digest,) for digest in candidates])
+        return candidates
+
+    def stats(self):
+        assets, stored_bytes, uploads, uploaded_bytes = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0), COALESCE(SUM(uploads), 0), "
+            "COALESCE(SUM(bytes * uploads), 0) FROM assets"
+        ).fetchone()
+        referenced, references = self.db.execute(
+            "SELECT COUNT(DISTINCT hash), COUNT(*) FROM asset_refs"
+        ).fetchone()
+        return {
+            "assets": assets,
+            "stored_bytes": stored_bytes,
+            "uploads": uploads,
+            "deduplicated_bytes": uploaded_bytes - stored_bytes,
+            "referenced_assets": referenced,
+            "unreferenced_assets": assets - referenced,
+            "references": references
+        }
@@ -0,0 +1,298 @@
+"""
+Batch rendering
+Agencies onboard many businesses at once: a batch is a stream of render
+requests, as NDJSON (one {"templateId", "websiteData"} object per line) or CSV
+(one site per row, websiteData fields as columns). The body is spooled to a
+temporary file as it arrives, then parsed row by row; sites are rendered in
+a process pool and each finished site is written back as one NDJSON line, in
+completion order. At most `max_in_flight` sites are between parsing and
+being written out, so a 10,000-row import takes the same memory as a 10-row
+one, and a client that reads slowly slows the import down instead of piling
+up results.
+"""
+
+import asyncio
+import csv
+import json
+import tempfile
+
+from renderer import SiteRenderer
+
+# Longer lines (or CSV records) are answered with an error row and skipped
+MAX_LINE_BYTES = 1024 * 1024
+
+# CSV columns that are not websiteData fields of the same name
+CSV_LIST_SEPARATOR = "|"
+SOCIAL_COLUMNS = ("facebook", "instagram", "linkedin", "twitter")
+REQUEST_COLUMNS = ("templateId",)
+
+
+class BatchError(ValueError):
+    """Batch rejected before any row is rendered; `status` is the HTTP status to answer with"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+async def spool(chunks, max_bytes):
+    """The request body in an anonymous temporary file, rewound
+
+    Results only start once the upload is complete: most clients send their
+    whole body before reading the response, and would stall against a
+    server waiting for them to read results before accepting more rows.
+    """
+    f = tempfile.TemporaryFile()
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise BatchError(413, f"Batch larger than {max_bytes // (1024 * 1024)} MB")
+            f.write(chunk)
+        if size == 0:
+            raise BatchError(400, "Empty batch")
+    except BaseException:
+        f.close()
+        raise
+    f.seek(0)
+    return f
+
+
+async def file_chunks(f, chunk_size=64 * 1024):
+    """Chunks of a spooled body; closes the file when done"""
+    with f:
+        while True:
+            # Disk reads stay off the event loop
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def read_lines(chunks, max_bytes=MAX_LINE_BYTES):
+    """Lines of a streamed body without their line ending; None for an over-long line"""
+    buffer = bytearray()
+    oversized = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            if not oversized:
+                buffer += chunk[start:end]
+            yield None if oversized or len(buffer) > max_bytes else bytes(buffer).rstrip(b"\r")
+            buffer.clear()
+            oversized = False
+            start = end + 1
+        if not oversized:
+            buffer += chunk[start:]
+            if len(buffer) > max_bytes:
+                oversized = True
+                buffer.clear()
+    if oversized:
+        yield None
+    elif buffer.strip():
+        yield bytes(buffer).rstrip(b"\r")
+
+
+async def ndjson_records(lines):
+    """(request, None) per non-blank line, (None, error) when it is not a JSON object"""
+    async for line in lines:
+        if line is None:
+            yield None, f"Line longer than {MAX_LINE_BYTES} bytes"
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield None, f"Invalid JSON: {error}"
+            continue
+        yield (record, None) if isinstance(record, dict) else (None, "Expected a JSON object")
+
+
+def csv_request(row):
+    """Render request of one CSV row
+
+    Columns are templateId, the websiteData fields, and
+    facebook/instagram/linkedin/twitter; selectedPages are separated by |.
+    Empty cells keep the field's default.
+    """
+    data = {column: value for column, value in row.items()
+            if value and column not in REQUEST_COLUMNS + SOCIAL_COLUMNS}
+    if "selectedPages" in data:
+        data["selectedPages"] = [page.strip() for page in data["selectedPages"].split(CSV_LIST_SEPARATOR) if page.strip()]
+    data["socialMedia"] = {column: row.get(column) or "" for column in SOCIAL_COLUMNS}
+    return {"templateId": row.get("templateId") or "", "websiteData": data}
+
+
+async def csv_records(lines):
+    """(request, None) per data row, (None, error) for rows that cannot be read
+
+    The header row names the columns; "," or ";" (spreadsheet exports in
+    French locales) is picked from it. Quoted cells may span lines.
+    """
+    header = None
+    delimiter = ","
+    pending = None
+    async for line in lines:
+        if line is None:
+            pending = None
+            yield None, f"Line longer than {MAX_LINE_BYTES} bytes"
+            continue
+        try:
+            text = line.decode("utf-8-sig" if header is None and pending is None else "utf-8")
+        except UnicodeDecodeError:
+            pending = None
+            yield None, "Row is not valid UTF-8"
+            continue
+        pending = text if pending is None else f"{pending}\n{text}"
+        # An odd number of quotes: a quoted cell continues on the next line
+        if pending.count('"') % 2:
+            if len(pending) > MAX_LINE_BYTES:
+                pending = None
+                yield None, f"Row longer than {MAX_LINE_BYTES} bytes"
+            continue
+        record, pending = pending, None
+        if not record.strip():
+            continue
+        if header is None:
+            delimiter = ";" if record.count(";") > record.count(",") else ","
+            header = [column.strip() for column in next(csv.reader([record], delimiter=delimiter))]
+            continue
+        values = next(csv.reader([record], delimiter=delimiter))
+        if len(values) > len(header):
+            yield None, f"{len(values)} cells for {len(header)} columns"
+            continue
+        yield csv_request(dict(zip(header, values))), None
+    if pending is not None:
+        yield None, "Unterminated quoted cell"
+
+
+def json_line(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+# One renderer per worker process, with its own fragment cache
+worker_renderer = None
+
+
+def render_line(row, template_id, data):
+    """NDJSON line of one rendered site; runs in a worker process"""
+    global worker_renderer
+    if worker_renderer is None:
+        worker_renderer = SiteRenderer()
+    return json_line(dict(
+        row=row,
+        templateId=template_id,
+        businessName=data["businessName"],
+        theme=worker_renderer.theme(template_id, data),
+        pages=worker_renderer.render_site(template_id, data)
+    ))
+
+
+def with_id(line, site_id):
+    """`line` with the id of the saved site as its first field"""
+    return b'{"id":' + json.dumps(site_id).encode("utf-8") + b"," + line[1:]
+
+
+class BatchRenderer:
+    def __init__(self, executor, workers, max_in_flight=64):
+        self.executor = executor
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.batches = 0
+        self.active = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.rendered = 0
+        self.errors = 0
+
+    async def render_row(self, row, template_id, data, save):
+        """(rendered, NDJSON line) of one site: rendered in the pool, then saved"""
+        try:
+            line = await asyncio.get_running_loop().run_in_executor(self.executor, render_line, row, template_id, data)
+        except Exception as error:
+            return False, json_line({"row": row, "error": f"Rendering failed: {error}"})
+        if save:
+            # Only rendered sites are stored. SQLite writes block, so they
+            # run in a thread; a failed save is that row's error
+            try:
+                line = with_id(line, await asyncio.to_thread(save, template_id, data))
+            except Exception as failure:
+                return False, json_line({"row": row, "error": f"Saving failed: {failure}"})
+        return True, line
+
+    async def render(self, records, validate, save=None):
+        """NDJSON lines of the rendered sites as they complete, then a summary line
+
+        `records` yields (request, error) pairs; `validate(request)` returns
+        (template_id, data) or raises ValueError. With `save`, each site that
+        rendered is then stored and its line carries the id. Rows are numbered
+        from 1 in input order; errors are reported on their row and do not
+        stop the batch.
+        """
+        pending = set()
+        rendered = errors = 0
+        self.batches += 1
+        self.active += 1
+
+        def finished(done):
+            nonlocal rendered, errors
+            for task in done:
+                pending.discard(task)
+                self.in_flight -= 1
+                ok, line = task.result()
+                if ok:
+                    rendered += 1
+                else:
+                    errors += 1
+                yield line
+
+        try:
+            row = 0
+            async for request, error in records:
+                row += 1
+                if error is None:
+                    try:
+                        template_id, data = validate(request)
+                    except ValueError as invalid:
+                        error = str(invalid)
+                if error is not None:
+                    errors += 1
+                    yield json_line({"row": row, "error": error})
+                    continue
+                pending.add(asyncio.create_task(self.render_row(row, template_id, data, save)))
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                # Reading stops while the window is full
+                if len(pending) >= self.max_in_flight:
+                    await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for line in finished([task for task in pending if task.done()]):
+                    yield line
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for line in finished(done):
+                    yield line
+            yield json_line({"done": True, "rows": row, "rendered": rendered, "errors": errors})
+        finally:
+            # Client gone: drop what has not started yet
+            for task in pending:
+                task.cancel()
+            self.in_flight -= len(pending)
+            self.rendered += rendered
+            self.errors += errors
+            self.active -= 1
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_in_flight": self.max_in_flight,
+            "batches": self.batches,
+            "active_batches": self.active,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "rendered": self.rendered,
+            "errors": self.errors
+        }
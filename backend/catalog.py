@@ -0,0 +1,116 @@
+"""
+Template catalog
+Template metadata and one preview thumbnail per template and site type are
+generated offline into catalog/ (python catalog.py) and committed, so adding
+a template touches renderer.TEMPLATES, not index.html. The API serves them
+from memory with strong ETags: thumbnail URLs carry a content hash and are
+cached for a year, the catalog itself is revalidated hourly.
+
+The frontend falls back to the same files served statically when the API is
+unreachable, so paths inside catalog.json are relative to it.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from html import escape
+
+from renderer import SERVICES_BY_TYPE, SITE_TYPES, TEMPLATES
+
+CATALOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog")
+
+THUMBNAIL_WIDTH = 240
+THUMBNAIL_HEIGHT = 150
+
+THUMBNAIL = """<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 240 150">
+<defs><linearGradient id="theme" x1="0" y1="0" x2="1" y2="1"><stop offset="0" stop-color="{primary}"/><stop offset="1" stop-color="{secondary}"/></linearGradient></defs>
+<rect width="240" height="150" fill="#ffffff"/>
+<rect width="240" height="22" fill="url(#theme)"/>
+<rect x="10" y="8" width="54" height="6" rx="3" fill="#ffffff" opacity="0.95"/>
+<g fill="#ffffff" opacity="0.75"><rect x="146" y="9" width="18" height="4" rx="2"/><rect x="170" y="9" width="18" height="4" rx="2"/><rect x="194" y="9" width="18" height="4" rx="2"/><rect x="218" y="9" width="12" height="4" rx="2"/></g>
+<rect y="22" width="240" height="60" fill="#f8fafc"/>
+<text x="120" y="46" text-anchor="middle" font-family="Arial, sans-serif" font-size="12" font-weight="bold" fill="#1f2937">{label}</text>
+<text x="120" y="58" text-anchor="middle" font-family="Arial, sans-serif" font-size="7" fill="#6b7280">{name}</text>
+<rect x="95" y="64" width="50" height="10" rx="3" fill="{primary}"/>
+{services}
+<rect y="138" width="240" height="12" fill="#1f2937"/>
+</svg>
+"""
+
+SERVICE_CARD = """<g transform="translate({x} 88)"><rect width="68" height="42" rx="4" fill="#ffffff" stroke="#e5e7eb"/><text x="34" y="18" text-anchor="middle" font-size="12">{icon}</text><rect x="12" y="26" width="44" height="4" rx="2" fill="#374151"/><rect x="18" y="33" width="32" height="3" rx="1.5" fill="#9ca3af"/></g>"""
+
+
+def render_thumbnail(template, site_type):
+    """Schematic preview of the accueil page: themed header, hero, services, footer"""
+    services = SERVICES_BY_TYPE.get(site_type, SERVICES_BY_TYPE["default"])
+    cards = "".join(SERVICE_CARD.format(x=10 + number * 78, icon=service["icon"])
+                    for number, service in enumerate(services[:3]))
+    return THUMBNAIL.format(
+        width=THUMBNAIL_WIDTH,
+        height=THUMBNAIL_HEIGHT,
+        primary=template["colors"]["primary"],
+        secondary=template["colors"]["secondary"],
+        label=escape(SITE_TYPES[site_type].split(" ", 1)[1]),
+        name=escape(template["name"]),
+        services=cards
+    )
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def build_catalog(out_dir=CATALOG_DIR):
+    """Write catalog.json and thumbnails/{template}/{site type}.svg"""
+    templates = []
+    for template in TEMPLATES:
+        folder = os.path.join(out_dir, "thumbnails", template["id"])
+        os.makedirs(folder, exist_ok=True)
+        thumbnails = {}
+        for site_type in SITE_TYPES:
+            svg = render_thumbnail(template, site_type).encode("utf-8")
+            with open(os.path.join(folder, f"{site_type}.svg"), "wb") as f:
+                f.write(svg)
+            thumbnails[site_type] = f"thumbnails/{template['id']}/{site_type}.svg?v={content_hash(svg)[:12]}"
+        templates.append(dict(template, thumbnails=thumbnails))
+    catalog = {
+        "thumbnailSize": {"width": THUMBNAIL_WIDTH, "height": THUMBNAIL_HEIGHT},
+        "siteTypes": SITE_TYPES,
+        "templates": templates
+    }
+    with open(os.path.join(out_dir, "catalog.json"), "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False, separators=(",", ":"))
+        f.write("\n")
+    return catalog
+
+
+class TemplateCatalog:
+    """The built catalog, held in memory as (bytes, ETag) per file"""
+    def __init__(self, directory=CATALOG_DIR):
+        with open(os.path.join(directory, "catalog.json"), "rb") as f:
+            self.catalog = self.entry(f.read())
+        self.thumbnails = {}
+        for template in json.loads(self.catalog[0])["templates"]:
+            for site_type, url in template["thumbnails"].items():
+                with open(os.path.join(directory, url.split("?")[0]), "rb") as f:
+                    self.thumbnails[template["id"], site_type] = self.entry(f.read())
+
+    @staticmethod
+    def entry(data):
+        return data, f'"{content_hash(data)[:32]}"'
+
+    def thumbnail(self, template_id, site_type):
+        return self.thumbnails.get((template_id, site_type))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the template catalog and its thumbnails")
+    parser.add_argument("--out", default=CATALOG_DIR)
+    args = parser.parse_args(argv)
+    catalog = build_catalog(args.out)
+    print(f"{len(catalog['templates'])} templates x {len(catalog['siteTypes'])} site types written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
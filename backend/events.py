@@ -0,0 +1,142 @@
+"""
+Server-sent events
+Assistant answers are streamed as text/event-stream: the reply word by word
+as soon as the intent is known, then image results when the search returns.
+There is one short stream per message, so idle widgets hold no connection.
+Open streams are capped globally and per client; while waiting on upstream
+a comment line goes out every `heartbeat` seconds, so proxies keep the
+stream open and a client that left is noticed. A client that stops reading
+is dropped once one write stays blocked for `send_timeout` seconds, instead
+of holding the stream and its slot.
+"""
+
+import asyncio
+import json
+import re
+
+from fastapi.responses import StreamingResponse
+
+HEARTBEAT = b": ping\n\n"
+# Tags stay whole, so the text received so far is always valid HTML
+REPLY_TOKEN = re.compile(r"<[^>]*>|[^<\s]+\s*|\s+")
+
+
+class StreamLimitError(ValueError):
+    """Stream refused; `status` is the HTTP status to answer with"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def event(name, data):
+    """One SSE frame with a JSON payload"""
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+def reply_tokens(reply):
+    """Words of an HTML reply with their trailing space, tags as single tokens"""
+    return REPLY_TOKEN.findall(reply)
+
+
+class StreamLimiter:
+    def __init__(self, max_streams=1000, per_client=4):
+        self.max_streams = max_streams
+        self.per_client = per_client
+        self.clients = {}
+        self.open = 0
+        self.peak = 0
+        self.opened = 0
+        self.rejected = 0
+        self.stalled = 0
+
+    def acquire(self, client):
+        """Take a slot for `client`; raises StreamLimitError when none is left"""
+        if self.open >= self.max_streams:
+            self.rejected += 1
+            raise StreamLimitError(503, "Too many open assistant streams, retry shortly")
+        if self.clients.get(client, 0) >= self.per_client:
+            self.rejected += 1
+            raise StreamLimitError(429, f"At most {self.per_client} assistant streams per client")
+        self.clients[client] = self.clients.get(client, 0) + 1
+        self.open += 1
+        self.opened += 1
+        self.peak = max(self.peak, self.open)
+
+    def release(self, client):
+        self.open -= 1
+        if self.clients[client] <= 1:
+            del self.clients[client]
+        else:
+            self.clients[client] -= 1
+
+    def stats(self):
+        return {
+            "max_streams": self.max_streams,
+            "per_client": self.per_client,
+            "open": self.open,
+            "peak": self.peak,
+            "clients": len(self.clients),
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "stalled": self.stalled
+        }
+
+
+async def with_heartbeats(frames, interval):
+    """Frames of `frames`, plus a heartbeat whenever none comes for `interval` seconds"""
+    frames = frames.__aiter__()
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(frames.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=interval)
+            if not done:
+                yield HEARTBEAT
+                continue
+            pending = None
+            try:
+                frame = done.pop().result()
+            except StopAsyncIteration:
+                return
+            yield frame
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        await frames.aclose()
+
+
+class EventStreamResponse(StreamingResponse):
+    """Stream holding a StreamLimiter slot until it ends, however it ends"""
+    media_type = "text/event-stream"
+
+    def __init__(self, content, limiter, client, send_timeout=10):
+        # No proxy buffering: each frame is useful as soon as it is written
+        super().__init__(content, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        self.limiter = limiter
+        self.client = client
+        self.send_timeout = send_timeout
+
+    async def stream_response(self, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        try:
+            async for chunk in self.body_iterator:
+                # The server waits for the socket to drain: a client that
+                # does not read blocks the write here
+                try:
+                    await asyncio.wait_for(send({"type": "http.response.body", "body": chunk, "more_body": True}),
+                                           self.send_timeout)
+                except asyncio.TimeoutError:
+                    # The response is left incomplete: the server closes the connection
+                    self.limiter.stalled += 1
+                    return
+        finally:
+            await self.body_iterator.aclose()
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.limiter.release(self.client)
@@ -0,0 +1,131 @@
+"""
+Streaming ZIP export of a saved site
+The archive is written to a small buffer that is drained after every entry
+(and every chunk of large files), so memory stays flat whatever the size of
+the site. zipfile switches to data descriptors on a non-seekable output, so
+no entry has to be held back to patch its header. Inline styles are hoisted
+into the shared stylesheet, written after the pages that use it; pages and
+stylesheet are minified and come with gzip and Brotli variants, for hosts
+that serve precompressed files.
+"""
+
+import os
+import re
+import time
+import unicodedata
+import zipfile
+
+from minify import ENCODINGS, minify_css, minify_html, precompressed
+from photos import default_variant
+from stylesheet import SharedStylesheet
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DrainableBuffer:
+    """Write-only, non-seekable sink for zipfile"""
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Pending bytes as a list of at most one chunk, for `yield from`"""
+        if not self.chunks:
+            return []
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return [data]
+
+
+def slugify(name):
+    """'Restaurant Le Gourmet' -> 'restaurant-le-gourmet', for the archive name"""
+    folded = unicodedata.normalize("NFKD", name.casefold())
+    folded = "".join(char for char in folded if not unicodedata.combining(char))
+    return re.sub(r"[^a-z0-9]+", "-", folded).strip("-") or "site"
+
+
+def export_photos(data, photos):
+    """Point uploaded photos at files inside the archive
+
+    Returns the rewritten websiteData and (archive name, path) for every
+    variant of those photos. Photos only held as data URLs stay inline.
+    """
+    files = []
+    exported = []
+    for photo in data.get("photos", []):
+        manifest = photos.manifest(photo["id"]) if photo.get("id") else None
+        if manifest is None:
+            exported.append(photo)
+            continue
+        folder = f"images/{photo['id'][:16]}"
+        directory = photos.photo_dir(photo["id"])
+        files.extend((f"{folder}/{variant['file']}", os.path.join(directory, variant["file"]))
+                     for variant in manifest["variants"])
+        exported.append(dict(photo, url=f"{folder}/{default_variant(manifest)['file']}"))
+    return dict(data, photos=exported), files
+
+
+def stream_site_zip(renderer, photos, site):
+    """Yield the ZIP of a saved site: its pages, stylesheet and images"""
+    data, image_files = export_photos(site["websiteData"], photos)
+    date_time = time.localtime()[:6]
+    buffer = DrainableBuffer()
+    styles = SharedStylesheet(renderer.stylesheet)
+
+    def entry(name, compress):
+        info = zipfile.ZipInfo(name, date_time=date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        return archive.open(info, "w")
+
+    def text_file(name, text):
+        """The file, deflated, then its precompressed variants, stored"""
+        encoded = text.encode("utf-8")
+        with entry(name, compress=True) as f:
+            f.write(encoded)
+        for suffix, compressed in precompressed(encoded).items():
+            with entry(name + suffix, compress=False) as f:
+                f.write(compressed)
+
+    with zipfile.ZipFile(buffer, "w") as archive:
+        # Pages are rendered one at a time, not all up front
+        for name, html in renderer.export_documents(site["templateId"], data, styles=styles):
+            text_file(name, minify_html(html))
+            yield from buffer.drain()
+
+        text_file("styles.css", minify_css(styles.stylesheet()))
+        yield from buffer.drain()
+
+        # WebP/JPEG are already compressed: stored as-is, copied in chunks
+        for name, path in image_files:
+            with entry(name, compress=False) as f, open(path, "rb") as source:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    f.write(chunk)
+                    yield from buffer.drain()
+    yield from buffer.drain()
+
+
+def export_sizes(renderer, photos, site):
+    """Bytes of the exported pages and stylesheet: with inline styles, hoisted, then minified
+
+    The minified total is also given as gzip and Brotli, as served from the
+    precompressed variants.
+    """
+    data, _ = export_photos(site["websiteData"], photos)
+    styles = SharedStylesheet(renderer.stylesheet)
+    files = [minify_html(html) for _, html in renderer.export_documents(site["templateId"], data, styles=styles)]
+    files.append(minify_css(styles.stylesheet()))
+    report = styles.report()
+    report["minified"] = {"identity": 0, **{encoding: 0 for encoding in ENCODINGS}}
+    for text in files:
+        encoded = text.encode("utf-8")
+        variants = precompressed(encoded)
+        report["minified"]["identity"] += len(encoded)
+        for encoding, suffix in ENCODINGS.items():
+            report["minified"][encoding] += len(variants[suffix])
+    return report
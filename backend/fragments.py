@@ -0,0 +1,75 @@
+"""
+Fragment cache
+Most of a generated page is the same for every site sharing a few inputs:
+the service cards of a site type, the navigation of a page set, the blog and
+portfolio placeholders. Those fragments are rendered once per distinct input
+and kept in an LRU bounded by the memory they take; pages are assembled from
+them plus the per-site fields.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+
+class FragmentCache:
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        # Exports render from the threadpool, the API from the event loop
+        self.lock = threading.Lock()
+        # kind -> [hits, misses]
+        self.counters = {}
+        self.evictions = 0
+
+    def get(self, kind, key, render):
+        """Fragment `kind` for the inputs `key`, calling `render()` on a miss
+
+        `key` must hold every input the fragment depends on.
+        """
+        with self.lock:
+            counters = self.counters.setdefault(kind, [0, 0])
+            fragment = self.entries.get((kind, key))
+            if fragment is not None:
+                self.entries.move_to_end((kind, key))
+                counters[0] += 1
+                return fragment
+            counters[1] += 1
+        fragment = render()
+        self.store((kind, key), fragment)
+        return fragment
+
+    def store(self, key, fragment):
+        size = sys.getsizeof(fragment)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= sys.getsizeof(previous)
+            self.entries[key] = fragment
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= sys.getsizeof(evicted)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            hits = sum(counters[0] for counters in self.counters.values())
+            misses = sum(counters[1] for counters in self.counters.values())
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": hits,
+                "misses": misses,
+                "evictions": self.evictions,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "kinds": {
+                    kind: {"hits": kind_hits, "misses": kind_misses,
+                           "hit_rate": round(kind_hits / (kind_hits + kind_misses), 4)}
+                    for kind, (kind_hits, kind_misses) in sorted(self.counters.items())
+                }
+            }
@@ -0,0 +1,296 @@
+"""
+Local image library
+A directory of licensed images, described one per line in captions.jsonl
+({"file", "caption", "tags", "author", "license"}), answers /image searches
+before the upstream provider is asked. `python image_library.py` writes a
+thumbnail per image and an inverted index of the captions and tags:
+
+- words are case- and accent-folded, French stop words dropped and the rest
+  reduced by a light French stemmer (terrasses, terrasse -> terrass)
+- each posting holds the BM25 term-frequency part of its score, computed at
+  build time, so a search only adds idf x weight per matching posting
+- the index is one flat file of sorted terms, postings and documents, read
+  through a read-only mmap: every worker process maps the same pages from
+  the page cache instead of loading its own copy
+
+A rebuilt index replaces the file atomically; workers map the new one when
+they restart.
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+import unicodedata
+from array import array
+from operator import itemgetter
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+CAPTIONS = "captions.jsonl"
+INDEX = "index.bin"
+THUMBNAILS = "thumbnails"
+THUMBNAIL_SIZE = (400, 400)
+# The only files of a library directory that are served
+IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".webp", ".gif", ".avif"})
+
+MAGIC = b"WGIX"
+VERSION = 1
+# magic, version, documents, terms, postings, then the offset of each section
+HEADER = struct.Struct("<4sIIII5Q")
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Tags describe the image; the caption is a sentence around them
+TAG_WEIGHT = 2
+
+STOP_WORDS = frozenset("""
+a au aux avec ce ces cet cette d dans de des du en et il elle ils elles je l la le les leur leurs lui ma mais me
+mes mon n ne nos notre nous on ou par pas pour qu que qui s sa se ses son sur t ta te tes ton tu un une vos votre
+vous y
+""".split())
+# Longest first; the stem keeps at least three letters
+SUFFIXES = ("issements", "issement", "atrices", "atrice", "ateurs", "ateur", "ations", "ation", "ements", "ement",
+            "ments", "ment", "euses", "euse", "eurs", "eur", "ieres", "iere", "iers", "ier", "eries", "erie",
+            "istes", "iste", "ismes", "isme", "iques", "ique", "ables", "able", "ances", "ance", "ences", "ence",
+            "ites", "ite", "ives", "ive", "ifs", "if")
+
+
+def fold(text):
+    """Lower case, accents removed"""
+    folded = unicodedata.normalize("NFKD", text.casefold().replace("œ", "oe").replace("æ", "ae"))
+    return "".join(char for char in folded if not unicodedata.combining(char))
+
+
+def stem(word):
+    """Light French stemmer for folded words: plurals, then common derivational suffixes, then a final e"""
+    if len(word) > 5 and word.endswith("aux"):
+        word = word[:-3] + "al"
+    elif len(word) > 3 and word[-1] in "sx" and word[-2] != "s":
+        word = word[:-1]
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    if len(word) > 4 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+def terms(text):
+    """Index terms of a text, in order"""
+    words = "".join(char if char.isalnum() else " " for char in fold(text)).split()
+    return [stem(word) for word in words if word not in STOP_WORDS and len(word) > 1]
+
+
+def document_terms(record):
+    return terms(" ".join(record.get("tags", []))) * TAG_WEIGHT + terms(record.get("caption", ""))
+
+
+def build_index(records, path):
+    """Write the index of `records` (dicts with caption and tags) to `path`
+
+    Each record is stored as is, as the document returned by searches.
+    """
+    frequencies = []
+    postings = {}
+    for number, record in enumerate(records):
+        counts = {}
+        for term in document_terms(record):
+            counts[term] = counts.get(term, 0) + 1
+        frequencies.append(sum(counts.values()))
+        for term, count in counts.items():
+            postings.setdefault(term, []).append((number, count))
+    average_length = sum(frequencies) / len(frequencies) if frequencies else 0.0
+
+    term_blob = bytearray()
+    term_starts = array("I", [0])
+    posting_starts = array("I", [0])
+    posting_docs = array("I")
+    posting_weights = array("f")
+    for term in sorted(postings):
+        term_blob += term.encode("utf-8")
+        term_starts.append(len(term_blob))
+        for number, count in postings[term]:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * frequencies[number] / average_length)
+            posting_docs.append(number)
+            posting_weights.append(count * (BM25_K1 + 1) / (count + norm))
+        posting_starts.append(len(posting_docs))
+
+    doc_blob = bytearray()
+    doc_starts = array("I", [0])
+    for record in records:
+        doc_blob += json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        doc_starts.append(len(doc_blob))
+
+    sections = [term_starts.tobytes(), posting_starts.tobytes(), posting_docs.tobytes(),
+                posting_weights.tobytes(), doc_starts.tobytes(), bytes(term_blob), bytes(doc_blob)]
+    offsets = []
+    position = HEADER.size
+    for section in sections[:5]:
+        offsets.append(position)
+        position += len(section)
+    # The term and document blobs follow, unaligned: only the arrays are cast
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records), len(postings), len(posting_docs), *offsets))
+        for section in sections:
+            f.write(section)
+    os.replace(f.name, path)
+    return {"documents": len(records), "terms": len(postings), "postings": len(posting_docs),
+            "bytes": os.path.getsize(path)}
+
+
+def make_thumbnail(source, out_dir):
+    """Thumbnail of an image, named after its content; returns (file name, (width, height) of the original)"""
+    with open(source, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    name = f"{digest}.jpg"
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        size = image.size
+        target = os.path.join(out_dir, name)
+        if not os.path.exists(target):
+            image.thumbnail(THUMBNAIL_SIZE)
+            image.convert("RGB").save(target, "JPEG", quality=80, optimize=True)
+    return name, size
+
+
+def build_library(directory):
+    """Thumbnails and index of a library directory; returns (index stats, skipped lines)"""
+    records = []
+    skipped = []
+    thumbnails = os.path.join(directory, THUMBNAILS)
+    os.makedirs(thumbnails, exist_ok=True)
+    with open(os.path.join(directory, CAPTIONS), encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                if os.path.splitext(entry["file"])[1].lower() not in IMAGE_EXTENSIONS:
+                    raise ValueError(f"{entry['file']} is not served: use one of {', '.join(sorted(IMAGE_EXTENSIONS))}")
+                source = os.path.join(directory, entry["file"])
+                thumbnail, (width, height) = make_thumbnail(source, thumbnails)
+            except (ValueError, KeyError, TypeError, OSError, UnidentifiedImageError) as error:
+                skipped.append((number, str(error)))
+                continue
+            records.append({
+                "file": entry["file"].replace(os.sep, "/"),
+                "thumb": f"{THUMBNAILS}/{thumbnail}",
+                "width": width,
+                "height": height,
+                "caption": entry.get("caption", ""),
+                "tags": entry.get("tags", []),
+                "author": entry.get("author", ""),
+                "license": entry.get("license", "")
+            })
+    return build_index(records, os.path.join(directory, INDEX)), skipped
+
+
+class ImageLibrary:
+    """Searches over a built index, mapped read-only"""
+    def __init__(self, path, base_url=""):
+        self.base_url = base_url.rstrip("/")
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.documents, self.term_count, self.posting_count, *offsets = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError(f"{path} is not an image library index")
+        view = memoryview(self.map)
+        lengths = (self.term_count + 1, self.term_count + 1, self.posting_count, self.posting_count, self.documents + 1)
+        self.term_starts, self.posting_starts, self.posting_docs, self.posting_weights, self.doc_starts = (
+            view[offset:offset + 4 * length].cast("f" if index == 3 else "I")
+            for index, (offset, length) in enumerate(zip(offsets, lengths))
+        )
+        term_blob = offsets[4] + 4 * lengths[4]
+        self.term_blob = view[term_blob:term_blob + self.term_starts[-1]]
+        self.doc_blob = view[term_blob + self.term_starts[-1]:]
+        self.views = [self.term_starts, self.posting_starts, self.posting_docs, self.posting_weights,
+                      self.doc_starts, self.term_blob, self.doc_blob, view]
+        self.searches = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def open(cls, directory, base_url=""):
+        """The library of `directory`, or None when it has no index yet"""
+        path = os.path.join(directory, INDEX)
+        return cls(path, base_url) if os.path.exists(path) else None
+
+    def close(self):
+        # The map cannot close while views of it exist
+        for view in self.views:
+            view.release()
+        self.map.close()
+
+    def term(self, index):
+        return bytes(self.term_blob[self.term_starts[index]:self.term_starts[index + 1]])
+
+    def find_term(self, term):
+        """Index of a term in the sorted dictionary, or -1"""
+        key = term.encode("utf-8")
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self.term_count and self.term(low) == key else -1
+
+    def document(self, number):
+        return json.loads(bytes(self.doc_blob[self.doc_starts[number]:self.doc_starts[number + 1]]))
+
+    def search(self, query, limit=10):
+        """Best documents for a query by BM25, with url and thumb under base_url; [] on a miss"""
+        self.searches += 1
+        scores = {}
+        for term in set(terms(query)):
+            index = self.find_term(term)
+            if index < 0:
+                continue
+            start, end = self.posting_starts[index], self.posting_starts[index + 1]
+            idf = math.log(1 + (self.documents - (end - start) + 0.5) / (end - start + 0.5))
+            for number, weight in zip(self.posting_docs[start:end], self.posting_weights[start:end]):
+                scores[number] = scores.get(number, 0.0) + idf * weight
+        if not scores:
+            self.misses += 1
+            return []
+        self.hits += 1
+        results = []
+        for number, score in heapq.nlargest(limit, scores.items(), key=itemgetter(1)):
+            document = self.document(number)
+            results.append(dict(document, score=round(score, 4), url=f"{self.base_url}/{document['file']}",
+                                thumb=f"{self.base_url}/{document['thumb']}"))
+        return results
+
+    def stats(self):
+        return {
+            "documents": self.documents,
+            "terms": self.term_count,
+            "postings": self.posting_count,
+            "index_bytes": len(self.map),
+            "searches": self.searches,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index a directory of licensed images described in captions.jsonl")
+    parser.add_argument("--library", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "media", "library"))
+    args = parser.parse_args(argv)
+    stats, skipped = build_library(args.library)
+    for number, error in skipped:
+        print(f"{CAPTIONS} line {number} skipped: {error}")
+    print(f"{stats['documents']} images, {stats['terms']} terms, {stats['postings']} postings: "
+          f"{stats['bytes'] / 1024:.1f} KB index in {args.library}")
+
+
+if __name__ == "__main__":
+    main()
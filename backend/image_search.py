@@ -0,0 +1,106 @@
+"""
+Image search cache
+Normalizes queries so "Restaurant moderne" and "moderne restaurant" share an
+entry, keeps results in an in-process LRU with a TTL, and coalesces
+concurrent misses for the same key into a single upstream call
+"""
+
+import asyncio
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """Case, accents, punctuation, repeated and reordered words -> one key"""
+    folded = unicodedata.normalize("NFKD", query.casefold())
+    folded = "".join(char for char in folded if not unicodedata.combining(char))
+    words = "".join(char if char.isalnum() else " " for char in folded).split()
+    return " ".join(sorted(set(words)))
+
+
+class ImageSearchCache:
+    def __init__(self, max_entries=1024, ttl=3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.upstream_errors = 0
+
+    def lookup(self, key):
+        """Fresh cached value or None; refreshes the LRU position"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= self.clock():
+            del self.entries[key]
+            self.expirations += 1
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def store(self, key, value):
+        self.entries[key] = (self.clock() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key, fetch):
+        """Cached value for `key`, calling `fetch()` at most once per miss
+
+        Returns (value, status) with status "hit", "miss" or "coalesced".
+        Upstream errors reach every waiter and are not cached.
+        """
+        value = self.lookup(key)
+        if value is not None:
+            self.hits += 1
+            return value, "hit"
+
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            status = "coalesced"
+        else:
+            self.misses += 1
+            status = "miss"
+            # Its own task, so a disconnecting first caller does not cancel
+            # the fetch the others are waiting on
+            task = asyncio.ensure_future(self.load(key, fetch))
+            self.in_flight[key] = task
+        return await asyncio.shield(task), status
+
+    async def load(self, key, fetch):
+        try:
+            value = await fetch()
+        except Exception:
+            self.upstream_errors += 1
+            raise
+        else:
+            self.store(key, value)
+            return value
+        finally:
+            del self.in_flight[key]
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "upstream_errors": self.upstream_errors,
+            "in_flight": len(self.in_flight),
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0
+        }
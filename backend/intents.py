@@ -0,0 +1,223 @@
+"""
+Assistant intents
+Messages sent to the assistant widget are matched against phrase tables
+(intents/fr.json), loaded once at startup. Every phrase of every intent,
+plus the entities intents use (color names), goes into one Aho-Corasick
+automaton over case- and accent-folded text, so a message is read once
+whatever the number of intents. The best intent gives the reply and the
+actions the widget runs: toggle edit mode, run an image search, apply a
+palette, add a section.
+
+Phrases are whole words ("mode edition"); a trailing * also matches longer
+words ("modif*" for modifier, modification).
+"""
+
+import html
+import json
+import os
+import unicodedata
+import zlib
+from collections import deque
+from functools import lru_cache
+
+INTENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents")
+
+# Not decomposed by NFKD
+LIGATURES = {"œ": "oe", "æ": "ae", "ß": "ss"}
+
+
+@lru_cache(maxsize=4096)
+def fold_char(char):
+    """Lower case, without accents; a space for anything but letters and digits"""
+    folded = LIGATURES.get(char.casefold()) or unicodedata.normalize("NFKD", char.casefold())
+    return "".join(" " if not part.isalnum() else part for part in folded if not unicodedata.combining(part))
+
+
+def fold(text):
+    """(folded, offsets): words of `text` folded and separated by single spaces,
+    with one space before and after; offsets[i] is the index in `text` of
+    folded[i] (len(text) past the end)
+    """
+    chars = [" "]
+    offsets = [0]
+    for index, char in enumerate(text):
+        for part in fold_char(char):
+            if part == " " and chars[-1] == " ":
+                continue
+            chars.append(part)
+            offsets.append(index)
+    if chars[-1] != " ":
+        chars.append(" ")
+        offsets.append(len(text))
+    offsets.append(len(text))
+    return "".join(chars), offsets
+
+
+def phrase_pattern(phrase):
+    """Folded pattern of a table phrase: ' mode edition ', or ' modif' for 'modif*'"""
+    prefix = phrase.endswith("*")
+    folded = fold(phrase.rstrip("*"))[0]
+    return folded.rstrip(" ") if prefix else folded
+
+
+class Automaton:
+    """Aho-Corasick automaton: all occurrences of all patterns in one pass"""
+    def __init__(self, patterns):
+        # State 0 is the root; outputs are (pattern length, value)
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+        for pattern, value in patterns:
+            state = 0
+            for char in pattern:
+                following = self.goto[state].get(char)
+                if following is None:
+                    following = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                    self.goto[state][char] = following
+                state = following
+            self.outputs[state].append((len(pattern), value))
+
+        # Breadth first: a state's fail link points to a shallower state
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[following] = self.goto[fallback].get(char, 0)
+                self.outputs[following] = self.outputs[following] + self.outputs[self.fail[following]]
+
+    def find(self, text):
+        """(start, end, value) of every pattern occurrence, by end position"""
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, value in outputs[state]:
+                yield end - length, end, value
+
+
+def fill(template, values):
+    """Action template with its "{slot}" strings filled in"""
+    return {key: value.format_map(values) if isinstance(value, str) else value for key, value in template.items()}
+
+
+class IntentEngine:
+    def __init__(self, table):
+        self.language = table.get("language", "fr")
+        self.intents = {intent["id"]: intent for intent in table["intents"]}
+        self.order = {intent_id: rank for rank, intent_id in enumerate(self.intents)}
+        self.colors = {color["name"]: color for color in table.get("colors", [])}
+        self.commands = table.get("commands", {})
+        self.articles = {fold(article)[0].strip() for article in table.get("articles", [])}
+        self.fallback = table["fallback"]
+        # Naming a color is enough to ask for a palette ("mets-le en vert")
+        self.color_intent = next((intent_id for intent_id, intent in self.intents.items()
+                                  if intent.get("slot") == "color"), None)
+
+        patterns = [(phrase_pattern(phrase), ("intent", intent["id"], len(phrase.split())))
+                    for intent in table["intents"] for phrase in intent["phrases"]]
+        patterns += [(phrase_pattern(phrase), ("color", color["name"], 1))
+                     for color in self.colors.values() for phrase in color["phrases"]]
+        self.automaton = Automaton(patterns)
+        self.phrases = len(patterns)
+        self.messages = 0
+        self.counts = {}
+
+    @classmethod
+    def load(cls, path=os.path.join(INTENTS_DIR, "fr.json")):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def query_after(self, text, folded, offsets, end):
+        """Words of `text` after folded position `end`, leading articles skipped"""
+        position = end
+        while True:
+            space = folded.find(" ", position)
+            if space < 0 or folded[position:space] not in self.articles:
+                break
+            position = space + 1
+        return text[offsets[position]:].strip(" \t.,;:!?\"'«»")
+
+    def match(self, message):
+        """(intent ids best first, {slot: value}) for a message"""
+        text = message.strip()
+        for command, intent_id in self.commands.items():
+            if text.casefold().startswith(command + " "):
+                return [intent_id], {"query": text[len(command):].strip()}
+
+        folded, offsets = fold(text)
+        scores = {}
+        slots = {}
+        query_end = None
+        for _, end, (kind, name, weight) in self.automaton.find(folded):
+            if kind == "color":
+                slots.setdefault("color", name)
+                if self.color_intent:
+                    scores[self.color_intent] = scores.get(self.color_intent, 0) + weight
+                continue
+            scores[name] = scores.get(name, 0) + weight
+            if self.intents[name].get("slot") == "query":
+                # Longest phrase ending last: "images de" over "images"
+                query_end = end if folded[end - 1] == " " else folded.find(" ", end) + 1
+        ranked = sorted(scores, key=lambda intent_id: (-scores[intent_id], self.order[intent_id]))
+        if query_end is not None:
+            query = self.query_after(text, folded, offsets, query_end)
+            if query:
+                slots["query"] = query
+        return ranked, slots
+
+    def reply(self, message, previous_intent=None):
+        """{"intent", "reply", "actions", "offer", "matched"} for one message
+
+        `previous_intent` is the intent of the assistant's last answer: an
+        "accept" intent ("oui", "vas-y") runs what that answer offered.
+        """
+        ranked, slots = self.match(message)
+        self.messages += 1
+        if not ranked:
+            folded = fold(message)[0]
+            self.counts["fallback"] = self.counts.get("fallback", 0) + 1
+            reply = self.fallback[zlib.crc32(folded.encode("utf-8")) % len(self.fallback)]
+            return {"intent": "fallback", "reply": reply, "actions": [], "offer": [], "matched": []}
+
+        intent = self.intents[ranked[0]]
+        self.counts[intent["id"]] = self.counts.get(intent["id"], 0) + 1
+        reply, actions = intent["reply"], intent.get("actions", [])
+        if intent.get("accept"):
+            previous = self.intents.get(previous_intent or "")
+            if previous and previous.get("offer"):
+                reply, actions = intent["acceptReply"], previous["offer"]
+        slot = intent.get("slot")
+        if slot:
+            values = {"query": slots.get("query", "")}
+            if slot == "color" and "color" in slots:
+                color = self.colors[slots["color"]]
+                values.update(color=color["name"], primary=color["primary"], secondary=color["secondary"])
+            if values.get(slot):
+                reply = intent["slotReply"].format_map({key: html.escape(value) for key, value in values.items()})
+                actions = [fill(action, values) for action in intent.get("slotActions", [])]
+        return {
+            "intent": intent["id"],
+            "reply": reply,
+            "actions": actions,
+            "offer": intent.get("offer", []),
+            "matched": ranked
+        }
+
+    def stats(self):
+        return {
+            "language": self.language,
+            "intents": len(self.intents),
+            "phrases": self.phrases,
+            "states": len(self.automaton.goto),
+            "messages": self.messages,
+            "by_intent": dict(sorted(self.counts.items()))
+        }
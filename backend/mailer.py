@@ -0,0 +1,272 @@
+"""
+Email delivery queue
+Deliveries are persisted in SQLite and sent by a small pool of workers. Each
+worker keeps its SMTP connection open across messages and sends whatever is
+due in batches over it, so a burst of hundreds of deliveries needs a handful
+of connections, not one per message. Transient failures are retried with
+exponential backoff; permanent ones (5xx) fail the delivery at once.
+"""
+
+import asyncio
+import random
+import sqlite3
+import time
+import uuid
+from email.message import EmailMessage
+from html import escape
+
+import aiosmtplib
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    id TEXT PRIMARY KEY,
+    site_id TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deliveries_due ON deliveries(status, next_attempt);
+"""
+
+STATUSES = ("queued", "sending", "sent", "failed")
+
+
+class PermanentDeliveryError(Exception):
+    """The message cannot be built or will never be accepted"""
+
+
+class DeliveryQueue:
+    def __init__(self, path, clock=time.time):
+        self.clock = clock
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        # Deliveries a previous process was sending when it stopped
+        self.db.execute("UPDATE deliveries SET status = 'queued' WHERE status = 'sending'")
+
+    def close(self):
+        self.db.close()
+
+    def enqueue(self, site_id, recipient):
+        delivery_id = uuid.uuid4().hex
+        now = self.clock()
+        self.db.execute(
+            "INSERT INTO deliveries (id, site_id, recipient, status, next_attempt, created, updated) "
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+            (delivery_id, site_id, recipient, now, now, now)
+        )
+        return delivery_id
+
+    def claim(self, limit):
+        """Mark up to `limit` due deliveries as sending and return them
+
+        Workers share one event loop and there is no await in here, so two
+        workers never claim the same delivery.
+        """
+        now = self.clock()
+        rows = self.db.execute(
+            "SELECT id, site_id, recipient, attempts FROM deliveries "
+            "WHERE status = 'queued' AND next_attempt <= ? ORDER BY next_attempt LIMIT ?",
+            (now, limit)
+        ).fetchall()
+        if rows:
+            self.db.executemany(
+                "UPDATE deliveries SET status = 'sending', attempts = attempts + 1, updated = ? WHERE id = ?",
+                [(now, row[0]) for row in rows]
+            )
+        return [{"id": row[0], "site_id": row[1], "recipient": row[2], "attempts": row[3] + 1} for row in rows]
+
+    def mark_sent(self, delivery_id):
+        self.db.execute("UPDATE deliveries SET status = 'sent', last_error = NULL, updated = ? WHERE id = ?",
+                        (self.clock(), delivery_id))
+
+    def mark_failed(self, delivery_id, error):
+        self.db.execute("UPDATE deliveries SET status = 'failed', last_error = ?, updated = ? WHERE id = ?",
+                        (error, self.clock(), delivery_id))
+
+    def retry_later(self, delivery_id, error, delay):
+        now = self.clock()
+        self.db.execute(
+            "UPDATE deliveries SET status = 'queued', last_error = ?, next_attempt = ?, updated = ? WHERE id = ?",
+            (error, now + delay, now, delivery_id)
+        )
+
+    def next_due(self):
+        """Seconds until the next queued delivery is due, or None"""
+        row = self.db.execute("SELECT MIN(next_attempt) FROM deliveries WHERE status = 'queued'").fetchone()
+        return None if row[0] is None else max(0.0, row[0] - self.clock())
+
+    def get(self, delivery_id):
+        row = self.db.execute(
+            "SELECT site_id, recipient, status, attempts, last_error, created, updated FROM deliveries WHERE id = ?",
+            (delivery_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"id": delivery_id, "siteId": row[0], "recipient": row[1], "status": row[2],
+                "attempts": row[3], "lastError": row[4], "created": row[5], "updated": row[6]}
+
+    def counts(self):
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(self.db.execute("SELECT status, COUNT(*) FROM deliveries GROUP BY status").fetchall())
+        return counts
+
+
+def is_permanent(error):
+    """5xx answers will not change on retry"""
+    if isinstance(error, PermanentDeliveryError):
+        return True
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(refusal.code >= 500 for refusal in error.recipients)
+    return isinstance(error, aiosmtplib.SMTPResponseException) and error.code >= 500
+
+
+def site_ready_message(site, recipient, sender, download_url):
+    """The email that delivers a saved site: a link to its ZIP export"""
+    # A line break in a header value is rejected (and would be header injection)
+    name = " ".join(site["websiteData"]["businessName"].splitlines()).strip()
+    message = EmailMessage()
+    message["Subject"] = f"Votre site {name} est prêt"
+    message["From"] = sender
+    message["To"] = recipient
+    message.set_content(
+        f"Bonjour,\n\nVotre site {name} est prêt. Téléchargez-le ici :\n{download_url}\n\n"
+        "Décompressez l'archive puis déposez les fichiers chez votre hébergeur.\n\nL'équipe IA WebGen Pro\n"
+    )
+    message.add_alternative(
+        f"<p>Bonjour,</p><p>Votre site <strong>{escape(name)}</strong> est prêt.</p>"
+        f'<p><a href="{escape(download_url)}">📦 Télécharger le site (ZIP)</a></p>'
+        "<p>Décompressez l'archive puis déposez les fichiers chez votre hébergeur.</p>"
+        "<p>L'équipe IA WebGen Pro</p>",
+        subtype="html"
+    )
+    return message
+
+
+class Mailer:
+    def __init__(self, queue, build_message, hostname="localhost", port=1025, username="", password="",
+                 use_tls=False, workers=4, batch_size=20, max_attempts=5, backoff=5.0, idle_timeout=30.0,
+                 timeout=10.0):
+        self.queue = queue
+        self.build_message = build_message
+        # connect() logs in by itself when credentials are set
+        self.smtp_options = {"hostname": hostname, "port": port, "use_tls": use_tls, "timeout": timeout,
+                             "username": username or None, "password": password or None}
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.wake = asyncio.Event()
+        self.tasks = []
+        self.connections_opened = 0
+        self.messages_sent = 0
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+        return self
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def notify(self):
+        """New deliveries were queued"""
+        self.wake.set()
+
+    def retry_delay(self, attempts):
+        """Exponential backoff with jitter, capped at an hour"""
+        return min(3600.0, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+
+    async def connect(self):
+        smtp = aiosmtplib.SMTP(**self.smtp_options)
+        await smtp.connect()
+        self.connections_opened += 1
+        return smtp
+
+    async def close(self, smtp):
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except aiosmtplib.SMTPException:
+                smtp.close()
+
+    def discard(self, smtp):
+        """Drop a connection that failed, without talking to the server"""
+        if smtp is not None:
+            smtp.close()
+
+    def reschedule(self, delivery, error):
+        message = f"{type(error).__name__}: {error}"
+        if is_permanent(error) or delivery["attempts"] >= self.max_attempts:
+            self.queue.mark_failed(delivery["id"], message)
+        else:
+            self.queue.retry_later(delivery["id"], message, self.retry_delay(delivery["attempts"]))
+
+    async def worker(self):
+        smtp = None
+        try:
+            while True:
+                batch = self.queue.claim(self.batch_size)
+                if not batch:
+                    # Idle: keep the connection for the next burst unless
+                    # nothing comes within idle_timeout
+                    due = self.queue.next_due()
+                    timeout = self.idle_timeout if due is None else min(due, self.idle_timeout)
+                    try:
+                        await asyncio.wait_for(self.wake.wait(), timeout)
+                        self.wake.clear()
+                    except asyncio.TimeoutError:
+                        if due is None or due >= self.idle_timeout:
+                            await self.close(smtp)
+                            smtp = None
+                    continue
+
+                for position, delivery in enumerate(batch):
+                    try:
+                        message = self.build_message(delivery)
+                    except Exception as error:
+                        # Building again gives the same result: no retry
+                        self.queue.mark_failed(delivery["id"], f"{type(error).__name__}: {error}")
+                        continue
+                    try:
+                        if smtp is None or not smtp.is_connected:
+                            smtp = await self.connect()
+                        await smtp.send_message(message)
+                    except (aiosmtplib.SMTPConnectError, aiosmtplib.SMTPServerDisconnected,
+                            aiosmtplib.SMTPTimeoutError, OSError) as error:
+                        # The connection is gone: the rest of the batch waits
+                        # for the backoff instead of reconnecting per message
+                        self.discard(smtp)
+                        smtp = None
+                        for pending in batch[position:]:
+                            self.reschedule(pending, error)
+                        break
+                    except (aiosmtplib.SMTPException, PermanentDeliveryError) as error:
+                        self.reschedule(delivery, error)
+                    except Exception as error:
+                        # Anything else must not kill the worker and leave the
+                        # delivery in "sending"; the connection state is unknown
+                        self.discard(smtp)
+                        smtp = None
+                        self.reschedule(delivery, error)
+                    else:
+                        self.messages_sent += 1
+                        self.queue.mark_sent(delivery["id"])
+        finally:
+            await self.close(smtp)
+
+    def stats(self):
+        return {
+            "deliveries": self.queue.counts(),
+            "workers": self.workers,
+            "connections_opened": self.connections_opened,
+            "messages_sent": self.messages_sent
+        }
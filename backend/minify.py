@@ -0,0 +1,246 @@
+"""
+Minification and precompression
+Conservative minifiers for the app (index.html with its inline script and
+style) and for exported pages: comments and redundant whitespace go, every
+string, template literal and regular expression is copied as is. Newlines
+are kept in scripts (one per run) so automatic semicolon insertion cannot
+change meaning. Precompressed gzip and Brotli variants are then written
+next to each file, for servers to pick by Accept-Encoding.
+"""
+
+import gzip
+import re
+
+import brotli
+
+# Suffix of each precompressed variant, by Content-Encoding
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+# Text types worth precompressing
+COMPRESSIBLE = (".html", ".css", ".js", ".json", ".svg", ".txt")
+
+JS_REGEX_KEYWORDS = {"return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void", "throw",
+                     "instanceof", "yield", "await"}
+WORD = re.compile("[\\w$\\u0080-\\uffff]")
+TRAILING_WORD = re.compile(r"[\w$]+$")
+
+
+def is_word(char):
+    return bool(char) and WORD.match(char) is not None
+
+
+def skip_string(source, start):
+    """Index just past the '...' or "..." literal starting at `start`"""
+    quote = source[start]
+    i = start + 1
+    while i < len(source) and source[i] != quote:
+        i += 2 if source[i] == "\\" else 1
+    return i + 1
+
+
+def skip_template(source, start):
+    """Index just past the `...` literal starting at `start`, ${} included"""
+    i = start + 1
+    while i < len(source) and source[i] != "`":
+        if source[i] == "\\":
+            i += 2
+        elif source.startswith("${", i):
+            i = skip_code_block(source, i + 2)
+        else:
+            i += 1
+    return i + 1
+
+
+def skip_code_block(source, start):
+    """Index just past the } closing the code that starts at `start`"""
+    depth = 0
+    i = start
+    while i < len(source):
+        char = source[i]
+        if char in "'\"":
+            i = skip_string(source, i)
+            continue
+        if char == "`":
+            i = skip_template(source, i)
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            if depth == 0:
+                return i + 1
+            depth -= 1
+        i += 1
+    return i
+
+
+def skip_regex(source, start):
+    """Index just past the /.../flags literal starting at `start`"""
+    i = start + 1
+    in_class = False
+    while i < len(source) and source[i] != "\n":
+        char = source[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            i += 1
+            break
+        i += 1
+    while i < len(source) and is_word(source[i]):
+        i += 1
+    return i
+
+
+def regex_allowed(output):
+    """Whether a / after the code emitted so far starts a regular expression"""
+    code = "".join(output[-3:]).rstrip()
+    if not code:
+        return True
+    last = code[-1]
+    if last in ")]}" or last in "\"'`":
+        return False
+    if is_word(last):
+        word = TRAILING_WORD.search("".join(output[-12:]).rstrip())
+        return word is not None and word.group(0) in JS_REGEX_KEYWORDS
+    return True
+
+
+def minify_js(source):
+    """Comments and indentation removed, spaces kept only between tokens that need them"""
+    output = []
+    pending = ""
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char in " \t\r\n":
+            end = i
+            while end < len(source) and source[end] in " \t\r\n":
+                end += 1
+            if "\n" in source[i:end]:
+                pending = "\n"
+            elif not pending:
+                pending = " "
+            i = end
+            continue
+        # A regular expression cannot be empty: // always starts a comment
+        if source.startswith("//", i):
+            end = source.find("\n", i)
+            i = len(source) if end < 0 else end
+            continue
+        if source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            end = len(source) if end < 0 else end + 2
+            if "\n" in source[i:end]:
+                pending = "\n"
+            elif not pending:
+                pending = " "
+            i = end
+            continue
+
+        if char in "'\"":
+            end = skip_string(source, i)
+        elif char == "`":
+            end = skip_template(source, i)
+        elif char == "/" and regex_allowed(output):
+            end = skip_regex(source, i)
+        else:
+            end = i + 1
+        token = source[i:end]
+
+        if pending and output:
+            previous = output[-1][-1]
+            if pending == "\n":
+                output.append("\n")
+            elif (is_word(previous) and is_word(token[0])) or (previous in "+-/" and token[0] == previous):
+                output.append(" ")
+        pending = ""
+        output.append(token)
+        i = end
+    return "".join(output).strip()
+
+
+def minify_css(css):
+    """Comments removed, whitespace collapsed and dropped around { } ; , and after :"""
+    output = []
+    i = 0
+    while i < len(css):
+        char = css[i]
+        if css.startswith("/*", i):
+            end = css.find("*/", i + 2)
+            i = len(css) if end < 0 else end + 2
+            continue
+        if char in "'\"":
+            end = skip_string(css, i)
+            output.append(css[i:end])
+            i = end
+            continue
+        if char.isspace():
+            while i < len(css) and css[i].isspace():
+                i += 1
+            if output and output[-1][-1] not in "{};,:" and i < len(css) and css[i] not in "{};,":
+                output.append(" ")
+            continue
+        if char == "}" and output and output[-1] == ";":
+            output.pop()
+        if char in "{};," and output and output[-1] == " ":
+            output.pop()
+        output.append(char)
+        i += 1
+    return "".join(output).strip()
+
+
+HTML_PARTS = re.compile(
+    r"(?P<comment><!--(?!\[if).*?-->)"
+    r"|(?P<script><script\b(?P<script_attributes>[^>]*)>)(?P<script_body>.*?)(?P<script_end></script\s*>)"
+    r"|(?P<style><style\b[^>]*>)(?P<style_body>.*?)(?P<style_end></style\s*>)"
+    r"|(?P<raw><(?P<raw_tag>pre|textarea)\b.*?</(?P=raw_tag)\s*>)"
+    r"|(?P<tag><[^>]*>)",
+    re.S | re.I
+)
+JS_TYPES = ("", "text/javascript", "application/javascript", "module")
+SCRIPT_TYPE = re.compile(r"""\stype=["']?([^"'\s>]*)""", re.I)
+
+
+def collapse_text(text):
+    """Runs of whitespace as one newline (if they held one) or one space"""
+    return re.sub(r"\s+", lambda run: "\n" if "\n" in run.group(0) else " ", text)
+
+
+def minify_html(html):
+    """Comments dropped, text whitespace collapsed, inline scripts and styles minified
+
+    Tags, <pre> and <textarea> are kept as is.
+    """
+    output = []
+    position = 0
+    for match in HTML_PARTS.finditer(html):
+        output.append(collapse_text(html[position:match.start()]))
+        position = match.end()
+        if match.group("comment"):
+            continue
+        if match.group("script"):
+            script_type = SCRIPT_TYPE.search(match.group("script_attributes"))
+            body = match.group("script_body")
+            if (script_type.group(1).lower() if script_type else "") in JS_TYPES:
+                body = minify_js(body)
+            output.append(match.group("script") + body + match.group("script_end"))
+        elif match.group("style"):
+            output.append(match.group("style") + minify_css(match.group("style_body")) + match.group("style_end"))
+        else:
+            output.append(match.group(0))
+    output.append(collapse_text(html[position:]))
+    return "".join(output).strip() + "\n"
+
+
+def precompressed(data):
+    """{suffix: compressed bytes} for every encoding, at maximum compression
+
+    gzip variants carry no timestamp, so unchanged files give unchanged bytes.
+    """
+    return {
+        ENCODINGS["br"]: brotli.compress(data, quality=11),
+        ENCODINGS["gzip"]: gzip.compress(data, compresslevel=9, mtime=0)
+    }
@@ -0,0 +1,181 @@
+"""
+Photo uploads and responsive variants
+Uploads are streamed to disk chunk by chunk while being hashed, then resized
+to WebP/JPEG variants at several widths in a process pool. Photos are stored
+by content hash, so the same file uploaded twice is processed and stored
+once; the asset index (assets.py) tracks who references them.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+VARIANT_WIDTHS = (320, 640, 1024, 1600)
+VARIANT_FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True})
+}
+MANIFEST = "variants.json"
+PHOTO_ID = re.compile(r"[0-9a-f]{64}")
+
+
+class UploadError(ValueError):
+    """Upload rejected; `status` is the HTTP status to answer with"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def make_variants(source, out_dir, widths=VARIANT_WIDTHS):
+    """Resize `source` to every width (never upscaling) in every format
+
+    Runs in a worker process. Widths are produced largest first, each one
+    resized from the previous, and JPEG sources are decoded at a reduced
+    scale when even the largest variant is much smaller than the original.
+    """
+    with Image.open(source) as image:
+        largest = max(widths)
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+        full_width, full_height = image.size
+
+        variants = []
+        current = image
+        for width in sorted({min(width, full_width) for width in widths}, reverse=True):
+            height = max(1, round(full_height * width / full_width))
+            if current.size != (width, height):
+                current = current.resize((width, height), Image.LANCZOS, reducing_gap=2.0)
+            for extension, (pil_format, mime_type, options) in VARIANT_FORMATS.items():
+                frame = current.convert("RGB") if pil_format == "JPEG" and current.mode != "RGB" else current
+                name = f"w{width}.{extension}"
+                path = os.path.join(out_dir, name)
+                frame.save(path, pil_format, **options)
+                variants.append({"file": name, "width": width, "height": height,
+                                 "type": mime_type, "bytes": os.path.getsize(path)})
+
+    manifest = {"width": full_width, "height": full_height, "variants": variants,
+                "bytes": os.path.getsize(source) + sum(variant["bytes"] for variant in variants)}
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def default_variant(manifest):
+    """Largest JPEG: what pages use as the photo's src"""
+    return max((variant for variant in manifest["variants"] if variant["type"] == "image/jpeg"),
+               key=lambda variant: variant["width"])
+
+
+class PhotoStore:
+    def __init__(self, root, executor, assets, max_bytes=10 * 1024 * 1024, widths=VARIANT_WIDTHS):
+        self.root = root
+        self.executor = executor
+        self.assets = assets
+        self.max_bytes = max_bytes
+        self.widths = widths
+        # Photos being resized, by hash: an upload of the same bytes waits for
+        # that one instead of racing it on the same directory
+        self.in_flight = {}
+        # Uploads in progress stay next to, not inside, the served photos tree
+        os.makedirs(os.path.join(root, "photos"), exist_ok=True)
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+
+    @property
+    def photos_root(self):
+        return os.path.join(self.root, "photos")
+
+    def photo_dir(self, photo_id):
+        return os.path.join(self.photos_root, photo_id[:2], photo_id)
+
+    def relative_path(self, photo_id, name):
+        """Path of a stored file below the photos root, for building URLs"""
+        return f"{photo_id[:2]}/{photo_id}/{name}"
+
+    async def receive(self, chunks):
+        """Write an upload to a temporary file; returns (sha256, path)
+
+        Only one chunk is held in memory at a time. The writes are small and
+        go to the page cache, so they are done inline.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadError(413, f"Photo larger than {self.max_bytes // (1024 * 1024)} MB")
+                    digest.update(chunk)
+                    f.write(chunk)
+            if size == 0:
+                raise UploadError(400, "Empty upload")
+        except BaseException:
+            os.unlink(path)
+            raise
+        return digest.hexdigest(), path
+
+    async def save(self, chunks):
+        """Store an upload and its variants; returns (photo_id, manifest)"""
+        photo_id, upload_path = await self.receive(chunks)
+        task = self.in_flight.get(photo_id)
+        if task is not None:
+            os.unlink(upload_path)
+            manifest = await asyncio.shield(task)
+            self.assets.record_upload(photo_id, manifest["bytes"])
+            return photo_id, manifest
+        manifest_path = os.path.join(self.photo_dir(photo_id), MANIFEST)
+        if os.path.exists(manifest_path):
+            # Same bytes already stored, whoever uploaded them. There is no
+            # await between this check and record_upload(), so a collection
+            # cannot remove the files in between.
+            os.unlink(upload_path)
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            self.assets.record_upload(photo_id, manifest["bytes"])
+            return photo_id, manifest
+        # Its own task, so a disconnecting uploader does not cancel the
+        # resize others are waiting on
+        task = asyncio.ensure_future(self.store(photo_id, upload_path))
+        self.in_flight[photo_id] = task
+        return photo_id, await asyncio.shield(task)
+
+    async def store(self, photo_id, upload_path):
+        """Move a new upload in place, make its variants and record it"""
+        try:
+            directory = self.photo_dir(photo_id)
+            os.makedirs(directory, exist_ok=True)
+            original = os.path.join(directory, "original")
+            os.replace(upload_path, original)
+            loop = asyncio.get_running_loop()
+            try:
+                manifest = await loop.run_in_executor(self.executor, make_variants, original, directory, self.widths)
+            except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+                shutil.rmtree(directory, ignore_errors=True)
+                raise UploadError(415, "Not a supported image")
+            self.assets.record_upload(photo_id, manifest["bytes"])
+            return manifest
+        finally:
+            del self.in_flight[photo_id]
+
+    def manifest(self, photo_id):
+        """Stored variants of a photo, or None (ids from clients are checked)"""
+        if not PHOTO_ID.fullmatch(photo_id):
+            return None
+        try:
+            with open(os.path.join(self.photo_dir(photo_id), MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def remove(self, photo_id):
+        """Delete a photo and its variants (after the index collected it)"""
+        shutil.rmtree(self.photo_dir(photo_id), ignore_errors=True)
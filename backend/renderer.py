@@ -0,0 +1,190 @@
+"""
+Server-side site renderer
+Builds the same pages as the generators in index.html (generatePageHeader,
+generateAccueilContent, ..., generatePageFooter) from a websiteData payload,
+with Jinja2 templates compiled once when the renderer is created. The parts
+shared between sites (macros.html) come from a FragmentCache.
+"""
+
+import os
+from datetime import date
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+from fragments import FragmentCache
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "site_templates")
+
+# The template catalog served to the frontend is built from this list (see
+# catalog.py)
+TEMPLATES = [
+    {"id": "modern-clean", "name": "Modern Clean", "description": "Design épuré et moderne",
+     "colors": {"primary": "#3b82f6", "secondary": "#1e40af"}, "gradient": "from-blue-400 to-blue-600"},
+    {"id": "business-pro", "name": "Business Pro", "description": "Professionnel et élégant",
+     "colors": {"primary": "#374151", "secondary": "#111827"}, "gradient": "from-gray-600 to-gray-800"},
+    {"id": "creative-studio", "name": "Creative Studio", "description": "Créatif et artistique",
+     "colors": {"primary": "#f59e0b", "secondary": "#dc2626"}, "gradient": "from-orange-400 to-red-500"},
+    {"id": "fresh-green", "name": "Fresh Green", "description": "Nature et éco-responsable",
+     "colors": {"primary": "#10b981", "secondary": "#047857"}, "gradient": "from-green-400 to-emerald-600"},
+    {"id": "tech-innovation", "name": "Tech Innovation", "description": "High-tech et futuriste",
+     "colors": {"primary": "#8b5cf6", "secondary": "#7c3aed"}, "gradient": "from-purple-500 to-cyan-500"},
+    {"id": "warm-elegance", "name": "Warm Elegance", "description": "Chaleureux et accueillant",
+     "colors": {"primary": "#f97316", "secondary": "#ea580c"}, "gradient": "from-orange-500 to-amber-600"},
+    {"id": "classic-minimal", "name": "Classic Minimal", "description": "Classique et minimaliste",
+     "colors": {"primary": "#6b7280", "secondary": "#374151"}, "gradient": "from-slate-400 to-slate-600"},
+    {"id": "luxury-gold", "name": "Luxury Gold", "description": "Premium avec animations dorées",
+     "colors": {"primary": "#f59e0b", "secondary": "#d97706"}, "gradient": "from-yellow-400 to-amber-600"},
+    {"id": "royal-purple", "name": "Royal Purple", "description": "Design royal avec effets premium",
+     "colors": {"primary": "#a855f7", "secondary": "#7c3aed"}, "gradient": "from-purple-500 to-indigo-600"},
+    {"id": "diamond-elite", "name": "Diamond Elite", "description": "Ultra-premium avec cristaux",
+     "colors": {"primary": "#6b7280", "secondary": "#374151"}, "gradient": "from-slate-400 to-slate-700"}
+]
+TEMPLATES_BY_ID = {template["id"]: template for template in TEMPLATES}
+
+PAGE_NAMES = {
+    "accueil": "Accueil",
+    "apropos": "À propos",
+    "services": "Services",
+    "portfolio": "Portfolio",
+    "equipe": "Équipe",
+    "temoignages": "Témoignages",
+    "blog": "Blog",
+    "contact": "Contact"
+}
+PAGES = list(PAGE_NAMES)
+# In-page anchors, as in the preview
+ANCHOR_LINKS = {page: f"#{page}" for page in PAGES}
+
+# The site type options of the form
+SITE_TYPES = {
+    "restaurant": "🍽️ Restaurant",
+    "salon": "💇 Salon de beauté",
+    "commerce": "🏪 Commerce/Boutique",
+    "service": "🔧 Service professionnel",
+    "medical": "🏥 Cabinet médical",
+    "immobilier": "🏠 Immobilier",
+    "hotel": "🏨 Hôtel/Hébergement",
+    "fitness": "💪 Salle de sport",
+    "location-voiture": "🚗 Location de voiture",
+    "avocat": "⚖️ Cabinet d'avocat",
+    "photographe": "📸 Photographe",
+    "plombier": "🔧 Plomberie",
+    "electricien": "⚡ Électricien",
+    "garage": "🔧 Garage automobile",
+    "artisan": "🔨 Artisan",
+    "consultant": "💼 Consultant",
+    "association": "🤝 Association",
+    "autre": "✨ Autre activité"
+}
+
+# getServicesByType()
+SERVICES_BY_TYPE = {
+    "restaurant": [
+        {"icon": "🍽️", "title": "Cuisine Gastronomique", "description": "Des plats préparés avec des ingrédients frais et de qualité"},
+        {"icon": "🍷", "title": "Cave à Vins", "description": "Une sélection exceptionnelle de vins pour accompagner vos repas"},
+        {"icon": "👨‍🍳", "title": "Chef Expérimenté", "description": "Une équipe de cuisiniers passionnés et talentueux"}
+    ],
+    "salon": [
+        {"icon": "💇‍♀️", "title": "Coiffure", "description": "Coupes, colorations et soins capillaires personnalisés"},
+        {"icon": "💅", "title": "Manucure", "description": "Soins des ongles et nail art professionnel"},
+        {"icon": "✨", "title": "Soins Esthétiques", "description": "Soins du visage et épilations dans un cadre relaxant"}
+    ],
+    "default": [
+        {"icon": "⭐", "title": "Excellence", "description": "Un service de qualité supérieure adapté à vos besoins"},
+        {"icon": "🎯", "title": "Sur Mesure", "description": "Des solutions personnalisées pour chaque client"},
+        {"icon": "📞", "title": "Support", "description": "Un accompagnement complet et un suivi personnalisé"}
+    ]
+}
+
+DEFAULT_HERO_IMAGE = "https://images.unsplash.com/photo-1497366216548-37526070297c?w=800&h=600&fit=crop"
+
+
+class SiteRenderer:
+    def __init__(self, template_dir=TEMPLATE_DIR, fragments=None):
+        # Values are inserted as-is, like the template literals of the
+        # frontend, so both produce byte-identical pages
+        self.env = Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=False,
+            keep_trailing_newline=True,
+            auto_reload=False,
+            undefined=StrictUndefined
+        )
+        # Fragment macros only see their arguments and these constants
+        self.env.globals.update(page_names=PAGE_NAMES, services_by_type=SERVICES_BY_TYPE, fragment=self.fragment)
+        self.fragments = fragments or FragmentCache()
+        self.macros = self.env.get_template("macros.html").module
+        # Compile every page up front; auto_reload=False keeps them cached
+        # without a stat() per render
+        self.pages = {page: self.env.get_template(f"{page}.html") for page in PAGES}
+        self.document = self.env.get_template("document.html")
+        with open(os.path.join(template_dir, "styles.css"), encoding="utf-8") as f:
+            self.stylesheet = f.read()
+
+    def fragment(self, name, *inputs):
+        """Output of the macro `name` for `inputs`, rendered once per distinct inputs"""
+        return self.fragments.get(name, inputs, lambda: getattr(self.macros, name)(*inputs))
+
+    def theme(self, template_id, data):
+        """CSS custom properties the pages' var() refer to, as siteTheme()
+
+        The template sets the colors unless the editor overrode them.
+        """
+        colors = TEMPLATES_BY_ID[template_id]["colors"]
+        return {
+            "--site-primary": data.get("primaryColor") or colors["primary"],
+            "--site-secondary": data.get("secondaryColor") or colors["secondary"]
+        }
+
+    def context(self, template_id, data, today=None, page_links=ANCHOR_LINKS):
+        """Template variables for one site, shared by all of its pages"""
+        today = today or date.today()
+        photos = data.get("photos") or []
+        social = data.get("socialMedia") or {}
+        pages = data.get("selectedPages") or PAGES
+        return {
+            "business_name": data.get("businessName", ""),
+            "description": data.get("description", ""),
+            "slogan": data.get("slogan", ""),
+            "user_email": data.get("userEmail", ""),
+            "phone": data.get("phone", ""),
+            "address": data.get("address", ""),
+            "team_info": data.get("teamInfo", ""),
+            "services_detail": data.get("servicesDetail", ""),
+            "theme": self.theme(template_id, data),
+            "pages": pages,
+            # Hashable, as it keys the navigation fragments
+            "nav": tuple((page, page_links[page]) for page in pages),
+            "service_group": data.get("siteType") if data.get("siteType") in SERVICES_BY_TYPE else "default",
+            # Uploaded variant when the backend stored the photo, else its data URL
+            "main_image": (photos[0].get("url") or photos[0]["dataURL"]) if photos else DEFAULT_HERO_IMAGE,
+            "social": social,
+            "has_social": any(social.values()),
+            # toLocaleDateString() in a French browser
+            "published": today.strftime("%d/%m/%Y"),
+            "year": today.year
+        }
+
+    def render_page(self, template_id, data, page, today=None):
+        """HTML of one page, as generatePageContent(page)"""
+        return self.pages[page].render(self.context(template_id, data, today))
+
+    def render_site(self, template_id, data, today=None):
+        """HTML of every selected page, as generateAllPages()"""
+        context = self.context(template_id, data, today)
+        return {page: self.pages[page].render(context) for page in context["pages"]}
+
+    def export_documents(self, template_id, data, today=None, styles=None):
+        """(file name, standalone HTML document) per selected page, one at a time
+
+        The first page is index.html and the navigation links between files.
+        With `styles` (a SharedStylesheet), inline styles are hoisted into it.
+        """
+        pages = data.get("selectedPages") or PAGES
+        files = {page: "index.html" if number == 0 else f"{page}.html" for number, page in enumerate(pages)}
+        context = self.context(template_id, data, today, page_links=files)
+        for page in pages:
+            body = self.pages[page].render(context)
+            title = f"{PAGE_NAMES[page]} - {context['business_name']}"
+            document = self.document.render(title=title, stylesheet="styles.css", theme=context["theme"], body=body)
+            yield files[page], styles.extract(document, files[page]) if styles else document
@@ -0,0 +1,676 @@
+"""
+IA WebGen Pro - Backend API
+FastAPI server behind the frontend: health probe, the assistant widget's
+intents, image search with the image provider key kept server-side, photo
+uploads with responsive variants, server-side rendering of the generated
+sites, their delivery by email and user accounts
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import List, Literal, Optional
+
+import httpx
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel, Field, ValidationError
+
+from assets import AssetIndex
+from batch import BatchError, BatchRenderer, csv_records, file_chunks, ndjson_records, read_lines, spool
+from catalog import CATALOG_DIR, TemplateCatalog
+from events import EventStreamResponse, StreamLimiter, StreamLimitError, event, reply_tokens, with_heartbeats
+from image_library import IMAGE_EXTENSIONS, ImageLibrary
+from image_search import ImageSearchCache, normalize_query
+from intents import INTENTS_DIR, IntentEngine
+from export import export_sizes, slugify, stream_site_zip
+from fragments import FragmentCache
+from mailer import DeliveryQueue, Mailer, PermanentDeliveryError, site_ready_message
+from photos import PhotoStore, UploadError, default_variant
+from sites import SiteStore
+from users import AuthError, SessionCache, UserStore
+from renderer import PAGES, TEMPLATES_BY_ID, SiteRenderer
+
+API_HOST = os.environ.get("API_HOST", "0.0.0.0")
+API_PORT = int(os.environ.get("API_PORT", "8001"))
+ENVIRONMENT = os.environ.get("ENVIRONMENT", "development")
+CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "*").split(",")
+
+# Upstream image provider (Unsplash search API). UNSPLASH_API_URL can point
+# at a local stand-in for offline runs.
+UNSPLASH_ACCESS_KEY = os.environ.get("UNSPLASH_ACCESS_KEY", "")
+UNSPLASH_API_URL = os.environ.get("UNSPLASH_API_URL", "https://api.unsplash.com").rstrip("/")
+UPSTREAM_TIMEOUT = float(os.environ.get("UPSTREAM_TIMEOUT", "5"))
+IMAGE_CACHE_SIZE = int(os.environ.get("IMAGE_CACHE_SIZE", "1024"))
+IMAGE_CACHE_TTL = float(os.environ.get("IMAGE_CACHE_TTL", "3600"))
+
+# Phrase table of the assistant widget, loaded at startup
+ASSISTANT_PHRASES = os.environ.get("ASSISTANT_PHRASES", os.path.join(INTENTS_DIR, "fr.json"))
+# Streamed answers: open streams in total and per client address, seconds
+# between heartbeats, and how long one write may stay blocked on a client
+# that does not read
+ASSISTANT_MAX_STREAMS = int(os.environ.get("ASSISTANT_MAX_STREAMS", "1000"))
+ASSISTANT_STREAMS_PER_CLIENT = int(os.environ.get("ASSISTANT_STREAMS_PER_CLIENT", "4"))
+ASSISTANT_HEARTBEAT = float(os.environ.get("ASSISTANT_HEARTBEAT", "15"))
+ASSISTANT_SEND_TIMEOUT = float(os.environ.get("ASSISTANT_SEND_TIMEOUT", "10"))
+
+# Memory budget of the rendered fragments shared between sites
+FRAGMENT_CACHE_BYTES = int(os.environ.get("FRAGMENT_CACHE_BYTES", str(8 * 1024 * 1024)))
+
+# Batch imports: sites are rendered on BATCH_WORKERS processes (default: one
+# per core), at most BATCH_IN_FLIGHT at a time per batch
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "0")) or os.cpu_count()
+BATCH_IN_FLIGHT = int(os.environ.get("BATCH_IN_FLIGHT", "64"))
+MAX_BATCH_BYTES = int(os.environ.get("MAX_BATCH_BYTES", str(200 * 1024 * 1024)))
+
+# Uploaded photos and their variants (served under /media/photos), and the
+# backend's databases (never served)
+MEDIA_DIR = os.environ.get("MEDIA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "media"))
+DATA_DIR = os.environ.get("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+MAX_PHOTO_BYTES = int(os.environ.get("MAX_PHOTO_BYTES", str(10 * 1024 * 1024)))
+PHOTO_WORKERS = int(os.environ.get("PHOTO_WORKERS", "0")) or None
+# Unreferenced photos are deleted after ASSET_GC_GRACE seconds, checked every
+# ASSET_GC_INTERVAL seconds
+ASSET_GC_GRACE = float(os.environ.get("ASSET_GC_GRACE", str(24 * 3600)))
+ASSET_GC_INTERVAL = float(os.environ.get("ASSET_GC_INTERVAL", "3600"))
+
+# Outgoing mail. Deliveries are queued and sent by MAIL_WORKERS workers, each
+# reusing its SMTP connection for up to MAIL_BATCH messages per round. Any
+# local stand-in works for development: python -m aiosmtpd -n -l localhost:1025
+SMTP_HOST = os.environ.get("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "1025"))
+SMTP_USERNAME = os.environ.get("SMTP_USERNAME", "")
+SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD", "")
+SMTP_USE_TLS = os.environ.get("SMTP_USE_TLS", "false").lower() == "true"
+MAIL_FROM = os.environ.get("MAIL_FROM", "IA WebGen Pro <noreply@iawebgen.local>")
+MAIL_WORKERS = int(os.environ.get("MAIL_WORKERS", "4"))
+MAIL_BATCH = int(os.environ.get("MAIL_BATCH", "20"))
+MAIL_MAX_ATTEMPTS = int(os.environ.get("MAIL_MAX_ATTEMPTS", "5"))
+# First retry delay in seconds, doubled on every attempt
+MAIL_BACKOFF = float(os.environ.get("MAIL_BACKOFF", "5"))
+# Base URL of this API as seen from the recipient, for the download links
+PUBLIC_API_URL = os.environ.get("PUBLIC_API_URL", f"http://localhost:{API_PORT}").rstrip("/")
+
+# Accounts. Password hashes run on HASH_WORKERS threads; at most
+# MAX_PENDING_HASHES logins/registrations wait for them. Sessions expire after
+# SESSION_TTL seconds without use.
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", "0")) or os.cpu_count()
+MAX_PENDING_HASHES = int(os.environ.get("MAX_PENDING_HASHES", "256"))
+SESSION_TTL = float(os.environ.get("SESSION_TTL", str(7 * 24 * 3600)))
+
+# Licensed images indexed offline (python image_library.py), served under
+# /media/library and searched before the upstream provider
+IMAGE_LIBRARY_DIR = os.environ.get("IMAGE_LIBRARY_DIR", os.path.join(MEDIA_DIR, "library"))
+
+# Same demo images as the frontend's searchImages() stub, used without a key
+DEMO_IMAGES = [
+    "https://images.unsplash.com/photo-1517248135467-4c7edcad34c4?w=300&h=200&fit=crop&q=80",
+    "https://images.unsplash.com/photo-1571197857330-8894d3da2c3b?w=300&h=200&fit=crop&q=80",
+    "https://images.unsplash.com/photo-1559329007-40df8d946775?w=300&h=200&fit=crop&q=80",
+    "https://images.unsplash.com/photo-1414235077428-338989a2e8c0?w=300&h=200&fit=crop&q=80"
+]
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # One pooled client for every upstream call
+    app.state.http = httpx.AsyncClient(timeout=UPSTREAM_TIMEOUT)
+    # Upstream quota and latency are the cost: repeated searches stay in process
+    app.state.image_cache = ImageSearchCache(IMAGE_CACHE_SIZE, IMAGE_CACHE_TTL)
+    # None until the library is indexed; the index is mapped, not loaded
+    app.state.image_library = ImageLibrary.open(IMAGE_LIBRARY_DIR, f"{PUBLIC_API_URL}/media/library")
+    app.state.assistant = IntentEngine.load(ASSISTANT_PHRASES)
+    app.state.assistant_streams = StreamLimiter(ASSISTANT_MAX_STREAMS, ASSISTANT_STREAMS_PER_CLIENT)
+    # Site templates are compiled once here, not per request
+    app.state.renderer = SiteRenderer(fragments=FragmentCache(FRAGMENT_CACHE_BYTES))
+    app.state.catalog = TemplateCatalog(CATALOG_DIR)
+    batch_workers = ProcessPoolExecutor(max_workers=BATCH_WORKERS)
+    app.state.batch = BatchRenderer(batch_workers, BATCH_WORKERS, BATCH_IN_FLIGHT)
+    # Resizing is CPU-bound: keep it off the event loop and off the GIL
+    photo_workers = ProcessPoolExecutor(max_workers=PHOTO_WORKERS)
+    app.state.assets = AssetIndex(os.path.join(DATA_DIR, "assets.db"))
+    app.state.photos = PhotoStore(MEDIA_DIR, photo_workers, app.state.assets, MAX_PHOTO_BYTES)
+    app.state.sites = SiteStore(app.state.assets)
+    collector = asyncio.create_task(collect_assets_periodically())
+    app.state.deliveries = DeliveryQueue(os.path.join(DATA_DIR, "mail.db"))
+    app.state.mailer = Mailer(
+        app.state.deliveries, delivery_message, SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD,
+        use_tls=SMTP_USE_TLS, workers=MAIL_WORKERS, batch_size=MAIL_BATCH,
+        max_attempts=MAIL_MAX_ATTEMPTS, backoff=MAIL_BACKOFF
+    ).start()
+    # scrypt releases the GIL: threads are enough to keep it off the loop
+    hash_workers = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+    app.state.users = UserStore(os.path.join(DATA_DIR, "users.db"), hash_workers,
+                                SessionCache(SESSION_TTL), MAX_PENDING_HASHES)
+    try:
+        yield
+    finally:
+        app.state.users.close()
+        hash_workers.shutdown()
+        await app.state.mailer.stop()
+        app.state.deliveries.close()
+        collector.cancel()
+        await app.state.http.aclose()
+        if app.state.image_library:
+            app.state.image_library.close()
+        photo_workers.shutdown()
+        batch_workers.shutdown(cancel_futures=True)
+        app.state.sites.close()
+        app.state.assets.close()
+
+
+app = FastAPI(title="IA WebGen Pro API", version="2.0", lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=CORS_ORIGINS,
+    allow_methods=["*"],
+    allow_headers=["*"]
+)
+os.makedirs(os.path.join(MEDIA_DIR, "photos"), exist_ok=True)
+os.makedirs(DATA_DIR, exist_ok=True)
+os.makedirs(IMAGE_LIBRARY_DIR, exist_ok=True)
+app.mount("/media/photos", StaticFiles(directory=os.path.join(MEDIA_DIR, "photos")), name="photos")
+
+
+class LibraryFiles(StaticFiles):
+    """Images and thumbnails of the library; its captions and index stay private"""
+    async def get_response(self, path, scope):
+        if os.path.splitext(path)[1].lower() not in IMAGE_EXTENSIONS:
+            raise HTTPException(status_code=404, detail="Not Found")
+        return await super().get_response(path, scope)
+
+
+app.mount("/media/library", LibraryFiles(directory=IMAGE_LIBRARY_DIR), name="library")
+
+
+@app.get("/api/health")
+async def health():
+    """Liveness probe used by docker-compose"""
+    return {"status": "ok", "environment": ENVIRONMENT}
+
+
+async def fetch_upstream_images(client, query, per_page):
+    """Search the upstream provider and normalize its results"""
+    response = await client.get(
+        f"{UNSPLASH_API_URL}/search/photos",
+        params={"query": query, "per_page": per_page},
+        headers={"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}", "Accept-Version": "v1"}
+    )
+    response.raise_for_status()
+    return [
+        {
+            "url": photo["urls"]["regular"],
+            "thumb": photo["urls"]["small"],
+            "description": photo.get("alt_description") or query,
+            "author": photo.get("user", {}).get("name", "")
+        }
+        for photo in response.json().get("results", [])
+    ]
+
+
+async def find_images(q, per_page):
+    """Search answer for a query; raises httpx.HTTPError when the provider fails"""
+    # The local library answers without a network round trip; only its
+    # misses go to the provider
+    if app.state.image_library:
+        results = app.state.image_library.search(q, per_page)
+        if results:
+            return {"query": q, "source": "library", "results": [
+                dict({key: image[key] for key in ("url", "thumb", "width", "height", "author", "license")},
+                     description=image["caption"] or q) for image in results
+            ]}
+
+    if not UNSPLASH_ACCESS_KEY:
+        results = [{"url": url, "thumb": url, "description": q, "author": ""} for url in DEMO_IMAGES[:per_page]]
+        return {"query": q, "source": "demo", "results": results}
+
+    # Variants of a query share one cache entry and one upstream search
+    normalized = normalize_query(q) or q.strip()
+    results, cache_status = await app.state.image_cache.get(
+        (normalized, per_page), lambda: fetch_upstream_images(app.state.http, normalized, per_page)
+    )
+    return {"query": q, "source": "upstream", "cache": cache_status, "results": results}
+
+
+@app.get("/api/images/search")
+async def search_images(q: str = Query(..., min_length=1, max_length=200), per_page: int = Query(4, ge=1, le=30)):
+    """Image search for the /image command of the assistant widget"""
+    try:
+        return await find_images(q, per_page)
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail="Image provider unavailable")
+
+
+@app.get("/api/images/cache")
+async def image_cache_stats():
+    """Hit/miss counters of the image search cache"""
+    return app.state.image_cache.stats()
+
+
+@app.get("/api/images/library")
+async def image_library_stats():
+    """Size and hit/miss counters of the local image library"""
+    if not app.state.image_library:
+        return {"indexed": False}
+    return dict(app.state.image_library.stats(), indexed=True)
+
+
+class AssistantMessage(BaseModel):
+    message: str = Field(..., min_length=1, max_length=2000)
+    # Intent of the assistant's previous answer, for "oui" to accept what it offered
+    previousIntent: Optional[str] = Field(None, max_length=64)
+
+
+@app.post("/api/assistant/message")
+async def assistant_message(request: AssistantMessage):
+    """Reply of the assistant widget and the actions it should run"""
+    return app.state.assistant.reply(request.message, request.previousIntent)
+
+
+async def assistant_events(answer, per_page=4):
+    """Frames of one answer: intent and actions, the reply token by token, image results, done"""
+    yield event("intent", {key: answer[key] for key in ("intent", "actions", "offer", "matched")})
+    for token in reply_tokens(answer["reply"]):
+        yield event("token", {"text": token})
+    for action in answer["actions"]:
+        if action["type"] == "imageSearch":
+            try:
+                yield event("images", await find_images(action["query"], per_page))
+            except httpx.HTTPError:
+                yield event("error", {"detail": "Image provider unavailable"})
+    yield event("done", {})
+
+
+@app.post("/api/assistant/stream")
+async def assistant_stream(request: Request, message: AssistantMessage):
+    """The answer as server-sent events, the search it asks for included"""
+    answer = app.state.assistant.reply(message.message, message.previousIntent)
+    client = request.client.host if request.client else ""
+    try:
+        app.state.assistant_streams.acquire(client)
+    except StreamLimitError as e:
+        raise HTTPException(status_code=e.status, detail=str(e), headers={"Retry-After": "1"})
+    return EventStreamResponse(with_heartbeats(assistant_events(answer), ASSISTANT_HEARTBEAT),
+                               app.state.assistant_streams, client, ASSISTANT_SEND_TIMEOUT)
+
+
+@app.get("/api/assistant/stats")
+async def assistant_stats():
+    """Size of the phrase table, intents matched so far and open streams"""
+    return dict(app.state.assistant.stats(), streams=app.state.assistant_streams.stats())
+
+
+def cached_response(request, entry, media_type, cache_control):
+    """`entry` is (body, strong ETag); 304 when the client already has it"""
+    body, etag = entry
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
+
+
+@app.get("/api/templates/catalog.json")
+async def template_catalog(request: Request):
+    """Template metadata and thumbnail URLs (relative to this document)"""
+    return cached_response(request, app.state.catalog.catalog, "application/json",
+                           "public, max-age=3600, stale-while-revalidate=86400")
+
+
+@app.get("/api/templates/thumbnails/{template_id}/{site_type}.svg")
+async def template_thumbnail(request: Request, template_id: str, site_type: str):
+    """Preview of a template for a site type; URLs carry a content hash, so they never change"""
+    entry = app.state.catalog.thumbnail(template_id, site_type)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Unknown template or site type")
+    return cached_response(request, entry, "image/svg+xml", "public, max-age=31536000, immutable")
+
+
+def photo_response(request, photo_id, manifest):
+    """Variant URLs, one srcset per format, and a default JPEG src"""
+    variants = [
+        dict(variant, url=str(request.url_for("photos", path=app.state.photos.relative_path(photo_id, variant["file"]))))
+        for variant in manifest["variants"]
+    ]
+    srcset = {}
+    for variant in sorted(variants, key=lambda variant: variant["width"]):
+        srcset.setdefault(variant["type"], []).append(f"{variant['url']} {variant['width']}w")
+    src = default_variant({"variants": variants})
+    return {
+        "id": photo_id,
+        "width": manifest["width"],
+        "height": manifest["height"],
+        "src": src["url"],
+        "srcset": {mime_type: ", ".join(entries) for mime_type, entries in srcset.items()},
+        "variants": variants
+    }
+
+
+@app.post("/api/photos", status_code=201)
+async def upload_photo(request: Request):
+    """Photo sent as the raw request body, streamed to disk and resized"""
+    if not request.headers.get("content-type", "").startswith("image/"):
+        raise HTTPException(status_code=415, detail="Send the photo as the request body with an image/* content type")
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > MAX_PHOTO_BYTES:
+        raise HTTPException(status_code=413, detail=f"Photo larger than {MAX_PHOTO_BYTES // (1024 * 1024)} MB")
+    try:
+        photo_id, manifest = await app.state.photos.save(request.stream())
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    return photo_response(request, photo_id, manifest)
+
+
+def collect_assets(grace_seconds):
+    """Drop unreferenced assets from the index, then their files"""
+    collected = app.state.assets.collect(grace_seconds)
+    for digest in collected:
+        app.state.photos.remove(digest)
+    return collected
+
+
+async def collect_assets_periodically():
+    while True:
+        await asyncio.sleep(ASSET_GC_INTERVAL)
+        collect_assets(ASSET_GC_GRACE)
+
+
+@app.get("/api/assets/stats")
+async def asset_stats():
+    """Stored, deduplicated and unreferenced asset counts"""
+    return app.state.assets.stats()
+
+
+PageName = Literal[tuple(PAGES)]
+
+
+class SocialMedia(BaseModel):
+    facebook: str = ""
+    instagram: str = ""
+    linkedin: str = ""
+    twitter: str = ""
+
+
+class Photo(BaseModel):
+    """Either an uploaded photo (id/url from /api/photos) or a data URL"""
+    name: str = ""
+    dataURL: str = ""
+    id: str = ""
+    url: str = ""
+
+
+class WebsiteData(BaseModel):
+    """Same shape as websiteData in index.html"""
+    businessName: str = Field(..., min_length=1, max_length=200)
+    description: str = ""
+    siteType: str = ""
+    userEmail: str = ""
+    phone: str = ""
+    address: str = ""
+    website: str = ""
+    slogan: str = ""
+    teamInfo: str = ""
+    servicesDetail: str = ""
+    socialMedia: SocialMedia = SocialMedia()
+    selectedPages: List[PageName] = Field(default_factory=lambda: list(PAGES))
+    photos: List[Photo] = []
+    # Hex colors only: they end up inside the pages' <style> theme block
+    primaryColor: str = Field("", pattern=r"^(#[0-9a-fA-F]{3,8})?$")
+    secondaryColor: str = Field("", pattern=r"^(#[0-9a-fA-F]{3,8})?$")
+
+
+class RenderRequest(BaseModel):
+    templateId: str
+    websiteData: WebsiteData
+
+
+def render_arguments(request):
+    if request.templateId not in TEMPLATES_BY_ID:
+        raise HTTPException(status_code=404, detail=f"Unknown template: {request.templateId}")
+    return request.templateId, request.websiteData.model_dump()
+
+
+@app.post("/api/render")
+async def render_site(request: RenderRequest):
+    """Every selected page of a site, keyed by page"""
+    template_id, data = render_arguments(request)
+    return {"templateId": template_id, "theme": app.state.renderer.theme(template_id, data),
+            "pages": app.state.renderer.render_site(template_id, data)}
+
+
+@app.get("/api/render/cache")
+async def render_cache_stats():
+    """Hit rates of the fragment cache, overall and per fragment"""
+    return app.state.renderer.fragments.stats()
+
+
+@app.post("/api/render/{page}", response_class=HTMLResponse)
+async def render_page(page: PageName, request: RenderRequest):
+    """One page of a site as HTML"""
+    template_id, data = render_arguments(request)
+    return HTMLResponse(app.state.renderer.render_page(template_id, data, page))
+
+
+def saved_site(site_id):
+    site = app.state.sites.get(site_id)
+    if site is None:
+        raise HTTPException(status_code=404, detail="Site not found")
+    return site
+
+
+@app.post("/api/sites", status_code=201)
+async def save_site(request: RenderRequest, authorization: Optional[str] = Header(None)):
+    """Save a site under the signed-in account; its uploaded photos are kept while it exists"""
+    user = signed_in_user(authorization)
+    template_id, data = render_arguments(request)
+    return {"id": app.state.sites.save(template_id, data, user["email"])}
+
+
+def batch_arguments(request):
+    """(template_id, data) of one batch row; ValueError if invalid"""
+    try:
+        site = RenderRequest.model_validate(request)
+    except ValidationError as error:
+        raise ValueError("; ".join(f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}"
+                                   for detail in error.errors()))
+    if site.templateId not in TEMPLATES_BY_ID:
+        raise ValueError(f"Unknown template: {site.templateId}")
+    return site.templateId, site.websiteData.model_dump()
+
+
+BATCH_FORMATS = {"application/x-ndjson": ndjson_records, "application/jsonl": ndjson_records, "text/csv": csv_records}
+
+
+@app.post("/api/batch/render")
+async def render_batch(
+    request: Request,
+    save: bool = Query(False, description="Also save every valid site under the signed-in account"),
+    authorization: Optional[str] = Header(None)
+):
+    """Sites sent as NDJSON or CSV, answered with one NDJSON line per site as each is rendered
+
+    Lines carry the row number (from 1, in input order) and either the pages
+    or an error; the last line is a {"done": true, ...} summary.
+    """
+    owner_email = signed_in_user(authorization)["email"] if save else None
+    parse = BATCH_FORMATS.get(request.headers.get("content-type", "").split(";")[0].strip())
+    if parse is None:
+        raise HTTPException(status_code=415, detail=f"Send the sites as {' or '.join(BATCH_FORMATS)}")
+    try:
+        body = await spool(request.stream(), MAX_BATCH_BYTES)
+    except BatchError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    return StreamingResponse(
+        app.state.batch.render(parse(read_lines(file_chunks(body))), batch_arguments,
+                               partial(app.state.sites.save, owner_email=owner_email) if save else None),
+        media_type="application/x-ndjson"
+    )
+
+
+@app.get("/api/batch/stats")
+async def batch_stats():
+    return app.state.batch.stats()
+
+
+def owned_site(site_id, authorization):
+    """A saved site of the signed-in user; 404 for anyone else's, as for a missing one"""
+    user = signed_in_user(authorization)
+    site = app.state.sites.get(site_id)
+    if site is None or site["ownerEmail"] != user["email"]:
+        raise HTTPException(status_code=404, detail="Site not found")
+    return site
+
+
+@app.get("/api/sites")
+async def list_sites(
+    authorization: Optional[str] = Header(None),
+    q: str = Query(None, min_length=1, max_length=200),
+    after: float = Query(None, description="Sent at or after this Unix time"),
+    before: float = Query(None, description="Sent before this Unix time"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str = Query(None, max_length=200)
+):
+    """Sites of the signed-in user, newest first; pass nextCursor back as cursor for the next page"""
+    user = signed_in_user(authorization)
+    try:
+        sites, next_cursor = app.state.sites.list(user["email"], q, after, before, limit, cursor)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    return {"sites": sites, "nextCursor": next_cursor}
+
+
+@app.get("/api/sites/stats")
+async def site_stats():
+    return app.state.sites.stats()
+
+
+@app.get("/api/sites/{site_id}")
+async def get_site(site_id: str, authorization: Optional[str] = Header(None)):
+    return owned_site(site_id, authorization)
+
+
+@app.delete("/api/sites/{site_id}", status_code=204)
+async def delete_site(site_id: str, authorization: Optional[str] = Header(None)):
+    """Delete a site; its photos are collected once no other site uses them"""
+    owned_site(site_id, authorization)
+    if not app.state.sites.delete(site_id):
+        raise HTTPException(status_code=404, detail="Site not found")
+    return Response(status_code=204)
+
+
+# The export (and its sizes) is linked from the delivery email and fetched
+# without a session: the site id in its URL is the capability. Ids are random
+# UUIDs (122 bits), only ever listed to the site's owner.
+@app.get("/api/sites/{site_id}/export")
+async def export_site(site_id: str):
+    """ZIP of the site (pages, stylesheet, image variants), streamed as built"""
+    site = saved_site(site_id)
+    return StreamingResponse(
+        stream_site_zip(app.state.renderer, app.state.photos, site),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{slugify(site["websiteData"]["businessName"])}.zip"'}
+    )
+
+
+@app.get("/api/sites/{site_id}/export/sizes")
+async def site_export_sizes(site_id: str):
+    """Page and stylesheet bytes of the export, with inline styles and once hoisted"""
+    return export_sizes(app.state.renderer, app.state.photos, saved_site(site_id))
+
+
+def delivery_message(delivery):
+    """Build the email of a claimed delivery (called by the mail workers)"""
+    site = app.state.sites.get(delivery["site_id"])
+    if site is None:
+        raise PermanentDeliveryError(f"Site {delivery['site_id']} no longer exists")
+    return site_ready_message(site, delivery["recipient"], MAIL_FROM,
+                              f"{PUBLIC_API_URL}/api/sites/{delivery['site_id']}/export")
+
+
+@app.post("/api/sites/{site_id}/deliveries", status_code=202)
+async def deliver_site(site_id: str, authorization: Optional[str] = Header(None)):
+    """Queue the delivery email of a site to its owner; poll /api/deliveries/{id} for its status"""
+    site = owned_site(site_id, authorization)
+    delivery_id = app.state.deliveries.enqueue(site_id, site["ownerEmail"])
+    app.state.mailer.notify()
+    return {"id": delivery_id, "status": "queued"}
+
+
+@app.get("/api/deliveries/stats")
+async def delivery_stats():
+    return app.state.mailer.stats()
+
+
+@app.get("/api/deliveries/{delivery_id}")
+async def get_delivery(delivery_id: str):
+    delivery = app.state.deliveries.get(delivery_id)
+    if delivery is None:
+        raise HTTPException(status_code=404, detail="Delivery not found")
+    return delivery
+
+
+class Registration(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    email: str = Field(..., max_length=254, pattern=r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+    password: str = Field(..., min_length=8, max_length=256)
+
+
+class Credentials(BaseModel):
+    email: str = Field(..., max_length=254)
+    password: str = Field(..., max_length=256)
+
+
+def bearer_token(authorization):
+    scheme, _, token = (authorization or "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" else ""
+
+
+def signed_in_user(authorization):
+    """User of the bearer session; 401 without a valid one"""
+    user = app.state.users.authenticate(bearer_token(authorization))
+    if user is None:
+        raise HTTPException(status_code=401, detail="Not signed in")
+    return user
+
+
+@app.post("/api/auth/register", status_code=201)
+async def register(request: Registration):
+    try:
+        token, user = await app.state.users.register(request.name, request.email, request.password)
+    except AuthError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    return {"token": token, "user": user}
+
+
+@app.post("/api/auth/login")
+async def login(request: Credentials):
+    try:
+        token, user = await app.state.users.login(request.email, request.password)
+    except AuthError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    return {"token": token, "user": user}
+
+
+@app.get("/api/auth/me")
+async def current_user(authorization: Optional[str] = Header(None)):
+    return signed_in_user(authorization)
+
+
+@app.post("/api/auth/logout", status_code=204)
+async def logout(authorization: Optional[str] = Header(None)):
+    app.state.users.logout(bearer_token(authorization))
+    return Response(status_code=204)
+
+
+@app.get("/api/auth/stats")
+async def auth_stats():
+    return app.state.users.stats()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("server:app", host=API_HOST, port=API_PORT, reload=ENVIRONMENT == "development")
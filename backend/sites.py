@@ -0,0 +1,168 @@
+"""
+Saved sites
+Each saved site keeps its template id and websiteData payload; photos stored
+by the backend are kept as references (id/url), and the site is registered
+as their owner in the asset index so they outlive the GC grace period. Sites
+live in the asset index's database: a site and its references are written
+in one transaction, so a crash never leaves a saved site's photos to the GC.
+
+Listings only read the indexed summary columns (owner email, business name,
+send date) and page with a keyset cursor, so they cost the same on the first
+page and on the hundredth. Payloads are stored once per distinct content,
+zlib-compressed: the same site sent to several addresses shares one row.
+"""
+
+import base64
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+
+from assets import release_refs, replace_refs
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS site_payloads (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sites (
+    id TEXT PRIMARY KEY,
+    template_id TEXT NOT NULL,
+    owner_email TEXT NOT NULL,
+    business_name TEXT NOT NULL COLLATE NOCASE,
+    pages TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    payload TEXT NOT NULL REFERENCES site_payloads(hash)
+);
+CREATE INDEX IF NOT EXISTS sites_by_owner ON sites(owner_email, sent_at, id);
+CREATE INDEX IF NOT EXISTS sites_by_name ON sites(business_name);
+CREATE INDEX IF NOT EXISTS sites_by_date ON sites(sent_at, id);
+CREATE INDEX IF NOT EXISTS sites_by_payload ON sites(payload);
+"""
+
+SUMMARY_COLUMNS = "id, template_id, owner_email, business_name, pages, sent_at"
+
+
+def encode_cursor(sent_at, site_id):
+    return base64.urlsafe_b64encode(json.dumps([sent_at, site_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(sent_at, id) of the last site of the previous page; ValueError if malformed"""
+    try:
+        sent_at, site_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(sent_at), str(site_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as error:
+        raise ValueError(f"Invalid cursor: {cursor}") from error
+
+
+class SiteStore:
+    def __init__(self, assets, clock=time.time):
+        self.clock = clock
+        self.db = sqlite3.connect(assets.path, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+        # Batch imports save from worker threads: one write transaction at a
+        # time on the shared connection
+        self.write_lock = threading.Lock()
+
+    def close(self):
+        self.db.close()
+
+    def store_payload(self, data):
+        """Compressed payload row for `data`, shared with identical sites"""
+        encoded = json.dumps(data, separators=(",", ":"), ensure_ascii=False, sort_keys=True).encode("utf-8")
+        digest = hashlib.sha256(encoded).hexdigest()
+        self.db.execute("INSERT OR IGNORE INTO site_payloads (hash, data) VALUES (?, ?)",
+                        (digest, zlib.compress(encoded, 6)))
+        return digest
+
+    def insert(self, site_id, template_id, data, owner_email, sent_at):
+        payload = self.store_payload(data)
+        self.db.execute(
+            f"INSERT INTO sites ({SUMMARY_COLUMNS}, payload) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (site_id, template_id, owner_email.strip().lower(), data.get("businessName", ""),
+             ",".join(data.get("selectedPages") or []), sent_at, payload)
+        )
+
+    def save(self, template_id, data, owner_email=""):
+        """Store a site; returns its id"""
+        site_id = uuid.uuid4().hex
+        with self.write_lock, self.db:
+            self.db.execute("BEGIN")
+            self.insert(site_id, template_id, data, owner_email, self.clock())
+            replace_refs(self.db, site_id, [photo["id"] for photo in data.get("photos", []) if photo.get("id")])
+        return site_id
+
+    def get(self, site_id):
+        row = self.db.execute(
+            f"SELECT {SUMMARY_COLUMNS}, site_payloads.data FROM sites "
+            "JOIN site_payloads ON site_payloads.hash = sites.payload WHERE id = ?",
+            (site_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        site = self.summary(row[:6])
+        site["websiteData"] = json.loads(zlib.decompress(row[6]))
+        return site
+
+    def delete(self, site_id):
+        """Remove a site, its payload once unshared, and its photo references"""
+        with self.write_lock, self.db:
+            self.db.execute("BEGIN")
+            row = self.db.execute("DELETE FROM sites WHERE id = ? RETURNING payload", (site_id,)).fetchone()
+            if row is None:
+                return False
+            self.db.execute(
+                "DELETE FROM site_payloads WHERE hash = ? "
+                "AND NOT EXISTS (SELECT 1 FROM sites WHERE payload = ?)",
+                (row[0], row[0])
+            )
+            release_refs(self.db, site_id)
+        return True
+
+    def summary(self, row):
+        return {"id": row[0], "templateId": row[1], "ownerEmail": row[2], "businessName": row[3],
+                "pages": row[4].split(",") if row[4] else [], "sentAt": row[5]}
+
+    def list(self, owner_email=None, name_prefix=None, sent_after=None, sent_before=None, limit=20, cursor=None):
+        """One page of site summaries, newest first
+
+        Returns (summaries, next cursor or None). Payloads are not read.
+        """
+        conditions, parameters = [], []
+        if owner_email:
+            conditions.append("owner_email = ?")
+            parameters.append(owner_email.strip().lower())
+        if name_prefix:
+            escaped = name_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append("business_name LIKE ? ESCAPE '\\'")
+            parameters.append(f"{escaped}%")
+        if sent_after is not None:
+            conditions.append("sent_at >= ?")
+            parameters.append(sent_after)
+        if sent_before is not None:
+            conditions.append("sent_at < ?")
+            parameters.append(sent_before)
+        if cursor:
+            conditions.append("(sent_at, id) < (?, ?)")
+            parameters.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.db.execute(
+            f"SELECT {SUMMARY_COLUMNS} FROM sites {where} ORDER BY sent_at DESC, id DESC LIMIT ?",
+            (*parameters, limit + 1)
+        ).fetchall()
+        next_cursor = encode_cursor(rows[limit - 1][5], rows[limit - 1][0]) if len(rows) > limit else None
+        return [self.summary(row) for row in rows[:limit]], next_cursor
+
+    def stats(self):
+        sites, payloads = self.db.execute(
+            "SELECT (SELECT COUNT(*) FROM sites), (SELECT COUNT(*) FROM site_payloads)"
+        ).fetchone()
+        stored_bytes = self.db.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM site_payloads").fetchone()[0]
+        return {"sites": sites, "payloads": payloads, "payload_bytes": stored_bytes}
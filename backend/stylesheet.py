@@ -0,0 +1,117 @@
+"""
+Shared stylesheet for exported sites
+The generators write every style inline, so the same declarations are
+repeated on every service card, section and footer link of every page.
+Before pages go into the export, identical style attributes are replaced by
+short generated classes (s0, s1, ...) defined once in the site's stylesheet,
+and the base rules of styles.css that match nothing in the site are dropped.
+"""
+
+import re
+from html import unescape
+
+TAG = re.compile(r"<([a-zA-Z][\w-]*)(\s[^>]*)?>")
+STYLE_ATTRIBUTE = re.compile(r'\sstyle="([^"]*)"')
+CLASS_ATTRIBUTE = re.compile(r'\sclass="([^"]*)"')
+# Stay inline: declarations that could end the rule they are moved into, and
+# images (per site, possibly large data URLs)
+KEEP_INLINE = re.compile(r"[{}<\\]|/\*|\*/|url\(", re.I)
+
+CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+CSS_RULE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+PSEUDO = re.compile(r"::?[\w-]+(\([^)]*\))?")
+SIMPLE_SELECTOR = re.compile(r"([.#]?)([a-zA-Z][\w-]*)")
+
+BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def class_name(number):
+    """0 -> 's0', 36 -> 's10'"""
+    digits = ""
+    while True:
+        number, digit = divmod(number, 36)
+        digits = BASE36[digit] + digits
+        if number == 0:
+            return f"s{digits}"
+
+
+class SharedStylesheet:
+    """Hoists the inline styles of one site's pages; pages first, then stylesheet()"""
+    def __init__(self, base_css=""):
+        self.base_css = base_css
+        # declarations -> class name, in order of first use
+        self.classes = {}
+        self.tags = set()
+        self.used_classes = set()
+        self.hoisted = 0
+        self.page_sizes = {}
+
+    def class_for(self, declarations):
+        if declarations not in self.classes:
+            self.classes[declarations] = class_name(len(self.classes))
+        return self.classes[declarations]
+
+    def hoist(self, match):
+        tag, attributes = match.group(1), match.group(2) or ""
+        self.tags.add(tag.lower())
+        for classes in CLASS_ATTRIBUTE.finditer(attributes):
+            self.used_classes.update(classes.group(1).split())
+        style = STYLE_ATTRIBUTE.search(attributes)
+        if style is None:
+            return match.group(0)
+        declarations = unescape(style.group(1)).strip().rstrip(";").strip()
+        if KEEP_INLINE.search(declarations):
+            return match.group(0)
+        without_style = attributes[:style.start()] + attributes[style.end():]
+        if not declarations:
+            return f"<{tag}{without_style}>"
+        name = self.class_for(declarations)
+        self.hoisted += 1
+        existing = CLASS_ATTRIBUTE.search(without_style)
+        if existing is None:
+            # In place of the style attribute
+            return f'<{tag}{attributes[:style.start()]} class="{name}"{attributes[style.end():]}>'
+        return f"<{tag}{without_style[:existing.start(1)]}{name} {without_style[existing.start(1):]}>"
+
+    def extract(self, html, name=None):
+        """`html` with its style attributes replaced by shared classes"""
+        hoisted = TAG.sub(self.hoist, html)
+        if name is not None:
+            self.page_sizes[name] = (len(html.encode("utf-8")), len(hoisted.encode("utf-8")))
+        return hoisted
+
+    def selector_used(self, selector):
+        """Whether a simple selector (tags, classes, *, pseudo-elements) can match the pages"""
+        for prefix, name in SIMPLE_SELECTOR.findall(PSEUDO.sub("", selector)):
+            if prefix == "." and name not in self.used_classes:
+                return False
+            if prefix == "" and name.lower() not in self.tags:
+                return False
+        return True
+
+    def base_rules(self):
+        """Rules of the base stylesheet, with the selectors that match nothing removed"""
+        rules = []
+        for selectors, declarations in CSS_RULE.findall(CSS_COMMENT.sub("", self.base_css)):
+            used = [selector.strip() for selector in selectors.split(",") if self.selector_used(selector.strip())]
+            if used:
+                rules.append(f"{', '.join(used)} {{ {declarations.strip()} }}")
+        return rules
+
+    def stylesheet(self):
+        """Base rules in use, then one rule per hoisted style set"""
+        generated = [f".{name} {{ {declarations} }}" for declarations, name in self.classes.items()]
+        return "\n".join(self.base_rules() + generated) + "\n"
+
+    def report(self):
+        """Bytes of the pages and stylesheet with inline styles (before) and hoisted (after)"""
+        stylesheet_bytes = (len(self.base_css.encode("utf-8")), len(self.stylesheet().encode("utf-8")))
+        pages_before = sum(before for before, _ in self.page_sizes.values())
+        pages_after = sum(after for _, after in self.page_sizes.values())
+        return {
+            "pages": {name: {"before": before, "after": after} for name, (before, after) in self.page_sizes.items()},
+            "stylesheet": {"before": stylesheet_bytes[0], "after": stylesheet_bytes[1]},
+            "total": {"before": pages_before + stylesheet_bytes[0], "after": pages_after + stylesheet_bytes[1]},
+            "classes": len(self.classes),
+            "hoisted_attributes": self.hoisted
+        }
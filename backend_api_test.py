@@ -0,0 +1,1278 @@
+#!/usr/bin/env python3
+"""
+Backend API Test for IA WebGen Pro
+Runs the FastAPI app in-process and checks its endpoints; the server-side
+renderer is compared byte for byte with the generators of index.html (run
+with node). Uploaded media and databases go to temporary directories, and
+delivery emails to a local aiosmtpd server.
+"""
+
+import asyncio
+import gzip
+import io
+import itertools
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("MEDIA_DIR", tempfile.mkdtemp(prefix="webgen-media-"))
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="webgen-data-"))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+SMTP_PORT = free_port()
+os.environ["SMTP_HOST"] = "127.0.0.1"
+os.environ["SMTP_PORT"] = str(SMTP_PORT)
+os.environ["MAIL_BACKOFF"] = "0.05"
+
+import brotli
+import httpx
+from aiosmtpd.controller import Controller
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from assets import AssetIndex
+from catalog import CATALOG_DIR, build_catalog
+from events import HEARTBEAT, EventStreamResponse, StreamLimiter, StreamLimitError, with_heartbeats
+from export import export_photos, stream_site_zip
+from minify import minify_css, minify_html, minify_js
+from fragments import FragmentCache
+from image_library import ImageLibrary, build_index, build_library
+from image_search import ImageSearchCache, normalize_query
+from intents import IntentEngine
+from photos import PhotoStore
+from renderer import PAGES, TEMPLATES, SiteRenderer
+from users import SessionCache
+from server import BATCH_IN_FLIGHT, WebsiteData, app, collect_assets
+
+import build_static
+from static_server import IMMUTABLE_MAX_AGE, StaticServer
+
+SITE_DATA = {
+    "businessName": "Restaurant Le Gourmet",
+    "description": "Un restaurant gastronomique français proposant une cuisine raffinée",
+    "userEmail": "contact@legourmet.fr",
+    "phone": "01 23 45 67 89",
+    "address": "123 Rue de la Gastronomie, 75001 Paris",
+    "slogan": "",
+    "teamInfo": "Une équipe de cuisiniers passionnés.",
+    "servicesDetail": "",
+    "socialMedia": {"facebook": "https://facebook.com/legourmet", "instagram": "", "linkedin": "", "twitter": ""},
+    "photos": [{"name": "photo-1.jpg", "dataURL": "data:image/jpeg;base64,/9j/4AAQSkZJRg=="}]
+}
+
+# The generators of index.html with websiteData set per case; the blog date
+# is formatted as in a French browser
+JS_RENDER = """
+let websiteData, allTemplates = [], selectedTemplate = 0;
+%s
+Date.prototype.toLocaleDateString = function() { return new Intl.DateTimeFormat('fr-FR').format(this); };
+const cases = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+console.log(JSON.stringify(cases.map(([templateId, data]) => {
+    websiteData = data;
+    const pages = {};
+    data.selectedPages.forEach(page => pages[page] = generatePageContent(page));
+    return { pages, theme: siteTheme() };
+})));
+"""
+
+
+def element_styles(html, rules=None):
+    """(tag, declarations, other classes) of every element, styles inline or from `rules`"""
+    elements = []
+    for tag, attributes in re.findall(r"<([a-zA-Z][\w-]*)(\s[^>]*)?>", html):
+        style = re.search(r'\sstyle="([^"]*)"', attributes)
+        classes = re.search(r'\sclass="([^"]*)"', attributes)
+        classes = classes.group(1).split() if classes else []
+        declarations = [(rules or {}).get(name) for name in classes if name in (rules or {})]
+        if style and style.group(1).strip():
+            declarations.append(style.group(1))
+        # As minified in the exported stylesheet
+        declarations = [minify_css(f"*{{{text}}}")[2:-1] for text in declarations]
+        elements.append((tag, declarations, [name for name in classes if name not in (rules or {})]))
+    return elements
+
+
+def extract_generators(html):
+    """The THÈME and GÉNÉRATION DE CONTENU sections of index.html"""
+    return html[html.index("// ========== THÈME"):html.index("// ========== FINALISATION ET ENVOI")]
+
+
+class BackendAPITester:
+    def __init__(self):
+        self.client = TestClient(app)
+        self.tests_run = 0
+        self.tests_passed = 0
+        with open(os.path.join(ROOT, "index.html"), encoding="utf-8") as f:
+            self.index_html = f.read()
+
+    def run_test(self, name, test_func):
+        """Run a single test"""
+        self.tests_run += 1
+        print(f"\n🔍 Testing {name}...")
+
+        try:
+            success = test_func()
+            if success:
+                self.tests_passed += 1
+                print(f"✅ Passed")
+            else:
+                print(f"❌ Failed")
+            return success
+        except Exception as e:
+            print(f"❌ Failed - Error: {str(e)}")
+            return False
+
+    def test_health(self):
+        response = self.client.get("/api/health")
+        return response.status_code == 200 and response.json()["status"] == "ok"
+
+    def form_site_types(self):
+        """Option values of the site type select of index.html"""
+        start = self.index_html.index('id="siteType"')
+        return re.findall(r'<option value="([^"]+)"', self.index_html[start:self.index_html.index("</select>", start)])
+
+    def render_cases(self):
+        """Every template x site type, alternating page sets and optional fields"""
+        site_types = self.form_site_types()
+        cases = []
+        for number, (template, site_type) in enumerate(itertools.product(TEMPLATES, site_types)):
+            data = dict(SITE_DATA, siteType=site_type,
+                        selectedPages=PAGES if number % 2 else ["accueil", "contact"],
+                        primaryColor=template["colors"]["primary"],
+                        secondaryColor=template["colors"]["secondary"])
+            if number % 3 == 0:
+                data.update(photos=[], slogan="L'art de la gastronomie", servicesDetail="Menu du jour",
+                            phone="", address="", socialMedia={name: "" for name in SITE_DATA["socialMedia"]})
+            cases.append((template["id"], data))
+        return cases
+
+    def test_render_parity(self):
+        """Python pages must equal the pages the browser generates"""
+        if not shutil.which("node"):
+            print("⚠️ node not found, parity not checked")
+            return True
+        cases = self.render_cases()
+        result = subprocess.run(["node", "-e", JS_RENDER % extract_generators(self.index_html)],
+                                input=json.dumps(cases), capture_output=True, text=True, encoding="utf-8")
+        if result.returncode != 0:
+            print(result.stderr)
+            return False
+
+        renderer = SiteRenderer()
+        mismatches = 0
+        for (template_id, data), expected in zip(cases, json.loads(result.stdout)):
+            rendered = renderer.render_site(template_id, data)
+            for page, html in expected["pages"].items():
+                if rendered[page] != html:
+                    mismatches += 1
+                    print(f"Mismatch: {template_id} {data['siteType']} {page}")
+            if renderer.theme(template_id, data) != expected["theme"]:
+                mismatches += 1
+                print(f"Theme mismatch: {template_id}")
+        print(f"{len(cases)} sites compared")
+
+        # Colors only live in the theme tokens: recoloring leaves every page as is
+        template_id, data = cases[1]
+        recolored = dict(data, primaryColor="#ff5733", secondaryColor="#33ff57")
+        if renderer.render_site(template_id, recolored) != renderer.render_site(template_id, data):
+            print("Page HTML depends on the colors")
+            return False
+        return mismatches == 0
+
+    def test_static_build(self):
+        """Minified app generates the same pages; the build is served precompressed by Accept-Encoding"""
+        if shutil.which("node"):
+            cases = self.render_cases()[::5]
+            result = subprocess.run(["node", "-e", JS_RENDER % minify_js(extract_generators(self.index_html))],
+                                    input=json.dumps(cases), capture_output=True, text=True, encoding="utf-8")
+            renderer = SiteRenderer()
+            if result.returncode != 0 or any(renderer.render_site(template_id, data) != expected["pages"]
+                                             for (template_id, data), expected in zip(cases, json.loads(result.stdout))):
+                print(f"Minified generators differ: {result.stderr[:500]}")
+                return False
+            scripts = "\n".join(re.findall(r"<script>(.*?)</script>", minify_html(self.index_html), re.S))
+            with tempfile.NamedTemporaryFile("w", suffix=".js", encoding="utf-8", delete=False) as f:
+                f.write(scripts)
+            check = subprocess.run(["node", "--check", f.name], capture_output=True, text=True)
+            os.unlink(f.name)
+            if check.returncode != 0:
+                print(f"Minified script does not parse: {check.stderr[:500]}")
+                return False
+
+        out_dir = tempfile.mkdtemp(prefix="webgen-dist-")
+        sizes = build_static.build(out_dir, api_url="https://api.example.com/")
+        with open(os.path.join(out_dir, "index.html"), encoding="utf-8") as f:
+            if 'const API_BASE_URL="https://api.example.com";' not in f.read():
+                print("The backend URL of the build was not set")
+                return False
+        source, minified, variants = sizes["index.html"]
+        print(f"index.html: {source / 1024:.1f} KB -> {minified / 1024:.1f} KB minified, "
+              f"{variants['gzip'] / 1024:.1f} KB gzip, {variants['br'] / 1024:.1f} KB Brotli")
+        try:
+            answers, catalog = asyncio.run(self.negotiate_encodings(out_dir))
+        finally:
+            shutil.rmtree(out_dir)
+        print(f"Encodings chosen: {answers}")
+        return (answers == {"gzip, deflate, br": "br", "gzip": "gzip", "br;q=0, gzip;q=0.5": "gzip", "identity": "identity"}
+                and catalog.headers["content-encoding"] == "br"
+                and catalog.headers["cache-control"].startswith("public"))
+
+    async def negotiate_encodings(self, out_dir):
+        """Encoding answered for each Accept-Encoding, and the catalog's answer"""
+        server = await StaticServer(out_dir, port=0).start()
+        try:
+            with open(os.path.join(out_dir, "index.html"), "rb") as f:
+                page = f.read()
+            answers = {}
+            async with httpx.AsyncClient(base_url=server.url) as client:
+                for accept in ("gzip, deflate, br", "gzip", "br;q=0, gzip;q=0.5", "identity"):
+                    response = await client.get("/", headers={"Accept-Encoding": accept})
+                    answers[accept] = response.headers.get("content-encoding", "identity")
+                    # httpx decodes gzip and Brotli itself
+                    if response.content != page or response.headers["vary"] != "Accept-Encoding":
+                        answers[accept] = "unexpected"
+                catalog = await client.get("/backend/catalog/catalog.json", headers={"Accept-Encoding": "br"})
+            return answers, catalog
+        finally:
+            await server.stop()
+
+    def test_static_server(self):
+        """Strong ETags with 304, byte ranges, and a year of caching for content-hashed names"""
+        root = tempfile.mkdtemp(prefix="webgen-static-")
+        photo = os.urandom(300 * 1024)
+        os.makedirs(os.path.join(root, "images", "3fa9c2d1e0b4a7f6"))
+        with open(os.path.join(root, "images", "3fa9c2d1e0b4a7f6", "w1600.jpg"), "wb") as f:
+            f.write(photo)
+        for name in ("logo.svg", "cafebabe.svg", "app.3fa9c2d1.svg"):
+            with open(os.path.join(root, name), "w") as f:
+                f.write("<svg xmlns='http://www.w3.org/2000/svg'/>")
+
+        async def raw(server, data, wait=None):
+            """Bytes the server answers to `data` until it closes the connection"""
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            writer.write(data)
+            await writer.drain()
+            if wait:
+                await asyncio.sleep(wait)
+            answer = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return answer
+
+        async def scenario():
+            server = await StaticServer(root, port=0, max_age=600, idle_timeout=0.3).start()
+            url = "/images/3fa9c2d1e0b4a7f6/w1600.jpg"
+            try:
+                async with httpx.AsyncClient(base_url=server.url) as client:
+                    full = await client.get(url)
+                    etag = full.headers["etag"]
+                    revalidated = await client.get(url, headers={"If-None-Match": etag})
+                    ranged = await client.get(url, headers={"Range": "bytes=1000-1999", "If-Range": etag})
+                    suffix = await client.get(url, headers={"Range": "bytes=-500"})
+                    stale = await client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+                    beyond = await client.get(url, headers={"Range": f"bytes={len(photo)}-"})
+                    head = await client.head(url)
+                    logo = await client.get("/logo.svg")
+                    hex_word = await client.get("/cafebabe.svg")
+                    hashed = await client.get("/app.3fa9c2d1.svg")
+                    directory = await client.get("/images")
+                    missing = await client.get("/nothing.html")
+                traversal = server.resolve("/../../etc/passwd")
+                # A body is drained, not read as the next request
+                with_body = await raw(server, b"POST /logo.svg HTTP/1.1\r\nHost: x\r\nContent-Length: 28\r\n\r\n"
+                                              b"GET /nothing.html HTTP/1.1\r\n"
+                                              b"GET /logo.svg HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+                # Headers that never end are cut off by the idle timeout
+                start = time.perf_counter()
+                stalled = await raw(server, b"GET /logo.svg HTTP/1.1\r\nHost: x\r\n")
+                stalled_after = time.perf_counter() - start
+            finally:
+                await server.stop()
+            print(f"Sent {server.requests_served} answers, {server.not_modified} not modified, {server.partial} partial")
+            checks = {
+                "full body": full.status_code == 200 and full.content == photo and etag.startswith('"'),
+                "immutable": full.headers["cache-control"] == f"public, max-age={IMMUTABLE_MAX_AGE}, immutable",
+                "304": revalidated.status_code == 304 and not revalidated.content,
+                "range": (ranged.status_code == 206 and ranged.content == photo[1000:2000]
+                          and ranged.headers["content-range"] == f"bytes 1000-1999/{len(photo)}"),
+                "suffix range": suffix.status_code == 206 and suffix.content == photo[-500:],
+                "If-Range": stale.status_code == 200 and stale.content == photo,
+                "416": beyond.status_code == 416 and beyond.headers["content-range"] == f"bytes */{len(photo)}",
+                "HEAD": head.status_code == 200 and not head.content and head.headers["content-length"] == str(len(photo)),
+                "max-age": logo.headers["cache-control"] == "public, max-age=600" and logo.headers["etag"] != etag,
+                "hashed names": (hex_word.headers["cache-control"] == "public, max-age=600"
+                                 and hashed.headers["cache-control"].endswith("immutable")),
+                "body drained": (with_body.count(b"HTTP/1.1 405") == 1 and with_body.count(b"HTTP/1.1 200") == 1
+                                 and b"404" not in with_body),
+                "header timeout": stalled == b"" and stalled_after < 2,
+                "redirect": directory.status_code == 301 and directory.headers["location"] == "/images/",
+                "404": missing.status_code == 404 and traversal == (None, None)
+            }
+            failed = [name for name, passed in checks.items() if not passed]
+            if failed:
+                print(f"Failed: {failed}")
+            return not failed
+
+        try:
+            return asyncio.run(scenario())
+        finally:
+            shutil.rmtree(root)
+
+    def test_render_speed(self):
+        """A full 8-page site in single-digit milliseconds"""
+        renderer = SiteRenderer()
+        data = dict(SITE_DATA, siteType="restaurant", selectedPages=PAGES)
+        samples = []
+        for _ in range(100):
+            start = time.perf_counter()
+            renderer.render_site("modern-clean", data)
+            samples.append((time.perf_counter() - start) * 1000)
+        median = statistics.median(samples)
+        print(f"8 pages: median {median:.2f} ms, max {max(samples):.2f} ms")
+        return median < 10
+
+    def test_render_endpoints(self):
+        payload = {"templateId": "luxury-gold", "websiteData": dict(SITE_DATA, selectedPages=["accueil", "blog"])}
+        site = self.client.post("/api/render", json=payload)
+        if site.status_code != 200 or list(site.json()["pages"]) != ["accueil", "blog"]:
+            print(f"Unexpected /api/render answer: {site.status_code}")
+            return False
+        page = self.client.post("/api/render/contact", json=payload)
+        if page.status_code != 200 or not page.headers["content-type"].startswith("text/html"):
+            print(f"Unexpected /api/render/contact answer: {page.status_code}")
+            return False
+        unknown_template = self.client.post("/api/render", json=dict(payload, templateId="unknown"))
+        unknown_page = self.client.post("/api/render/unknown", json=payload)
+        return unknown_template.status_code == 404 and unknown_page.status_code == 422
+
+    def test_fragment_cache(self):
+        """Shared fragments render once; a cache too small to hold them changes nothing"""
+        cases = self.render_cases()
+        cached = SiteRenderer()
+        uncached = SiteRenderer(fragments=FragmentCache(max_bytes=0))
+        for template_id, data in cases:
+            if cached.render_site(template_id, data) != uncached.render_site(template_id, data):
+                print(f"Cached render differs: {template_id} {data['siteType']}")
+                return False
+        stats = cached.fragments.stats()
+        print(f"{len(cases)} sites: {stats['entries']} fragments, {stats['bytes'] // 1024} KB, "
+              f"hit rate {stats['hit_rate']:.1%}")
+        # Three service groups, two page sets, one date
+        if stats["kinds"]["service_cards"]["misses"] != 3 or stats["kinds"]["header_nav"]["misses"] != 2:
+            print(f"Unexpected misses: {stats['kinds']}")
+            return False
+        if uncached.fragments.stats()["entries"] != 0:
+            return False
+
+        small = SiteRenderer(fragments=FragmentCache(max_bytes=16 * 1024))
+        for template_id, data in cases:
+            small.render_site(template_id, data)
+        small_stats = small.fragments.stats()
+        if small_stats["bytes"] > 16 * 1024 or small_stats["evictions"] == 0:
+            print(f"Budget not enforced: {small_stats}")
+            return False
+
+        self.client.post("/api/render", json={"templateId": "modern-clean", "websiteData": SITE_DATA})
+        response = self.client.get("/api/render/cache")
+        return stats["hit_rate"] > 0.9 and response.status_code == 200 and response.json()["hits"] > 0
+
+    def test_template_catalog(self):
+        """Catalog and thumbnails with strong ETags; the committed build is current"""
+        catalog_url = "/api/templates/catalog.json"
+        response = self.client.get(catalog_url)
+        catalog = response.json()
+        site_types = self.form_site_types()
+        if (len(catalog["templates"]) != len(TEMPLATES) or list(catalog["siteTypes"]) != site_types
+                or "max-age" not in response.headers["cache-control"]):
+            print("Catalog does not list every template and site type of the form")
+            return False
+        revalidated = self.client.get(catalog_url, headers={"If-None-Match": response.headers["etag"]})
+        if revalidated.status_code != 304 or revalidated.content:
+            print(f"Catalog revalidation answered {revalidated.status_code}")
+            return False
+
+        # Thumbnail URLs are relative to the catalog
+        thumbnail_url = urljoin(catalog_url, catalog["templates"][4]["thumbnails"]["salon"])
+        thumbnail = self.client.get(thumbnail_url)
+        print(f"{len(catalog['templates'])} templates x {len(catalog['siteTypes'])} site types, "
+              f"catalog {len(response.content) / 1024:.1f} KB, thumbnail {len(thumbnail.content) / 1024:.1f} KB")
+        if (thumbnail.headers["content-type"] != "image/svg+xml" or "immutable" not in thumbnail.headers["cache-control"]
+                or catalog["templates"][4]["colors"]["primary"] not in thumbnail.text
+                or self.client.get(thumbnail_url, headers={"If-None-Match": thumbnail.headers["etag"]}).status_code != 304
+                or self.client.get("/api/templates/thumbnails/unknown/salon.svg").status_code != 404):
+            print("Thumbnail not served as a cacheable SVG")
+            return False
+
+        # Regenerating gives the committed files, byte for byte
+        fresh = tempfile.mkdtemp(prefix="webgen-catalog-")
+        try:
+            build_catalog(fresh)
+            stale = [
+                os.path.relpath(os.path.join(folder, name), fresh)
+                for folder, _, names in os.walk(fresh) for name in names
+                if not os.path.exists(os.path.join(CATALOG_DIR, os.path.relpath(os.path.join(folder, name), fresh)))
+                or open(os.path.join(folder, name), "rb").read()
+                != open(os.path.join(CATALOG_DIR, os.path.relpath(os.path.join(folder, name), fresh)), "rb").read()
+            ]
+        finally:
+            shutil.rmtree(fresh)
+        if stale:
+            print(f"backend/catalog is stale, run python backend/catalog.py: {stale[:3]}")
+            return False
+        return "const TEMPLATES" not in self.index_html
+
+    def test_assistant_intents(self):
+        """Accent- and case-folded intents with their actions; matching cost flat from 5 to 500 intents"""
+        def ask(message, previous=None):
+            response = self.client.post("/api/assistant/message", json={"message": message, "previousIntent": previous})
+            return response.json()
+
+        answers = {
+            "help": ask("Peux-tu m'AIDER ?")["intent"],
+            "edit": ask("Active le mode ÉDITION")["actions"],
+            "accept": ask("oui vas-y", "edit")["actions"],
+            "search": ask("Trouve-moi des photos d'un hôtel de charme")["actions"],
+            "command": ask("/image restaurant moderne")["actions"],
+            "colors": ask("Mets le site en bleu")["actions"],
+            "fallback": ask("Quelle heure est-il ?")["intent"]
+        }
+        expected = {
+            "help": "help",
+            "edit": [{"type": "editMode", "enabled": True}],
+            "accept": [{"type": "editMode", "enabled": True}],
+            "search": [{"type": "imageSearch", "query": "hôtel de charme"}],
+            "command": [{"type": "imageSearch", "query": "restaurant moderne"}],
+            "colors": [{"type": "setColors", "primary": "#3b82f6", "secondary": "#1e40af"}],
+            "fallback": "fallback"
+        }
+        failed = [name for name in expected if answers[name] != expected[name]]
+        if failed:
+            print(f"Unexpected answers: {({name: answers[name] for name in failed})}")
+            return False
+
+        rng = random.Random(7)
+        syllables = ["ba", "ko", "ri", "ten", "lu", "mar", "sol", "vi", "que", "dra"]
+        word = lambda: "".join(rng.choice(syllables) for _ in range(3))
+        fallback = ["?"]
+        engines = {}
+        for count in (5, 500):
+            intents = [{"id": f"intent{i}", "phrases": [" ".join(word() for _ in range(rng.randint(1, 3))) for _ in range(6)],
+                        "reply": ""} for i in range(count)]
+            engines[count] = IntentEngine({"intents": intents, "fallback": fallback})
+        messages = [f"Bonjour, je voudrais {word()} le {word()} de mon site {word()} en vert pour mes clients"
+                    for _ in range(300)]
+        timings = {}
+        for count, engine in engines.items():
+            samples = []
+            for _ in range(5):
+                start = time.perf_counter()
+                for message in messages:
+                    engine.match(message)
+                samples.append((time.perf_counter() - start) * 1e6 / len(messages))
+            timings[count] = min(samples)
+        print(f"Per message: {timings[5]:.1f} µs with 5 intents, {timings[500]:.1f} µs with 500 "
+              f"({engines[500].stats()['states']} automaton states)")
+        return timings[500] < timings[5] * 2
+
+    async def asgi_stream(self, path, payload):
+        """(milliseconds since the request, chunk) of every body chunk the app sends"""
+        body = json.dumps(payload).encode()
+        scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+                 "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+                 "root_path": "", "headers": [(b"content-type", b"application/json")],
+                 "client": ("127.0.0.1", 50000), "server": ("testserver", 80)}
+        finished = asyncio.Event()
+        requests = [{"type": "http.request", "body": body, "more_body": False}]
+        chunks = []
+        start = time.perf_counter()
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                chunks.append(((time.perf_counter() - start) * 1000, message["body"]))
+
+        await app(scope, receive, send)
+        finished.set()
+        return chunks
+
+    def test_assistant_stream(self):
+        """SSE answer with its first token in milliseconds; caps, heartbeats and stalled clients"""
+        message = {"message": "Trouve-moi des photos d'un hôtel de charme"}
+        chunks = asyncio.run(self.asgi_stream("/api/assistant/stream", message))
+        body = b"".join(chunk for _, chunk in chunks)
+        frames = [frame.split("\n") for frame in body.decode().split("\n\n") if frame]
+        events = [(lines[0][len("event: "):], json.loads(lines[1][len("data: "):])) for lines in frames]
+        first_token = next(elapsed for elapsed, chunk in chunks if chunk.startswith(b"event: token"))
+        reply = "".join(data["text"] for name, data in events if name == "token")
+        names = [name for name, _ in events]
+        print(f"First token after {first_token:.2f} ms, {len(events)} events")
+        expected_reply = self.client.post("/api/assistant/message", json=message).json()["reply"]
+        if (names[0] != "intent" or names[-2:] != ["images", "done"] or reply != expected_reply
+                or events[-2][1]["query"] != "hôtel de charme" or first_token > 50):
+            print(f"Unexpected stream: {names}")
+            return False
+
+        # The widget's parser, fed the same stream in small pieces with a heartbeat
+        if shutil.which("node"):
+            parser = re.search(r"function readEventStream\(body, onEvent\) \{.*?\nreturn pump\(\);\n\}(?=\n\n)",
+                               self.index_html, re.S).group(0)
+            first_frame = body.index(b"\n\n") + 2
+            sent = body[:first_frame] + HEARTBEAT + body[first_frame:]
+            split = [list(sent[i:i + 7]) for i in range(0, len(sent), 7)]
+            script = parser + """
+const parts = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const events = [];
+const body = new ReadableStream({ start(controller) { parts.forEach(part => controller.enqueue(new Uint8Array(part))); controller.close(); } });
+readEventStream(body, (name, data) => events.push([name, data])).then(() => console.log(JSON.stringify(events)));
+"""
+            result = subprocess.run(["node", "-e", script], input=json.dumps(split), capture_output=True, text=True)
+            if result.returncode != 0 or [tuple(item) for item in json.loads(result.stdout)] != events:
+                print(f"Widget parser disagrees: {result.stderr[:300]}")
+                return False
+
+        limiter = StreamLimiter(max_streams=3, per_client=2)
+        refused = []
+        for client in ("a", "a", "a", "b", "c"):
+            try:
+                limiter.acquire(client)
+            except StreamLimitError as e:
+                refused.append((client, e.status))
+        limiter.release("a")
+        limiter.acquire("c")
+
+        async def stalled_client():
+            """A client that never reads: the first write after the headers never completes"""
+            streams = StreamLimiter()
+            streams.acquire("slow")
+            closed = []
+
+            async def frames():
+                try:
+                    while True:
+                        yield b"event: token\ndata: {}\n\n"
+                finally:
+                    closed.append(True)
+
+            async def send(message):
+                if message["type"] == "http.response.body":
+                    await asyncio.Event().wait()
+
+            async def receive():
+                await asyncio.Event().wait()
+
+            response = EventStreamResponse(frames(), streams, "slow", send_timeout=0.1)
+            start = time.perf_counter()
+            await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+            return time.perf_counter() - start, streams.stats(), closed
+
+        async def slow_frames():
+            await asyncio.sleep(0.13)
+            yield b"event: done\ndata: {}\n\n"
+
+        async def collect(frames):
+            return [frame async for frame in frames]
+
+        heartbeats = asyncio.run(collect(with_heartbeats(slow_frames(), 0.05)))
+        stalled_after, stalled_stats, closed = asyncio.run(stalled_client())
+        open_streams = self.client.get("/api/assistant/stats").json()["streams"]["open"]
+        print(f"Refused: {refused}, {heartbeats.count(HEARTBEAT)} heartbeats, "
+              f"stalled client dropped after {stalled_after:.2f}s")
+        return (refused == [("a", 429), ("c", 503)] and limiter.stats()["open"] == 3
+                and heartbeats.count(HEARTBEAT) == 2 and heartbeats[-1].startswith(b"event: done")
+                and stalled_stats["stalled"] == 1 and stalled_stats["open"] == 0 and closed == [True]
+                and stalled_after < 1 and open_streams == 0)
+
+    def test_query_normalization(self):
+        variants = ["restaurant moderne", "Restaurant Moderne", "moderne, restaurant !", "  RESTAURANT   modernë"]
+        keys = {normalize_query(query) for query in variants}
+        print(f"Normalized keys: {keys}")
+        return keys == {"moderne restaurant"} and normalize_query("Hôtel de charme") == "charme de hotel"
+
+    def test_image_cache(self):
+        """Coalescing, hits, TTL expiry and LRU eviction"""
+        async def scenario():
+            now = [0.0]
+            cache = ImageSearchCache(max_entries=2, ttl=60, clock=lambda: now[0])
+            calls = []
+
+            async def fetch(key):
+                calls.append(key)
+                await asyncio.sleep(0.01)
+                return [key]
+
+            statuses = [status for _, status in await asyncio.gather(
+                *(cache.get("a", lambda: fetch("a")) for _ in range(10))
+            )]
+            if calls != ["a"] or statuses.count("miss") != 1 or statuses.count("coalesced") != 9:
+                print(f"Concurrent misses not coalesced: {calls} {statuses}")
+                return False
+            if (await cache.get("a", lambda: fetch("a")))[1] != "hit":
+                print("Cached value not served")
+                return False
+
+            now[0] = 61
+            await cache.get("a", lambda: fetch("a"))
+            await cache.get("b", lambda: fetch("b"))
+            await cache.get("c", lambda: fetch("c"))
+            stats = cache.stats()
+            print(f"Stats: {stats}")
+            return (calls == ["a", "a", "b", "c"] and stats["expirations"] == 1
+                    and stats["evictions"] == 1 and list(cache.entries) == ["b", "c"])
+
+        return asyncio.run(scenario())
+
+    def test_image_cache_errors(self):
+        """A failed fetch reaches every waiter and is not cached"""
+        async def scenario():
+            cache = ImageSearchCache()
+
+            async def failing():
+                await asyncio.sleep(0.01)
+                raise RuntimeError("upstream down")
+
+            results = await asyncio.gather(*(cache.get("a", failing) for _ in range(3)), return_exceptions=True)
+            value, status = await cache.get("a", lambda: asyncio.sleep(0, result=["ok"]))
+            return (all(isinstance(result, RuntimeError) for result in results)
+                    and cache.upstream_errors == 1 and value == ["ok"] and status == "miss")
+
+        return asyncio.run(scenario())
+
+    def test_image_library(self):
+        """Stemmed French search of a local library, upstream only on misses, sub-millisecond queries"""
+        library_dir = tempfile.mkdtemp(prefix="webgen-library-")
+        entries = [
+            ("terrasse.jpg", "Terrasse ensoleillée d'un restaurant", ["restaurant", "terrasse", "été"]),
+            ("hotel.png", "Chambre d'hôtel de charme", ["hôtel", "chambre", "charme"]),
+            ("cafe.jpg", "Cafés et croissants au comptoir", ["café", "boulangerie"])
+        ]
+        with open(os.path.join(library_dir, "captions.jsonl"), "w", encoding="utf-8") as f:
+            for index, (name, caption, tags) in enumerate(entries):
+                Image.new("RGB", (900 + index, 600), (40 * index, 120, 200)).save(os.path.join(library_dir, name))
+                f.write(json.dumps({"file": name, "caption": caption, "tags": tags,
+                                    "author": "Studio", "license": "CC0"}) + "\n")
+            f.write(json.dumps({"file": "missing.jpg", "caption": "absente", "tags": []}) + "\n")
+            f.write(json.dumps({"file": "captions.jsonl", "caption": "pas une image", "tags": []}) + "\n")
+        stats, skipped = build_library(library_dir)
+        if stats["documents"] != 3 or len(skipped) != 2:
+            print(f"Unexpected build: {stats} {skipped}")
+            return False
+
+        library = ImageLibrary.open(library_dir, "http://testserver/media/library")
+        found = {query: [image["file"] for image in library.search(query)]
+                 for query in ("terrasses ensoleillees", "HÔTELS", "cafe", "chambres de charme", "piscine")}
+        expected = {"terrasses ensoleillees": ["terrasse.jpg"], "HÔTELS": ["hotel.png"], "cafe": ["cafe.jpg"],
+                    "chambres de charme": ["hotel.png"], "piscine": []}
+        if found != expected:
+            print(f"Unexpected matches: {found}")
+            return False
+        library.close()
+
+        previous = app.state.image_library
+        app.state.image_library = library = ImageLibrary.open(library_dir, "http://testserver/media/library")
+        try:
+            hit = self.client.get("/api/images/search", params={"q": "terrasse de restaurant"}).json()
+            miss = self.client.get("/api/images/search", params={"q": "piscine"}).json()
+            stats = self.client.get("/api/images/library").json()
+        finally:
+            app.state.image_library = previous
+            library.close()
+        if "directory" in stats:
+            print("Library stats expose a server path")
+            return False
+        # Only images are served from the library directory
+        served = os.path.join(os.environ["MEDIA_DIR"], "library")
+        shutil.copy(os.path.join(library_dir, "terrasse.jpg"), served)
+        for name in ("captions.jsonl", "index.bin"):
+            shutil.copy(os.path.join(library_dir, name), served)
+        answers = {name: self.client.get(f"/media/library/{name}").status_code
+                   for name in ("terrasse.jpg", "captions.jsonl", "index.bin")}
+        if answers != {"terrasse.jpg": 200, "captions.jsonl": 404, "index.bin": 404}:
+            print(f"Unexpected library files answers: {answers}")
+            return False
+        thumb = hit["results"][0]["thumb"]
+        if hit["source"] != "library" or miss["source"] == "library" or not thumb.endswith(".jpg"):
+            print(f"Unexpected answers: {hit} {miss}")
+            return False
+        with Image.open(os.path.join(library_dir, thumb.split("/media/library/")[1])) as image:
+            if max(image.size) > 400:
+                print(f"Thumbnail not reduced: {image.size}")
+                return False
+
+        # Synthetic catalog: 20,000 images over a 2,000 word vocabulary
+        rng = random.Random(11)
+        syllables = ["ba", "ko", "ri", "ten", "lu", "mar", "sol", "vi", "que", "dra"]
+        vocabulary = sorted({"".join(rng.choice(syllables) for _ in range(4)) for _ in range(2000)})
+        records = [{"file": f"{i}.jpg", "thumb": f"thumbnails/{i}.jpg",
+                    "caption": " ".join(rng.choice(vocabulary) for _ in range(12)),
+                    "tags": [rng.choice(vocabulary) for _ in range(4)]} for i in range(20000)]
+        path = os.path.join(library_dir, "large.bin")
+        large = build_index(records, path)
+        library = ImageLibrary(path)
+        queries = [" ".join(rng.choice(vocabulary) for _ in range(3)) for _ in range(500)]
+        samples = []
+        for _ in range(3):
+            start = time.perf_counter()
+            for query in queries:
+                library.search(query, 4)
+            samples.append((time.perf_counter() - start) * 1000 / len(queries))
+        library.close()
+        print(f"Library endpoint stats: {stats}")
+        print(f"Per query: {min(samples):.3f} ms over {large['documents']} images "
+              f"({large['terms']} terms, {large['bytes'] / 1024 / 1024:.1f} MB index)")
+        return stats["hits"] == 1 and stats["misses"] == 1 and min(samples) < 1
+
+    def test_photo_upload(self):
+        """Streamed upload, WebP/JPEG variants, srcset and deduplication"""
+        photo = io.BytesIO()
+        Image.linear_gradient("L").resize((2000, 1200)).convert("RGB").save(photo, "JPEG")
+        headers = {"content-type": "image/jpeg"}
+        response = self.client.post("/api/photos", content=photo.getvalue(), headers=headers)
+        if response.status_code != 201:
+            print(f"Upload failed: {response.status_code} {response.text}")
+            return False
+        result = response.json()
+        widths = sorted({variant["width"] for variant in result["variants"]})
+        types = {variant["type"] for variant in result["variants"]}
+        print(f"{result['width']}x{result['height']} -> widths {widths}, {sorted(types)}")
+        if widths != [320, 640, 1024, 1600] or types != {"image/webp", "image/jpeg"}:
+            return False
+        if result["srcset"]["image/webp"].count("w,") != 3 or not result["src"].endswith("/w1600.jpg"):
+            print(f"Unexpected srcset/src: {result['srcset']} {result['src']}")
+            return False
+        if self.client.get(result["src"]).status_code != 200:
+            print("Variant not served")
+            return False
+
+        again = self.client.post("/api/photos", content=photo.getvalue(), headers=headers)
+        not_image = self.client.post("/api/photos", content=b"not an image", headers=headers)
+        wrong_type = self.client.post("/api/photos", content=b"text", headers={"content-type": "text/plain"})
+        if not (again.json()["id"] == result["id"] and not_image.status_code == 415
+                and wrong_type.status_code == 415):
+            return False
+
+        # Simultaneous uploads of the same bytes: resized once, each one counted
+        results, resizes, stats = asyncio.run(self.concurrent_uploads(photo.getvalue()))
+        print(f"{len(results)} simultaneous uploads, {resizes} resize(s), {stats['uploads']} uploads recorded")
+        return (resizes == 1 and stats["assets"] == 1 and stats["uploads"] == len(results)
+                and all(result == results[0] for result in results))
+
+    async def concurrent_uploads(self, data, count=8):
+        """(results, resizes, asset stats) of `count` uploads of `data` at once to a fresh store"""
+        class CountingPool(ThreadPoolExecutor):
+            submitted = 0
+            def submit(self, fn, *args):
+                self.submitted += 1
+                return super().submit(fn, *args)
+
+        async def chunks():
+            yield data
+
+        root = tempfile.mkdtemp(prefix="webgen-photos-")
+        assets = AssetIndex(os.path.join(root, "assets.db"))
+        try:
+            with CountingPool(4) as pool:
+                store = PhotoStore(root, pool, assets)
+                results = await asyncio.gather(*(store.save(chunks()) for _ in range(count)))
+            return results, pool.submitted, assets.stats()
+        finally:
+            assets.close()
+            shutil.rmtree(root)
+
+    def test_asset_refs_and_gc(self):
+        """Shared photo kept while any site references it, collected after"""
+        photo = io.BytesIO()
+        Image.new("RGB", (400, 300), "#f59e0b").save(photo, "PNG")
+        headers = {"content-type": "image/png"}
+        photo_id = self.client.post("/api/photos", content=photo.getvalue(), headers=headers).json()["id"]
+        self.client.post("/api/photos", content=photo.getvalue(), headers=headers)
+        stats = self.client.get("/api/assets/stats").json()
+        if stats["deduplicated_bytes"] <= 0:
+            print(f"Duplicate upload not deduplicated: {stats}")
+            return False
+
+        if self.client.put("/api/assets/refs/site-a", json={"assets": []}).status_code not in (404, 405):
+            print("Asset references can be rewritten over HTTP")
+            return False
+        # References are written by saving and deleting sites only
+        headers = self.session_headers("photographer@example.com")
+        data = dict(SITE_DATA, photos=[{"id": photo_id, "url": ""}, {"id": "0" * 64, "url": ""}])
+        site_a, site_b = [self.client.post("/api/sites", json={"templateId": "modern-clean", "websiteData": data},
+                                           headers=headers).json()["id"]
+                          for _ in range(2)]
+        if app.state.assets.refcount(photo_id) != 2 or app.state.assets.refcount("0" * 64) != 0:
+            print("Saved sites do not reference their photos")
+            return False
+        self.client.delete(f"/api/sites/{site_a}", headers=headers)
+        if photo_id in collect_assets(0):
+            print("Photo still referenced by site-b was collected")
+            return False
+
+        self.client.delete(f"/api/sites/{site_b}", headers=headers)
+        collected = collect_assets(0)
+        if (self.client.post("/api/assets/gc", params={"grace": 0}).status_code not in (404, 405)
+                or self.client.get("/media/assets.db").status_code != 404):
+            print("Collection or asset index exposed over HTTP")
+            return False
+        photo_dir = os.path.join(os.environ["MEDIA_DIR"], "photos", photo_id[:2], photo_id)
+        print(f"Collected {len(collected)} asset(s)")
+        return photo_id in collected and not os.path.exists(photo_dir)
+
+    def test_site_export(self):
+        """Saved site exported as a ZIP of pages, stylesheet and variants"""
+        photo = io.BytesIO()
+        Image.effect_noise((1800, 1200), 80).convert("RGB").save(photo, "JPEG", quality=95)
+        upload = self.client.post("/api/photos", content=photo.getvalue(), headers={"content-type": "image/jpeg"}).json()
+        data = dict(SITE_DATA, siteType="restaurant", selectedPages=PAGES,
+                    photos=[{"id": upload["id"], "url": upload["src"], "name": "photo-1.jpg"}])
+        site_id = self.client.post("/api/sites", json={"templateId": "fresh-green", "websiteData": data},
+                                   headers=self.session_headers("export@example.com")).json()["id"]
+        if app.state.assets.refcount(upload["id"]) != 1:
+            print("Saved site does not reference its photo")
+            return False
+
+        response = self.client.get(f"/api/sites/{site_id}/export")
+        archive = zipfile.ZipFile(io.BytesIO(response.content))
+        names = archive.namelist()
+        print(f"{len(response.content) / 1024:.0f} KB, {len(names)} files")
+        files = ["index.html"] + [f"{page}.html" for page in PAGES[1:]] + ["styles.css"]
+        expected = [name + suffix for name in files for suffix in ("", ".br", ".gz")]
+        if names[:len(expected)] != expected or len(names) != len(expected) + len(upload["variants"]):
+            print(f"Unexpected archive content: {names}")
+            return False
+        index = archive.read("index.html").decode("utf-8")
+        hero = f"images/{upload['id'][:16]}/w1600.jpg"
+        if archive.testzip() is not None or hero not in index or 'href="contact.html"' not in index:
+            print("Pages do not point at the archived files")
+            return False
+        if ":root{--site-primary:#10b981;--site-secondary:#047857}" not in index:
+            print("Exported pages do not declare the theme tokens")
+            return False
+
+        # Inline styles hoisted into styles.css: every element keeps its declarations
+        stylesheet = archive.read("styles.css").decode("utf-8")
+        rules = dict(re.findall(r"\.(s[0-9a-z]+)\{([^}]*)\}", stylesheet))
+        site = app.state.sites.get(site_id)
+        exported_data, _ = export_photos(site["websiteData"], app.state.photos)
+        for name, inline in app.state.renderer.export_documents("fresh-green", exported_data):
+            hoisted = archive.read(name).decode("utf-8")
+            # Only the hero keeps its style inline, for its image
+            if (len(re.findall(r'style="', hoisted)) > len(re.findall(r'style="[^"]*url\(', hoisted))
+                    or element_styles(hoisted, rules) != element_styles(inline)):
+                print(f"{name}: hoisted styles differ from the inline ones")
+                return False
+            if (gzip.decompress(archive.read(f"{name}.gz")) != archive.read(name)
+                    or brotli.decompress(archive.read(f"{name}.br")) != archive.read(name)):
+                print(f"{name}: precompressed variants differ from the page")
+                return False
+        sizes = self.client.get(f"/api/sites/{site_id}/export/sizes").json()
+        saved = 1 - sizes["total"]["after"] / sizes["total"]["before"]
+        print(f"Pages + stylesheet: {sizes['total']['before'] / 1024:.1f} KB -> {sizes['total']['after'] / 1024:.1f} KB "
+              f"({saved:.0%} less), {sizes['classes']} classes for {sizes['hoisted_attributes']} style attributes")
+        minified = sizes["minified"]
+        print(f"Minified: {minified['identity'] / 1024:.1f} KB, gzip {minified['gzip'] / 1024:.1f} KB, "
+              f"Brotli {minified['br'] / 1024:.1f} KB")
+        if saved < 0.3:
+            return False
+        # Without a contact page, its form rules are dropped from the stylesheet
+        no_form = app.state.sites.save("fresh-green", dict(data, selectedPages=["accueil", "services"]))
+        short = zipfile.ZipFile(io.BytesIO(self.client.get(f"/api/sites/{no_form}/export").content))
+        if "textarea" not in stylesheet or "textarea" in short.read("styles.css").decode("utf-8"):
+            print("Unused base rules were not stripped")
+            return False
+
+        # Flat memory: no chunk is much larger than one copy buffer
+        largest_chunk = max(len(chunk) for chunk in stream_site_zip(app.state.renderer, app.state.photos, site))
+        print(f"Largest streamed chunk: {largest_chunk / 1024:.0f} KB")
+        return largest_chunk < 256 * 1024 and self.client.get("/api/sites/unknown/export").status_code == 404
+
+    def test_site_listing(self):
+        """Sites listed per owner, newest first, with a keyset cursor"""
+        owner = "Power.User@example.com"
+        headers, other = self.session_headers(owner), self.session_headers("other@example.com")
+        saved = []
+        for number in range(120):
+            data = dict(SITE_DATA, businessName=f"{'Boulangerie' if number % 3 else 'Café'} {number:03d}")
+            # The owner is the session's account, whatever the body claims
+            request = {"templateId": "modern-clean", "websiteData": data, "ownerEmail": owner}
+            site_id = self.client.post("/api/sites", json=request, headers=headers if number % 4 else other).json()["id"]
+            saved.append((owner if number % 4 else "other@example.com", site_id))
+
+        if (self.client.get("/api/sites").status_code != 401
+                or self.client.post("/api/sites", json={"templateId": "modern-clean", "websiteData": SITE_DATA}).status_code != 401):
+            print("Sites listed or saved without a session")
+            return False
+        listed, cursor, pages = [], None, 0
+        while True:
+            params = {"limit": 25, **({"cursor": cursor} if cursor else {})}
+            page = self.client.get("/api/sites", params=params, headers=headers).json()
+            listed.extend(page["sites"])
+            pages += 1
+            cursor = page["nextCursor"]
+            if not cursor:
+                break
+        expected = [site_id for email, site_id in saved if email == owner]
+        print(f"{len(listed)} sites of the owner in {pages} pages")
+        if [site["id"] for site in listed] != expected[::-1] or "websiteData" in listed[0]:
+            print("Owner listing is not the owner's sites, newest first, without payloads")
+            return False
+
+        cafes = self.client.get("/api/sites", params={"q": "café", "limit": 100}, headers=headers).json()["sites"]
+        if len(cafes) != 30 or any(not site["businessName"].startswith("Café") for site in cafes):
+            print(f"Name search returned {len(cafes)} sites")
+            return False
+        if self.client.get("/api/sites", params={"cursor": "garbage"}, headers=headers).status_code != 400:
+            print("A malformed cursor was accepted")
+            return False
+
+        # Another account sees neither the site nor a way to delete it
+        if (self.client.get(f"/api/sites/{expected[0]}", headers=other).status_code != 404
+                or self.client.delete(f"/api/sites/{expected[0]}", headers=other).status_code != 404
+                or self.client.delete(f"/api/sites/{expected[0]}").status_code != 401
+                or self.client.get(f"/api/sites/{expected[0]}", headers=headers).status_code != 200):
+            print("A site was reachable without its owner's session")
+            return False
+
+        # The same site sent twice shares one compressed payload
+        before = self.client.get("/api/sites/stats").json()
+        request = {"templateId": "modern-clean", "websiteData": SITE_DATA}
+        twice = [self.client.post("/api/sites", json=request, headers=headers).json()["id"] for _ in range(2)]
+        after = self.client.get("/api/sites/stats").json()
+        print(f"{after['sites']} sites in {after['payloads']} payloads, {after['payload_bytes'] / 1024:.0f} KB")
+        if after["sites"] - before["sites"] != 2 or after["payloads"] - before["payloads"] > 1:
+            print("Identical payloads were stored twice")
+            return False
+        if (self.client.delete(f"/api/sites/{twice[0]}", headers=headers).status_code != 204
+                or self.client.get(f"/api/sites/{twice[1]}", headers=headers).json()["websiteData"]["businessName"]
+                != SITE_DATA["businessName"]
+                or self.client.get(f"/api/sites/{twice[0]}", headers=headers).status_code != 404):
+            print("Deleting a site broke the one sharing its payload")
+            return False
+        return True
+
+    def session_headers(self, email, password="correct horse"):
+        """Authorization header of a new account"""
+        account = {"name": email.split("@")[0], "email": email, "password": password}
+        token = self.client.post("/api/auth/register", json=account).json()["token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def test_batch_render(self):
+        """NDJSON and CSV imports streamed back per site, errors on their row, bounded in flight"""
+        renderer = SiteRenderer()
+        sites = [{"templateId": template["id"], "websiteData": dict(SITE_DATA, businessName=f"Site {number}")}
+                 for number, template in enumerate(TEMPLATES[:3])]
+        body = "\n".join([json.dumps(site) for site in sites]
+                         + ["{not json", json.dumps(dict(sites[0], templateId="unknown")),
+                            json.dumps({"templateId": "modern-clean", "websiteData": {"businessName": ""}})])
+        response = self.client.post("/api/batch/render", content=body.encode("utf-8"),
+                                    headers={"Content-Type": "application/x-ndjson"})
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        results = {line["row"]: line for line in lines[:-1]}
+        for row, site in enumerate(sites, 1):
+            expected = renderer.render_site(site["templateId"], WebsiteData(**site["websiteData"]).model_dump())
+            if results[row].get("pages") != expected:
+                print(f"Row {row} differs from /api/render")
+                return False
+        if sorted(results) != [1, 2, 3, 4, 5, 6] or any("error" not in results[row] for row in (4, 5, 6)):
+            print(f"Unexpected rows: {lines}")
+            return False
+        if lines[-1] != {"done": True, "rows": 6, "rendered": 3, "errors": 3}:
+            print(f"Unexpected summary: {lines[-1]}")
+            return False
+
+        # Spreadsheet export: BOM, ";" separated, a quoted cell over two lines
+        csv_body = ("\ufefftemplateId;businessName;siteType;description;selectedPages;facebook\n"
+                    'fresh-green;Garage Martin;garage;"Réparations toutes marques\net carrosserie";accueil|contact;'
+                    "https://facebook.com/martin\n"
+                    "luxury-gold;Salon Élise;salon;;;\n")
+        agency = self.session_headers("agence@example.com")
+        if self.client.post("/api/batch/render", params={"save": "true"}, content=csv_body.encode("utf-8"),
+                            headers={"Content-Type": "text/csv"}).status_code != 401:
+            print("A batch was saved without a session")
+            return False
+        response = self.client.post("/api/batch/render", params={"save": "true"}, content=csv_body.encode("utf-8"),
+                                    headers={"Content-Type": "text/csv", **agency})
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        results = {line["row"]: line for line in lines[:-1]}
+        garage = app.state.sites.get(results[1]["id"])
+        if (list(results[1]["pages"]) != ["accueil", "contact"] or results[2]["businessName"] != "Salon Élise"
+                or garage["websiteData"]["description"] != "Réparations toutes marques\net carrosserie"
+                or garage["websiteData"]["socialMedia"]["facebook"] != "https://facebook.com/martin"
+                or garage["ownerEmail"] != "agence@example.com"):
+            print(f"CSV rows not imported as expected: {garage}")
+            return False
+
+        # A site that cannot be saved is an error on its row; the batch goes on
+        store, save = app.state.sites, app.state.sites.save
+        def flaky_save(template_id, data, owner_email=""):
+            if data["businessName"] == "Site 1":
+                raise sqlite3.OperationalError("database is locked")
+            return save(template_id, data, owner_email)
+        store.save = flaky_save
+        try:
+            response = self.client.post("/api/batch/render", params={"save": "true"},
+                                        content="\n".join(json.dumps(site) for site in sites).encode("utf-8"),
+                                        headers={"Content-Type": "application/x-ndjson", **agency})
+        finally:
+            del store.save
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        results = {line["row"]: line for line in lines[:-1]}
+        if (results[2].get("error") != "Saving failed: database is locked" or "id" not in results[1]
+                or "id" not in results[3] or lines[-1] != {"done": True, "rows": 3, "rendered": 2, "errors": 1}):
+            print(f"Unexpected rows when a save fails: {lines}")
+            return False
+
+        # A site that fails to render is not saved
+        class CrashingPool(ThreadPoolExecutor):
+            def submit(self, fn, *args):
+                if args[2]["businessName"] == "Site 1":
+                    raise RuntimeError("worker crashed")
+                return super().submit(fn, *args)
+        batch, before = app.state.batch, app.state.sites.stats()["sites"]
+        workers, batch.executor = batch.executor, CrashingPool(2)
+        try:
+            response = self.client.post("/api/batch/render", params={"save": "true"},
+                                        content="\n".join(json.dumps(site) for site in sites).encode("utf-8"),
+                                        headers={"Content-Type": "application/x-ndjson", **agency})
+        finally:
+            batch.executor.shutdown()
+            batch.executor = workers
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        results = {line["row"]: line for line in lines[:-1]}
+        if (results[2] != {"row": 2, "error": "Rendering failed: worker crashed"}
+                or app.state.sites.stats()["sites"] - before != 2 or "id" not in results[3]):
+            print(f"Unexpected rows when a render fails: {lines}")
+            return False
+
+        batch.max_in_flight, batch.peak_in_flight = 8, 0
+        try:
+            rows = 400
+            body = "\n".join(json.dumps(dict(sites[number % 3], websiteData=dict(
+                SITE_DATA, businessName=f"Import {number}", selectedPages=PAGES))) for number in range(rows))
+            start = time.perf_counter()
+            response = self.client.post("/api/batch/render", content=body.encode("utf-8"),
+                                        headers={"Content-Type": "application/x-ndjson"})
+            elapsed = time.perf_counter() - start
+        finally:
+            batch.max_in_flight = BATCH_IN_FLIGHT
+        summary = json.loads(response.text.splitlines()[-1])
+        stats = self.client.get("/api/batch/stats").json()
+        print(f"{rows} sites in {elapsed:.2f}s on {stats['workers']} worker(s), "
+              f"{len(response.content) / rows / 1024:.0f} KB per line, peak {stats['peak_in_flight']} in flight")
+        if summary["rendered"] != rows or stats["peak_in_flight"] > 8 or stats["in_flight"] != 0:
+            print(f"Unexpected batch stats: {summary} {stats}")
+            return False
+
+        wrong_type = self.client.post("/api/batch/render", content=b"{}", headers={"Content-Type": "application/json"})
+        empty = self.client.post("/api/batch/render", content=b"", headers={"Content-Type": "text/csv"})
+        return wrong_type.status_code == 415 and empty.status_code == 400
+
+    def test_accounts(self):
+        """Register, log in and out; hashing stays off the event loop"""
+        account = {"name": "Marie Dupont", "email": "Marie@Example.com", "password": "correct horse"}
+        registered = self.client.post("/api/auth/register", json=account)
+        if (registered.status_code != 201
+                or self.client.post("/api/auth/register", json=account).status_code != 409
+                or self.client.post("/api/auth/register", json=dict(account, email="b@example.com", password="short")).status_code != 422):
+            print("Registration checks failed")
+            return False
+        wrong = self.client.post("/api/auth/login", json={"email": "marie@example.com", "password": "wrong"})
+        unknown = self.client.post("/api/auth/login", json={"email": "nobody@example.com", "password": "correct horse"})
+        session = self.client.post("/api/auth/login", json={"email": " MARIE@example.com", "password": "correct horse"})
+        if wrong.status_code != 401 or unknown.status_code != 401 or session.status_code != 200:
+            print(f"Login: wrong {wrong.status_code}, unknown {unknown.status_code}, right {session.status_code}")
+            return False
+        headers = {"Authorization": f"Bearer {session.json()['token']}"}
+        if self.client.get("/api/auth/me", headers=headers).json()["email"] != "marie@example.com":
+            print("Session does not resolve to the user")
+            return False
+        self.client.post("/api/auth/logout", headers=headers)
+        if self.client.get("/api/auth/me", headers=headers).status_code != 401:
+            print("Session still valid after logout")
+            return False
+
+        # Health probes while a burst of logins is hashing
+        credentials = {"email": "marie@example.com", "password": "correct horse"}
+        probes = []
+        with ThreadPoolExecutor(8) as pool:
+            start = time.perf_counter()
+            logins = [pool.submit(self.client.post, "/api/auth/login", json=credentials) for _ in range(16)]
+            while not all(login.done() for login in logins):
+                probe = time.perf_counter()
+                self.client.get("/api/health")
+                probes.append((time.perf_counter() - probe) * 1000)
+            elapsed = time.perf_counter() - start
+        print(f"16 logins in {elapsed:.2f}s ({16 / elapsed:.1f}/s); "
+              f"health during the burst: median {statistics.median(probes):.1f} ms, max {max(probes):.1f} ms")
+        if any(login.result().status_code != 200 for login in logins) or statistics.median(probes) > 50:
+            return False
+
+        clock = itertools.count(step=10).__next__
+        sessions = SessionCache(ttl=25, clock=clock)
+        token = sessions.create({"id": 1})
+        kept = sessions.get(token) is not None
+        clock(), clock(), clock()
+        return kept and sessions.get(token) is None
+
+    def test_email_deliveries(self):
+        """A burst of deliveries goes out over a few reused SMTP connections"""
+        headers, site_id = self.saved_site("client@example.com")
+        stranger = self.session_headers("stranger@example.com")
+        if (self.client.post("/api/sites/unknown/deliveries", headers=headers).status_code != 404
+                or self.client.post(f"/api/sites/{site_id}/deliveries").status_code != 401
+                or self.client.post(f"/api/sites/{site_id}/deliveries", headers=stranger).status_code != 404):
+            print("Deliveries accepted without the owner's session")
+            return False
+
+        # Only the owner's own address receives the site, whatever the body says
+        start = time.perf_counter()
+        ids = [self.client.post(f"/api/sites/{site_id}/deliveries", headers=headers,
+                                json={"email": "victim@example.com"}).json()["id"]
+               for _ in range(200)]
+        deliveries = self.wait_for_deliveries(ids)
+        elapsed = time.perf_counter() - start
+        stats = self.client.get("/api/deliveries/stats").json()
+        print(f"{len(ids)} deliveries in {elapsed:.2f}s over {stats['connections_opened']} SMTP connections")
+        if any(delivery["status"] != "sent" for delivery in deliveries):
+            print(f"Not all delivered: {[d['status'] for d in deliveries if d['status'] != 'sent'][:5]}")
+            return False
+        if self.smtp.recipients != ["client@example.com"] * len(ids) or stats["connections_opened"] > stats["workers"]:
+            print(f"{len(self.smtp.recipients)} messages received, {stats['connections_opened']} connections")
+            return False
+        message = self.smtp.messages[-1]
+        if "Restaurant Le Gourmet" not in message or f"/api/sites/{site_id}/export" not in message:
+            print("The email does not link to the export")
+            return False
+
+        # 4xx is retried after a backoff, 5xx fails at once
+        greylisted, refused = self.wait_for_deliveries([
+            self.client.post(f"/api/sites/{owned}/deliveries", headers=owner).json()["id"]
+            for owner, owned in (self.saved_site("greylisted@example.com"), self.saved_site("refused@example.com"))
+        ])
+        print(f"Greylisted: {greylisted['status']} after {greylisted['attempts']} attempts, "
+              f"refused: {refused['status']} ({refused['lastError']})")
+        if not (greylisted["status"] == "sent" and greylisted["attempts"] == 2
+                and refused["status"] == "failed" and refused["attempts"] == 1):
+            return False
+
+        # A line break in the name must not reach the Subject header
+        owner, multiline_id = self.saved_site("multiline@example.com",
+                                              dict(SITE_DATA, businessName="Le Gourmet\r\nBcc: x@example.com"))
+        multiline, = self.wait_for_deliveries([
+            self.client.post(f"/api/sites/{multiline_id}/deliveries", headers=owner).json()["id"]
+        ])
+        subject = next(line for line in self.smtp.messages[-1].splitlines() if line.startswith("Subject:"))
+        print(f"Multi-line name: {multiline['status']}, {subject}")
+        headers = self.smtp.messages[-1].split("\n\n")[0].splitlines()
+        return multiline["status"] == "sent" and not any(line.startswith("Bcc:") for line in headers)
+
+    def saved_site(self, email, data=SITE_DATA):
+        """(Authorization header, site id) of a new account and a site it saved"""
+        headers = self.session_headers(email)
+        site = {"templateId": "modern-clean", "websiteData": data}
+        return headers, self.client.post("/api/sites", json=site, headers=headers).json()["id"]
+
+    def wait_for_deliveries(self, ids, timeout=30):
+        deadline = time.monotonic() + timeout
+        while True:
+            deliveries = [self.client.get(f"/api/deliveries/{delivery_id}").json() for delivery_id in ids]
+            if all(d["status"] in ("sent", "failed") for d in deliveries) or time.monotonic() > deadline:
+                return deliveries
+            time.sleep(0.05)
+
+
+class RecordingSMTPHandler:
+    """aiosmtpd handler keeping what it receives; greylists and refuses on cue"""
+    def __init__(self):
+        self.recipients = []
+        self.messages = []
+        self.greylisted = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("refused@"):
+            return "550 5.1.1 No such user"
+        if address.startswith("greylisted@") and address not in self.greylisted:
+            self.greylisted.add(address)
+            return "451 4.7.1 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.recipients.extend(envelope.rcpt_tos)
+        self.messages.append(envelope.content.decode("utf-8", "replace"))
+        return "250 Message accepted for delivery"
+
+
+def main():
+    print("🚀 IA WebGen Pro - Backend API Testing Started")
+    print("=" * 50)
+
+    tester = BackendAPITester()
+    tests = [
+        ("Health Endpoint", tester.test_health),
+        ("Render Parity With index.html", tester.test_render_parity),
+        ("Static Build", tester.test_static_build),
+        ("Static Server", tester.test_static_server),
+        ("Render Speed", tester.test_render_speed),
+        ("Render Endpoints", tester.test_render_endpoints),
+        ("Fragment Cache", tester.test_fragment_cache),
+        ("Template Catalog", tester.test_template_catalog),
+        ("Assistant Intents", tester.test_assistant_intents),
+        ("Assistant Stream", tester.test_assistant_stream),
+        ("Image Query Normalization", tester.test_query_normalization),
+        ("Image Search Cache", tester.test_image_cache),
+        ("Image Search Cache Errors", tester.test_image_cache_errors),
+        ("Image Library", tester.test_image_library),
+        ("Photo Upload", tester.test_photo_upload),
+        ("Asset References And Collection", tester.test_asset_refs_and_gc),
+        ("Site Export", tester.test_site_export),
+        ("Site Listing", tester.test_site_listing),
+        ("Batch Rendering", tester.test_batch_render),
+        ("Accounts", tester.test_accounts),
+        ("Email Deliveries", tester.test_email_deliveries)
+    ]
+    tester.smtp = RecordingSMTPHandler()
+    smtp_server = Controller(tester.smtp, hostname="127.0.0.1", port=SMTP_PORT)
+    smtp_server.start()
+    try:
+        with tester.client:
+            for test_name, test_func in tests:
+                tester.run_test(test_name, test_func)
+    finally:
+        smtp_server.stop()
+
+    print("\n" + "=" * 50)
+    print(f"📊 Tests Results: {tester.tests_passed}/{tester.tests_run} passed")
+
+    if tester.tests_passed == tester.tests_run:
+        print("✅ All backend API tests passed!")
+        return 0
+    else:
+        print("❌ Some backend API tests failed. Check the issues above.")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
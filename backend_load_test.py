@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Load Test for the IA WebGen Pro backend API
+Replays a weighted mix of /api/health probes, /api/images/search queries and
+/api/auth/login attempts at a fixed concurrency (closed loop) or a target
+request rate (open loop) and reports latency percentiles, throughput and
+error rate per endpoint
+
+Fully offline:
+    python backend_load_test.py --offline --spawn-backend --rate 200 --duration 30
+
+Concurrent logins next to searches (password hashing must not slow the rest):
+    python backend_load_test.py --offline --spawn-backend --mix login=30,search=50,health=20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+from image_provider_stub import ImageProviderStub
+
+DEFAULT_QUERIES = [
+    "restaurant moderne",
+    "Restaurant Moderne",
+    "salon de coiffure",
+    "cabinet médical",
+    "hôtel de charme",
+    "salle de sport",
+    "boulangerie artisanale",
+    "plombier intervention",
+    "photographe mariage",
+    "cabinet d'avocat"
+]
+
+ENDPOINTS = {
+    "health": lambda generator: ("GET", "/api/health", {}),
+    "search": lambda generator: ("GET", "/api/images/search", {"params": {"q": random.choice(generator.queries)}}),
+    "login": lambda generator: ("POST", "/api/auth/login", {"json": random.choice(generator.accounts)})
+}
+
+
+def benchmark_accounts(count):
+    return [{"email": f"loadtest{number}@example.com", "password": f"loadtest-password-{number}"}
+            for number in range(count)]
+
+
+def parse_mix(text):
+    """'search=70,health=30' -> [(name, weight), ...]"""
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LoadGenerator:
+    def __init__(self, base_url, concurrency=50, rate=None, duration=30, warmup=2,
+                 mix=None, queries=None, accounts=None, timeout=10):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.warmup = warmup
+        self.mix = mix or parse_mix("search=70,health=30")
+        self.queries = queries or DEFAULT_QUERIES
+        self.accounts = accounts or benchmark_accounts(1)
+        self.timeout = timeout
+        self.records = []
+        self.elapsed = 0
+
+    def pick_request(self):
+        names = [name for name, _ in self.mix]
+        weights = [weight for _, weight in self.mix]
+        name = random.choices(names, weights)[0]
+        method, path, options = ENDPOINTS[name](self)
+        return name, method, path, options
+
+    async def send(self, client, started):
+        """Send one request; latency counts from `started` (its scheduled time in open loop)"""
+        name, method, path, options = self.pick_request()
+        error = None
+        status = None
+        try:
+            response = await client.request(method, path, **options)
+            status = response.status_code
+            if status >= 400:
+                error = f"HTTP {status}"
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        self.records.append({
+            "endpoint": name,
+            "started": started,
+            "latency_ms": (time.perf_counter() - started) * 1000,
+            "status": status,
+            "error": error
+        })
+
+    async def closed_loop(self, client, deadline):
+        """`concurrency` workers sending back to back"""
+        async def worker():
+            while time.perf_counter() < deadline:
+                await self.send(client, time.perf_counter())
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+    async def open_loop(self, client, start, deadline):
+        """Requests on a fixed schedule; queueing behind the concurrency cap counts as latency"""
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = []
+
+        async def scheduled(at):
+            async with slots:
+                await self.send(client, at)
+
+        for i in range(int((deadline - start) * self.rate)):
+            at = start + i / self.rate
+            delay = at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(scheduled(at)))
+        await asyncio.gather(*tasks)
+
+    async def run(self):
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=self.timeout) as client:
+            start = time.perf_counter()
+            deadline = start + self.warmup + self.duration
+            if self.rate:
+                await self.open_loop(client, start, deadline)
+            else:
+                await self.closed_loop(client, deadline)
+            self.elapsed = time.perf_counter() - start - self.warmup
+
+        # Drop the warmup window
+        measured_from = start + self.warmup
+        self.records = [record for record in self.records if record["started"] >= measured_from]
+        return self.records
+
+    def summarize(self):
+        """Per-endpoint and overall latency/throughput/error statistics"""
+        groups = {"all": self.records}
+        for record in self.records:
+            groups.setdefault(record["endpoint"], []).append(record)
+
+        summary = {}
+        for name, records in groups.items():
+            if not records:
+                continue
+            latencies = [record["latency_ms"] for record in records]
+            errors = sum(1 for record in records if record["error"])
+            summary[name] = {
+                "requests": len(records),
+                "throughput_rps": round(len(records) / self.elapsed, 1) if self.elapsed > 0 else 0,
+                "error_rate": round(errors / len(records), 4),
+                "p50_ms": round(percentile(latencies, 0.50), 2),
+                "p95_ms": round(percentile(latencies, 0.95), 2),
+                "p99_ms": round(percentile(latencies, 0.99), 2),
+                "max_ms": round(max(latencies), 2)
+            }
+        return summary
+
+
+async def register_accounts(base_url, accounts):
+    """Create the login benchmark accounts; already existing ones are reused"""
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        for account in accounts:
+            response = await client.post("/api/auth/register", json=dict(account, name="Load Test"))
+            if response.status_code not in (201, 409):
+                raise RuntimeError(f"Could not register {account['email']}: HTTP {response.status_code}")
+
+
+async def wait_for_backend(base_url, timeout=30):
+    """Poll /api/health until the backend answers"""
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=2) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/api/health")).status_code == 200:
+                    return True
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    return False
+
+
+def spawn_backend(port, upstream_url, workers):
+    """Start the backend with uvicorn, pointed at `upstream_url` if given"""
+    env = dict(os.environ, ENVIRONMENT="loadtest")
+    if upstream_url:
+        env.update(UNSPLASH_API_URL=upstream_url, UNSPLASH_ACCESS_KEY="stub")
+    backend_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=backend_dir, env=env
+    )
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the IA WebGen Pro backend")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--concurrency", type=int, default=50, help="in-flight request cap")
+    parser.add_argument("--rate", type=float, default=None, help="target requests/s (open loop); omit for closed loop")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds discarded before measuring")
+    parser.add_argument("--mix", default="search=70,health=30", help="endpoint weights")
+    parser.add_argument("--queries", default=None, help="file with one search query per line")
+    parser.add_argument("--login-accounts", type=int, default=20, help="accounts registered for the login mix")
+    parser.add_argument("--offline", action="store_true", help="run the bundled image provider stub")
+    parser.add_argument("--stub-latency-ms", type=float, default=80)
+    parser.add_argument("--spawn-backend", action="store_true", help="start the backend with uvicorn for the run")
+    parser.add_argument("--backend-workers", type=int, default=1)
+    parser.add_argument("--json", default=None, help="write the summary to this file")
+    args = parser.parse_args(argv)
+
+    queries = None
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    print("🚀 IA WebGen Pro - Backend Load Test")
+    print("=" * 60)
+
+    stub = None
+    backend = None
+    try:
+        if args.offline:
+            stub = await ImageProviderStub(latency_ms=args.stub_latency_ms).start()
+            print(f"🖼️ Image provider stub on {stub.url}")
+        if args.spawn_backend:
+            port = int(args.base_url.rsplit(":", 1)[-1].strip("/"))
+            backend = spawn_backend(port, stub.url if stub else None, args.backend_workers)
+        elif stub:
+            print(f"ℹ️ Start the backend with UNSPLASH_API_URL={stub.url} UNSPLASH_ACCESS_KEY=stub")
+
+        if not await wait_for_backend(args.base_url):
+            print(f"❌ Backend not reachable at {args.base_url}")
+            return 1
+
+        mix = parse_mix(args.mix)
+        accounts = benchmark_accounts(args.login_accounts)
+        if any(name == "login" for name, _ in mix):
+            await register_accounts(args.base_url, accounts)
+            print(f"👤 {len(accounts)} login accounts ready")
+
+        mode = f"open loop at {args.rate:g} req/s" if args.rate else "closed loop"
+        print(f"🔥 {mode}, concurrency {args.concurrency}, {args.duration:g}s (+{args.warmup:g}s warmup), mix {args.mix}")
+        generator = LoadGenerator(args.base_url, args.concurrency, args.rate, args.duration, args.warmup,
+                                  mix, queries, accounts)
+        await generator.run()
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=5) as client:
+            response = await client.get("/api/images/cache")
+            cache_stats = response.json() if response.status_code == 200 else None
+            response = await client.get("/api/auth/stats")
+            auth_stats = response.json() if response.status_code == 200 else None
+    finally:
+        if backend:
+            backend.terminate()
+            backend.wait()
+        if stub:
+            await stub.stop()
+
+    summary = generator.summarize()
+    print(f"\n📊 {'endpoint':<10} {'requests':>9} {'req/s':>8} {'errors':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for name, stats in summary.items():
+        print(f"   {name:<10} {stats['requests']:>9} {stats['throughput_rps']:>8} {stats['error_rate']:>8.2%}"
+              f" {stats['p50_ms']:>7.1f}ms {stats['p95_ms']:>7.1f}ms {stats['p99_ms']:>7.1f}ms {stats['max_ms']:>7.1f}ms")
+    if cache_stats:
+        print(f"\n🗄️ Image cache: {cache_stats['hits']} hits, {cache_stats['coalesced']} coalesced, "
+              f"{cache_stats['misses']} misses (hit rate {cache_stats['hit_rate']:.1%}), "
+              f"{cache_stats['entries']} entries")
+    if stub:
+        print(f"🖼️ Upstream searches served by the stub: {stub.requests_served}")
+    if auth_stats and "login" in summary:
+        print(f"🔐 Password hashes computed: {auth_stats['hashes_computed']}, "
+              f"open sessions: {auth_stats['sessions']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "summary": summary, "image_cache": cache_stats, "auth": auth_stats},
+                      f, indent=2)
+        print(f"\n💾 Summary written to {args.json}")
+
+    return 0 if summary.get("all", {}).get("error_rate", 1) == 0 else 1
+
+if __name__ == "__main__":
+    result = asyncio.run(main())
+    sys.exit(result)
@@ -2,17 +2,134 @@
 """
 Backend Test for IA WebGen Pro
 Since this is a static HTML application, we'll test the HTTP server functionality
+The page is fetched once per host and parsed into an index; every check is a lookup
 """
 
+import argparse
+import json
+import os
+import re
 import requests
 import sys
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from requests.adapters import HTTPAdapter
+
+class DocumentIndex(HTMLParser):
+    """Element ids, CSS selectors/classes, JS function names and resources of a page"""
+    FUNCTION_RE = re.compile(r'\bfunction\s+([A-Za-z_$][\w$]*)\s*\(')
+    CSS_PRELUDE_RE = re.compile(r'([^{}]+)\{')
+    CSS_CLASS_RE = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+    TEXT_TAGS = {"title", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self, html):
+        super().__init__(convert_charrefs=True)
+        self.ids = set()
+        self.css_selectors = set()
+        self.css_classes = set()
+        self.js_functions = set()
+        self.resources = []
+        self.headings = []
+        self._open = None
+        self.feed(html)
+        self.close()
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if attrs.get("id"):
+            self.ids.add(attrs["id"])
+        for attr in ("href", "src"):
+            if tag in ("link", "script") and attrs.get(attr):
+                self.resources.append(attrs[attr])
+        if tag in ("style", "script") or tag in self.TEXT_TAGS:
+            self._open = tag
+
+    def handle_endtag(self, tag):
+        if tag == self._open:
+            self._open = None
+
+    def handle_data(self, data):
+        if self._open == "style":
+            for prelude in self.CSS_PRELUDE_RE.findall(data):
+                prelude = prelude.strip()
+                if not prelude or prelude.startswith("@"):
+                    continue
+                for selector in prelude.split(","):
+                    self.css_selectors.add(" ".join(selector.split()))
+                self.css_classes.update(self.CSS_CLASS_RE.findall(prelude))
+        elif self._open == "script":
+            self.js_functions.update(self.FUNCTION_RE.findall(data))
+        elif self._open in self.TEXT_TAGS:
+            self.headings.append(data.strip())
+
+    def has_text(self, text):
+        """Whether `text` appears in the title or a heading"""
+        return any(text in heading for heading in self.headings)
+
+    def has_resource(self, fragment):
+        """Whether a linked stylesheet/script URL contains `fragment`"""
+        return any(fragment in url for url in self.resources)
+
+def make_session(pool_size=10):
+    """A requests.Session keeping up to `pool_size` connections per host alive"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 class StaticSiteAPITester:
-    def __init__(self, base_url="http://localhost:8000"):
+    def __init__(self, base_url="http://localhost:8000", session=None, cache=None):
         self.base_url = base_url
         self.tests_run = 0
         self.tests_passed = 0
+        self.session = session or make_session()
+        # url -> {"etag", "last_modified", "body"} kept between runs for conditional GETs
+        self.cache = cache if cache is not None else {}
+        self.status_code = None
+        self.revalidated = False
+        self.fetch_error = None
+        self.index = None
+
+    def fetch(self):
+        """Fetch the page once, revalidating a cached copy with ETag/Last-Modified"""
+        if self.status_code is not None or self.fetch_error is not None:
+            return
+        
+        cached = self.cache.get(self.base_url)
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        
+        try:
+            response = self.session.get(self.base_url, headers=headers, timeout=10)
+        except requests.RequestException as e:
+            self.fetch_error = e
+            return
+        
+        self.status_code = response.status_code
+        if response.status_code == 304 and cached:
+            self.revalidated = True
+            body = cached["body"]
+        elif response.status_code == 200:
+            body = response.text
+            self.cache[self.base_url] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "body": body
+            }
+        else:
+            return
+        self.index = DocumentIndex(body)
+
+    def document(self):
+        """The parsed page, or None if the server did not return it"""
+        self.fetch()
+        if self.fetch_error is not None:
+            raise self.fetch_error
+        return self.index
 
     def run_test(self, name, test_func):
         """Run a single test"""
@@ -33,19 +150,20 @@ class StaticSiteAPITester:
 
     def test_server_accessibility(self):
         """Test if the server is accessible"""
-        response = requests.get(self.base_url, timeout=10)
-        return response.status_code == 200
+        return self.document() is not None
 
     def test_html_content(self):
         """Test if HTML content is properly served"""
-        response = requests.get(self.base_url, timeout=10)
-        if response.status_code != 200:
+        index = self.document()
+        if index is None:
+            return False
+        
+        if not index.has_text("IA WebGen Pro"):
+            print("Missing required element: IA WebGen Pro")
             return False
         
-        content = response.text
         # Check for key elements
         required_elements = [
-            "IA WebGen Pro",
             "websiteForm",
             "businessName",
             "siteType", 
@@ -54,7 +172,7 @@ class StaticSiteAPITester:
         ]
         
         for element in required_elements:
-            if element not in content:
+            if element not in index.ids:
                 print(f"Missing required element: {element}")
                 return False
         
@@ -62,11 +180,10 @@ class StaticSiteAPITester:
 
     def test_static_resources(self):
         """Test if external resources are referenced correctly"""
-        response = requests.get(self.base_url, timeout=10)
-        if response.status_code != 200:
+        index = self.document()
+        if index is None:
             return False
             
-        content = response.text
         # Check for external CSS/JS references
         external_resources = [
             "tailwindcss",
@@ -74,7 +191,7 @@ class StaticSiteAPITester:
         ]
         
         for resource in external_resources:
-            if resource not in content:
+            if not index.has_resource(resource):
                 print(f"Missing external resource reference: {resource}")
                 return False
                 
@@ -82,22 +199,21 @@ class StaticSiteAPITester:
 
     def test_form_elements(self):
         """Test if all required form elements are present"""
-        response = requests.get(self.base_url, timeout=10)
-        if response.status_code != 200:
+        index = self.document()
+        if index is None:
             return False
             
-        content = response.text
         form_elements = [
-            'id="businessName"',
-            'id="siteType"',
-            'id="description"',
-            'id="userEmail"',
-            'id="phone"',
-            'id="address"'
+            "businessName",
+            "siteType",
+            "description",
+            "userEmail",
+            "phone",
+            "address"
         ]
         
         for element in form_elements:
-            if element not in content:
+            if element not in index.ids:
                 print(f"Missing form element: {element}")
                 return False
                 
@@ -105,11 +221,10 @@ class StaticSiteAPITester:
 
     def test_javascript_functionality(self):
         """Test if JavaScript functions are defined"""
-        response = requests.get(self.base_url, timeout=10)
-        if response.status_code != 200:
+        index = self.document()
+        if index is None:
             return False
             
-        content = response.text
         js_functions = [
             "handleFormSubmit",
             "generateCompleteWebsite",
@@ -120,7 +235,7 @@ class StaticSiteAPITester:
         ]
         
         for func in js_functions:
-            if func not in content:
+            if func not in index.js_functions:
                 print(f"Missing JavaScript function: {func}")
                 return False
                 
@@ -128,51 +243,88 @@ class StaticSiteAPITester:
 
     def test_css_styles(self):
         """Test if required CSS classes are defined"""
-        response = requests.get(self.base_url, timeout=10)
-        if response.status_code != 200:
+        index = self.document()
+        if index is None:
             return False
             
-        content = response.text
         css_classes = [
-            ".edit-mode",
-            ".editable",
-            ".mini-chatgpt",
-            ".template-card",
-            ".page-tab"
+            "edit-mode",
+            "editable",
+            "mini-chatgpt",
+            "template-card",
+            "page-tab"
         ]
         
         for css_class in css_classes:
-            if css_class not in content:
+            if css_class not in index.css_classes:
                 print(f"Missing CSS class: {css_class}")
                 return False
                 
         return True
 
-def main():
+def load_cache(path):
+    """Read the conditional-GET cache file (empty if missing or unreadable)"""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(path, cache):
+    """Write the conditional-GET cache file"""
+    if path:
+        with open(path, "w") as f:
+            json.dump(cache, f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check one or more deployed IA WebGen Pro hosts")
+    parser.add_argument("hosts", nargs="*", default=["http://localhost:8000"])
+    parser.add_argument("--cache", default=None,
+                        help="JSON file keeping ETag/Last-Modified and the body between runs")
+    args = parser.parse_args(argv)
+    
     print("🚀 IA WebGen Pro - Backend Testing Started")
     print("=" * 50)
     
-    # Setup
-    tester = StaticSiteAPITester("http://localhost:8000")
-    
-    # Run tests
-    tests = [
-        ("Server Accessibility", tester.test_server_accessibility),
-        ("HTML Content Structure", tester.test_html_content),
-        ("Static Resources References", tester.test_static_resources),
-        ("Form Elements Presence", tester.test_form_elements),
-        ("JavaScript Functions", tester.test_javascript_functionality),
-        ("CSS Styles", tester.test_css_styles)
-    ]
+    # Setup: one pooled session, every host fetched concurrently up front
+    cache = load_cache(args.cache)
+    session = make_session(pool_size=len(args.hosts))
+    testers = [StaticSiteAPITester(host, session=session, cache=cache) for host in args.hosts]
+    with ThreadPoolExecutor(max_workers=min(16, len(testers))) as executor:
+        list(executor.map(lambda tester: tester.fetch(), testers))
+    save_cache(args.cache, cache)
     
-    for test_name, test_func in tests:
-        tester.run_test(test_name, test_func)
+    tests_run = 0
+    tests_passed = 0
+    for tester in testers:
+        if len(testers) > 1:
+            print(f"\n🌐 {tester.base_url}")
+        if tester.revalidated:
+            print("♻️ Not modified since last run, using cached copy")
+        
+        # Run tests
+        tests = [
+            ("Server Accessibility", tester.test_server_accessibility),
+            ("HTML Content Structure", tester.test_html_content),
+            ("Static Resources References", tester.test_static_resources),
+            ("Form Elements Presence", tester.test_form_elements),
+            ("JavaScript Functions", tester.test_javascript_functionality),
+            ("CSS Styles", tester.test_css_styles)
+        ]
+        
+        for test_name, test_func in tests:
+            tester.run_test(test_name, test_func)
+        
+        tests_run += tester.tests_run
+        tests_passed += tester.tests_passed
     
     # Print results
     print("\n" + "=" * 50)
-    print(f"📊 Tests Results: {tester.tests_passed}/{tester.tests_run} passed")
+    print(f"📊 Tests Results: {tests_passed}/{tests_run} passed")
     
-    if tester.tests_passed == tester.tests_run:
+    if tests_passed == tests_run:
         print("✅ All backend tests passed! Static site is properly configured.")
         return 0
     else:
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Static build of the frontend
+Writes dist/ with index.html minified (inline script and styles included) and
+the template catalog it falls back on, plus .gz and .br variants next to every
+text file, then prints the bytes a first load costs before and after:
+
+    python build_static.py
+    python static_server.py --root dist
+
+The backend URL of the app is its own origin, or http://localhost:8001 when
+served locally; --api-url (or API_BASE_URL) fixes it for the build:
+
+    python build_static.py --api-url https://api.example.com
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from minify import COMPRESSIBLE, ENCODINGS, minify_css, minify_html, minify_js, precompressed
+
+# Files of the app, relative to the repository and to dist/
+APP_FILES = ["index.html"]
+APP_DIRECTORIES = ["backend/catalog"]
+MINIFIERS = {".html": minify_html, ".css": minify_css, ".js": minify_js}
+API_BASE_URL = re.compile(r"^const API_BASE_URL = .*;$", re.MULTILINE)
+
+
+def app_files(root=ROOT):
+    yield from APP_FILES
+    for directory in APP_DIRECTORIES:
+        for folder, _, names in os.walk(os.path.join(root, directory)):
+            for name in sorted(names):
+                yield os.path.relpath(os.path.join(folder, name), root)
+
+
+def with_api_url(html, api_url):
+    """index.html calling the backend at `api_url`"""
+    html, count = API_BASE_URL.subn(lambda _: f"const API_BASE_URL = {json.dumps(api_url.rstrip('/'))};", html)
+    if count != 1:
+        raise ValueError("API_BASE_URL not found in index.html")
+    return html
+
+
+def build(out_dir, root=ROOT, api_url=None):
+    """Write the build; returns {path: (source bytes, minified bytes, {encoding: bytes})}"""
+    shutil.rmtree(out_dir, ignore_errors=True)
+    sizes = {}
+    for path in app_files(root):
+        with open(os.path.join(root, path), "rb") as f:
+            source = f.read()
+        extension = os.path.splitext(path)[1]
+        if path == "index.html" and api_url is not None:
+            source = with_api_url(source.decode("utf-8"), api_url).encode("utf-8")
+        minify = MINIFIERS.get(extension)
+        data = minify(source.decode("utf-8")).encode("utf-8") if minify else source
+        target = os.path.join(out_dir, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(data)
+        variants = {}
+        if extension in COMPRESSIBLE:
+            compressed = precompressed(data)
+            for encoding, suffix in ENCODINGS.items():
+                # Not worth a variant unless it saves something
+                if len(compressed[suffix]) < len(data):
+                    with open(target + suffix, "wb") as f:
+                        f.write(compressed[suffix])
+                    variants[encoding] = len(compressed[suffix])
+        sizes[path] = (len(source), len(data), variants)
+    return sizes
+
+
+def report(sizes):
+    print(f"\n📊 {'file':<32} {'source':>9} {'minified':>9} {'gzip':>9} {'brotli':>9}")
+    rows = [(path, size) for path, size in sizes.items() if not path.startswith("backend/catalog/thumbnails/")]
+    thumbnails = [size for path, size in sizes.items() if path.startswith("backend/catalog/thumbnails/")]
+    if thumbnails:
+        rows.append((f"thumbnails ({len(thumbnails)} files)", (
+            sum(size[0] for size in thumbnails), sum(size[1] for size in thumbnails),
+            {encoding: sum(size[2].get(encoding, size[1]) for size in thumbnails) for encoding in ENCODINGS}
+        )))
+    for path, (source, minified, variants) in rows:
+        print(f"   {path:<32} {source / 1024:>7.1f}KB {minified / 1024:>7.1f}KB"
+              f" {variants.get('gzip', minified) / 1024:>7.1f}KB {variants.get('br', minified) / 1024:>7.1f}KB")
+    source, minified, variants = sizes["index.html"]
+    print(f"\nFirst load (index.html): {source / 1024:.1f} KB uncompressed -> "
+          f"{variants.get('br', minified) / 1024:.1f} KB with Brotli, {variants.get('gzip', minified) / 1024:.1f} KB with gzip")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Minify and precompress the frontend into a static build")
+    parser.add_argument("--out", default=os.path.join(ROOT, "dist"))
+    parser.add_argument("--api-url", default=os.environ.get("API_BASE_URL"),
+                        help="Backend URL of the build ('' for the same origin)")
+    args = parser.parse_args(argv)
+    sizes = build(args.out, api_url=args.api_url)
+    report(sizes)
+    print(f"{len(sizes)} files written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,29 +6,44 @@ Testing specific features mentioned in the review request
 
 import asyncio
 import sys
-from playwright.async_api import async_playwright
+from ui_harness import (
+    BrowserPool, StepTimer, count_elements, notification_count, parse_options, run_chains,
+    wait_for_class, wait_for_count_above, wait_for_display, wait_for_notification
+)
 
 class DetailedFeatureTester:
-    def __init__(self):
+    # Every test starts from its own restored preview, so each one is an
+    # independent chain in concurrent mode
+    CHAINS = [
+        [("Edit Mode Detailed Functionality", "test_edit_mode_detailed")],
+        [("ChatGPT Detailed Functionality", "test_chatgpt_detailed")],
+        [("Page Modification Persistence", "test_page_persistence")],
+        [("Add New Section Feature", "test_add_new_section")],
+        [("Style Modification Options", "test_style_options")]
+    ]
+
+    def __init__(self, pool=None, timer=None):
         self.tests_run = 0
         self.tests_passed = 0
-        self.browser = None
+        self.pool = pool
+        self.owns_pool = pool is None
+        self.timer = timer or StepTimer()
         self.page = None
 
     async def setup(self):
         """Setup browser and page"""
-        playwright = await async_playwright().start()
-        self.browser = await playwright.chromium.launch(headless=True)
-        self.page = await self.browser.new_page()
-        await self.page.set_viewport_size({"width": 1920, "height": 1080})
-        
-        # Enable console logging
-        self.page.on("console", lambda msg: print(f"CONSOLE: {msg.text}"))
+        if self.pool is None:
+            self.pool = BrowserPool()
+        await self.pool.start()
+        self.page = await self.pool.new_page()
 
     async def teardown(self):
         """Cleanup browser"""
-        if self.browser:
-            await self.browser.close()
+        if self.page:
+            await self.pool.close_page(self.page)
+            self.page = None
+        if self.owns_pool:
+            await self.pool.stop()
 
     async def run_test(self, name, test_func):
         """Run a single test"""
@@ -47,35 +62,48 @@ class DetailedFeatureTester:
             print(f"❌ Failed - Error: {str(e)}")
             return False
 
-    async def setup_complete_flow(self):
-        """Setup the complete flow to get to preview mode"""
-        await self.page.goto('http://localhost:8000', wait_until='domcontentloaded', timeout=10000)
+    async def complete_flow(self, page):
+        """Drive the real form-to-preview flow on the given page"""
+        await page.goto('http://localhost:8000', wait_until='domcontentloaded', timeout=10000)
         
         # Fill form
-        await self.page.fill("#businessName", "Restaurant Le Gourmet")
-        await self.page.select_option("#siteType", "restaurant")
-        await self.page.fill("#description", "Un restaurant gastronomique français")
-        await self.page.fill("#userEmail", "contact@legourmet.fr")
+        await page.fill("#businessName", "Restaurant Le Gourmet")
+        await page.select_option("#siteType", "restaurant")
+        await page.fill("#description", "Un restaurant gastronomique français")
+        await page.fill("#userEmail", "contact@legourmet.fr")
         
         # Submit form
-        await self.page.click("button[type='submit']")
-        await self.page.wait_for_function(
+        await page.click("button[type='submit']")
+        await page.wait_for_function(
             "document.getElementById('qualityTemplates').style.display !== 'none'",
             timeout=10000
         )
         
         # Select template
-        template_cards = await self.page.query_selector_all(".template-card")
+        # The grid is built once the template catalog is loaded
+        await page.wait_for_selector(".template-card", timeout=10000)
+        template_cards = await page.query_selector_all(".template-card")
         await template_cards[0].click()
         
         # Generate preview
-        continue_btn = await self.page.wait_for_selector("#continueBtn:not([disabled])", timeout=5000)
+        continue_btn = await page.wait_for_selector("#continueBtn:not([disabled])", timeout=5000)
         await continue_btn.click()
-        await self.page.wait_for_function(
+        await page.wait_for_function(
             "document.getElementById('previewSection').style.display !== 'none'",
             timeout=10000
         )
 
+    async def setup_complete_flow(self):
+        """Setup the complete flow to get to preview mode
+
+        The real flow only runs for the first test; later tests get a fresh
+        context with the captured preview state restored.
+        """
+        if self.page:
+            await self.pool.close_page(self.page)
+            self.page = None
+        self.page = await self.pool.preview_page(self.complete_flow, key="detailed")
+
     async def test_edit_mode_detailed(self):
         """Test detailed edit mode functionality"""
         await self.setup_complete_flow()
@@ -94,7 +122,7 @@ class DetailedFeatureTester:
             
         # Activate edit mode
         await edit_btn.click()
-        await self.page.wait_for_timeout(1000)
+        await self.timer.wait("Edit mode toggle", 1000, wait_for_class(self.page, "#websitePreview", "edit-mode"))
         
         # Check if state changed
         btn_text_after = await edit_btn.inner_text()
@@ -118,7 +146,7 @@ class DetailedFeatureTester:
         if len(editable_elements) > 0:
             # Try clicking on first editable element
             await editable_elements[0].click()
-            await self.page.wait_for_timeout(500)
+            await self.timer.wait("Edit toolbar", 500, wait_for_count_above(self.page, ".edit-toolbar", 0, timeout=500), required=False)
             
             # Check if edit toolbar appears
             edit_toolbar = await self.page.query_selector(".edit-toolbar")
@@ -147,7 +175,7 @@ class DetailedFeatureTester:
             
         # 2. Test opening ChatGPT widget
         await chatgpt_toggle.click()
-        await self.page.wait_for_timeout(1000)
+        await self.timer.wait("ChatGPT open", 1000, wait_for_display(self.page, "#miniChatGPT"))
         
         chatgpt_widget = await self.page.query_selector("#miniChatGPT")
         if not chatgpt_widget:
@@ -179,20 +207,22 @@ class DetailedFeatureTester:
         await chat_input.fill("aide")
         send_btn = await self.page.query_selector("button:has-text('Envoyer')")
         if send_btn:
+            bot_messages = await count_elements(self.page, ".message.bot")
             await send_btn.click()
-            await self.page.wait_for_timeout(1000)
+            await self.timer.wait("ChatGPT reply", 1000, wait_for_count_above(self.page, ".message.bot", bot_messages))
             
         # 5. Test /image command
         await chat_input.fill("/image restaurant moderne")
         if send_btn:
+            image_results = await count_elements(self.page, ".image-search-result")
             await send_btn.click()
-            await self.page.wait_for_timeout(2000)
+            await self.timer.wait("Image search results", 2000, wait_for_count_above(self.page, ".image-search-result", image_results))
             
         # 6. Test minimize/maximize
         chatgpt_header = await self.page.query_selector(".chatgpt-header")
         if chatgpt_header:
             await chatgpt_header.click()  # Should minimize
-            await self.page.wait_for_timeout(500)
+            await self.timer.wait("ChatGPT minimize", 500, wait_for_class(self.page, "#miniChatGPT", "minimized"), required=False)
             
             # Check if minimized
             minimized_class = await chatgpt_widget.get_attribute("class")
@@ -201,13 +231,13 @@ class DetailedFeatureTester:
             
             # Maximize again
             await chatgpt_header.click()
-            await self.page.wait_for_timeout(500)
+            await self.timer.wait("ChatGPT maximize", 500, wait_for_class(self.page, "#miniChatGPT", "minimized", present=False), required=False)
             
         # 7. Test close button
         close_btn = await self.page.query_selector("button:has(.fa-times)")
         if close_btn:
             await close_btn.click()
-            await self.page.wait_for_timeout(500)
+            await self.timer.wait("ChatGPT close", 500, wait_for_display(self.page, "#miniChatGPT", visible=False), required=False)
             
             display_style_after = await chatgpt_widget.evaluate("el => getComputedStyle(el).display")
             if display_style_after == "none":
@@ -222,7 +252,7 @@ class DetailedFeatureTester:
         # Activate edit mode
         edit_btn = await self.page.query_selector("#editModeBtn")
         await edit_btn.click()
-        await self.page.wait_for_timeout(1000)
+        await self.timer.wait("Edit mode toggle", 1000, wait_for_class(self.page, "#websitePreview", "edit-mode"))
         
         # Make a customization change
         primary_color = await self.page.query_selector("#primaryColor")
@@ -231,14 +261,15 @@ class DetailedFeatureTester:
             
         update_btn = await self.page.query_selector("button:has-text('Mettre à jour')")
         if update_btn:
+            notifications = await notification_count(self.page)
             await update_btn.click()
-            await self.page.wait_for_timeout(1000)
+            await self.timer.wait("Preview update", 1000, wait_for_notification(self.page, notifications))
             
         # Switch to different page
         page_tabs = await self.page.query_selector_all(".page-tab")
         if len(page_tabs) > 1:
             await page_tabs[1].click()  # Switch to second page
-            await self.page.wait_for_timeout(1000)
+            await self.timer.wait("Page tab switch", 1000, wait_for_class(self.page, page_tabs[1], "active"))
             
             # Check if edit mode is still active
             edit_btn_text = await edit_btn.inner_text()
@@ -248,7 +279,7 @@ class DetailedFeatureTester:
                 
             # Switch back to first page
             await page_tabs[0].click()
-            await self.page.wait_for_timeout(1000)
+            await self.timer.wait("Page tab switch", 1000, wait_for_class(self.page, page_tabs[0], "active"))
             
             # Check if color change persisted
             current_color = await primary_color.get_attribute("value")
@@ -268,9 +299,11 @@ class DetailedFeatureTester:
             print("❌ Add new section button not found")
             return False
             
-        # Click add section button
+        # Click add section button (the prompt is auto-dismissed, the app
+        # then reports an invalid section type)
+        notifications = await notification_count(self.page)
         await add_section_btn.click()
-        await self.page.wait_for_timeout(1000)
+        await self.timer.wait("Add section", 1000, wait_for_notification(self.page, notifications))
         
         # This should trigger some functionality (modal, form, etc.)
         # The exact behavior depends on implementation
@@ -306,25 +339,38 @@ class DetailedFeatureTester:
         # Apply changes
         update_btn = await self.page.query_selector("button:has-text('Mettre à jour')")
         if update_btn:
+            notifications = await notification_count(self.page)
             await update_btn.click()
-            await self.page.wait_for_timeout(1000)
+            await self.timer.wait("Preview update", 1000, wait_for_notification(self.page, notifications))
             
         return True
 
-    async def run_detailed_tests(self):
-        """Run all detailed tests"""
+    async def run_concurrent(self, concurrency):
+        """Run the tests concurrently on separate pages"""
+        if self.page:
+            await self.pool.close_page(self.page)
+            self.page = None
+        results = await run_chains(self.pool, lambda: DetailedFeatureTester(self.pool, self.timer), self.CHAINS, concurrency)
+        self.tests_run += len(results)
+        self.tests_passed += sum(1 for _, passed in results if passed)
+
+    async def run_detailed_tests(self, concurrency=None):
+        """Run all detailed tests, concurrently if a limit is given"""
         print("🚀 IA WebGen Pro - Detailed Feature Testing")
         print("=" * 60)
         
         await self.setup()
         
         try:
-            # Detailed feature tests
-            await self.run_test("Edit Mode Detailed Functionality", self.test_edit_mode_detailed)
-            await self.run_test("ChatGPT Detailed Functionality", self.test_chatgpt_detailed)
-            await self.run_test("Page Modification Persistence", self.test_page_persistence)
-            await self.run_test("Add New Section Feature", self.test_add_new_section)
-            await self.run_test("Style Modification Options", self.test_style_options)
+            if concurrency:
+                await self.run_concurrent(concurrency)
+            else:
+                # Detailed feature tests
+                await self.run_test("Edit Mode Detailed Functionality", self.test_edit_mode_detailed)
+                await self.run_test("ChatGPT Detailed Functionality", self.test_chatgpt_detailed)
+                await self.run_test("Page Modification Persistence", self.test_page_persistence)
+                await self.run_test("Add New Section Feature", self.test_add_new_section)
+                await self.run_test("Style Modification Options", self.test_style_options)
             
         finally:
             await self.teardown()
@@ -341,8 +387,11 @@ class DetailedFeatureTester:
             return 1
 
 async def main():
+    options = parse_options()
     tester = DetailedFeatureTester()
-    return await tester.run_detailed_tests()
+    result = await tester.run_detailed_tests(concurrency=options.concurrency)
+    tester.timer.report(options.timing_report)
+    return result
 
 if __name__ == "__main__":
     result = asyncio.run(main())
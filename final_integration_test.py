@@ -6,61 +6,79 @@ Comprehensive testing summary and issue identification
 
 import asyncio
 import sys
-from playwright.async_api import async_playwright
+from ui_harness import (
+    BrowserPool, StepTimer, count_elements, notification_count, parse_options,
+    wait_for_class, wait_for_count_above, wait_for_display, wait_for_notification
+)
 
 class FinalIntegrationTester:
-    def __init__(self):
+    def __init__(self, pool=None, timer=None):
         self.issues_found = []
         self.successes = []
-        self.browser = None
+        self.pool = pool
+        self.owns_pool = pool is None
+        self.timer = timer or StepTimer()
         self.page = None
 
     async def setup(self):
         """Setup browser and page"""
-        playwright = await async_playwright().start()
-        self.browser = await playwright.chromium.launch(headless=True)
-        self.page = await self.browser.new_page()
-        await self.page.set_viewport_size({"width": 1920, "height": 1080})
-        
-        # Enable console logging
-        self.page.on("console", lambda msg: print(f"CONSOLE: {msg.text}"))
+        if self.pool is None:
+            self.pool = BrowserPool()
+        await self.pool.start()
+        self.page = await self.pool.new_page()
 
     async def teardown(self):
         """Cleanup browser"""
-        if self.browser:
-            await self.browser.close()
+        if self.page:
+            await self.pool.close_page(self.page)
+            self.page = None
+        if self.owns_pool:
+            await self.pool.stop()
 
-    async def setup_complete_flow(self):
-        """Setup the complete flow to get to preview mode"""
-        await self.page.goto('http://localhost:8000', wait_until='domcontentloaded', timeout=10000)
+    async def complete_flow(self, page):
+        """Drive the real form-to-preview flow on the given page"""
+        await page.goto('http://localhost:8000', wait_until='domcontentloaded', timeout=10000)
         
         # Fill form
-        await self.page.fill("#businessName", "Restaurant Le Gourmet")
-        await self.page.select_option("#siteType", "restaurant")
-        await self.page.fill("#description", "Un restaurant gastronomique français proposant une cuisine raffinée")
-        await self.page.fill("#userEmail", "contact@legourmet.fr")
-        await self.page.fill("#phone", "01 23 45 67 89")
-        await self.page.fill("#address", "123 Rue de la Gastronomie, 75001 Paris")
+        await page.fill("#businessName", "Restaurant Le Gourmet")
+        await page.select_option("#siteType", "restaurant")
+        await page.fill("#description", "Un restaurant gastronomique français proposant une cuisine raffinée")
+        await page.fill("#userEmail", "contact@legourmet.fr")
+        await page.fill("#phone", "01 23 45 67 89")
+        await page.fill("#address", "123 Rue de la Gastronomie, 75001 Paris")
         
         # Submit form
-        await self.page.click("button[type='submit']")
-        await self.page.wait_for_function(
+        await page.click("button[type='submit']")
+        await page.wait_for_function(
             "document.getElementById('qualityTemplates').style.display !== 'none'",
             timeout=10000
         )
         
         # Select template
-        template_cards = await self.page.query_selector_all(".template-card")
+        # The grid is built once the template catalog is loaded
+        await page.wait_for_selector(".template-card", timeout=10000)
+        template_cards = await page.query_selector_all(".template-card")
         await template_cards[0].click()
         
         # Generate preview
-        continue_btn = await self.page.wait_for_selector("#continueBtn:not([disabled])", timeout=5000)
+        continue_btn = await page.wait_for_selector("#continueBtn:not([disabled])", timeout=5000)
         await continue_btn.click()
-        await self.page.wait_for_function(
+        await page.wait_for_function(
             "document.getElementById('previewSection').style.display !== 'none'",
             timeout=10000
         )
 
+    async def setup_complete_flow(self):
+        """Setup the complete flow to get to preview mode
+
+        The real flow only runs once per browser pool; later calls get a
+        fresh context with the captured preview state restored.
+        """
+        if self.page:
+            await self.pool.close_page(self.page)
+            self.page = None
+        self.page = await self.pool.preview_page(self.complete_flow, key="final")
+
     async def test_comprehensive_flow(self):
         """Test the complete user flow comprehensively"""
         print("🔍 Testing comprehensive user flow...")
@@ -101,6 +119,8 @@ class FinalIntegrationTester:
             self.successes.append("✅ Form submission navigates to templates correctly")
             
             # Test template selection
+            # The grid is built once the template catalog is loaded
+            await self.page.wait_for_selector(".template-card", timeout=10000)
             template_cards = await self.page.query_selector_all(".template-card")
             if len(template_cards) >= 10:
                 self.successes.append(f"✅ {len(template_cards)} templates available")
@@ -130,7 +150,7 @@ class FinalIntegrationTester:
                 
                 # Activate edit mode
                 await edit_btn.click()
-                await self.page.wait_for_timeout(1000)
+                await self.timer.wait("Edit mode toggle", 1000, wait_for_class(self.page, "#websitePreview", "edit-mode"), required=False)
                 
                 btn_text_after = await edit_btn.inner_text()
                 if "Activé" in btn_text_after:
@@ -145,7 +165,7 @@ class FinalIntegrationTester:
                     
                     # Test clicking on editable element
                     await editable_elements[0].click()
-                    await self.page.wait_for_timeout(500)
+                    await self.timer.wait("Edit toolbar", 500, wait_for_count_above(self.page, ".edit-toolbar", 0, timeout=500), required=False)
                     
                     # Check for edit toolbar
                     edit_toolbar = await self.page.query_selector(".edit-toolbar")
@@ -175,8 +195,9 @@ class FinalIntegrationTester:
                 
                 update_btn = await self.page.query_selector("button:has-text('Mettre à jour')")
                 if update_btn:
+                    notifications = await notification_count(self.page)
                     await update_btn.click()
-                    await self.page.wait_for_timeout(1000)
+                    await self.timer.wait("Preview update", 1000, wait_for_notification(self.page, notifications), required=False)
                     self.successes.append("✅ Customization updates work")
                 else:
                     self.issues_found.append("❌ Update preview button not found")
@@ -186,8 +207,9 @@ class FinalIntegrationTester:
             # Test add new section
             add_section_btn = await self.page.query_selector("button:has-text('Ajouter une section')")
             if add_section_btn:
+                notifications = await notification_count(self.page)
                 await add_section_btn.click()
-                await self.page.wait_for_timeout(1000)
+                await self.timer.wait("Add section", 1000, wait_for_notification(self.page, notifications), required=False)
                 self.successes.append("✅ Add new section button works")
             else:
                 self.issues_found.append("❌ Add new section button not found")
@@ -207,7 +229,7 @@ class FinalIntegrationTester:
                 
                 # Open ChatGPT
                 await chatgpt_toggle.click()
-                await self.page.wait_for_timeout(1000)
+                await self.timer.wait("ChatGPT open", 1000, wait_for_display(self.page, "#miniChatGPT"), required=False)
                 
                 chatgpt_widget = await self.page.query_selector("#miniChatGPT")
                 if chatgpt_widget:
@@ -231,14 +253,16 @@ class FinalIntegrationTester:
                             await chat_input.fill("aide")
                             send_btn = await self.page.query_selector("button:has-text('Envoyer')")
                             if send_btn:
+                                bot_messages = await count_elements(self.page, ".message.bot")
                                 await send_btn.click()
-                                await self.page.wait_for_timeout(1000)
+                                await self.timer.wait("ChatGPT reply", 1000, wait_for_count_above(self.page, ".message.bot", bot_messages), required=False)
                                 self.successes.append("✅ ChatGPT help command works")
                                 
                                 # Test /image command
                                 await chat_input.fill("/image restaurant moderne")
+                                image_results = await count_elements(self.page, ".image-search-result")
                                 await send_btn.click()
-                                await self.page.wait_for_timeout(2000)
+                                await self.timer.wait("Image search results", 2000, wait_for_count_above(self.page, ".image-search-result", image_results), required=False)
                                 self.successes.append("✅ ChatGPT /image command works")
                             else:
                                 self.issues_found.append("❌ ChatGPT send button not found")
@@ -249,7 +273,7 @@ class FinalIntegrationTester:
                         chatgpt_header = await self.page.query_selector(".chatgpt-header")
                         if chatgpt_header:
                             await chatgpt_header.click()  # Minimize
-                            await self.page.wait_for_timeout(500)
+                            await self.timer.wait("ChatGPT minimize", 500, wait_for_class(self.page, "#miniChatGPT", "minimized"), required=False)
                             
                             minimized_class = await chatgpt_widget.get_attribute("class")
                             if "minimized" in (minimized_class or ""):
@@ -258,13 +282,13 @@ class FinalIntegrationTester:
                                 self.issues_found.append("❌ ChatGPT minimize doesn't work")
                             
                             await chatgpt_header.click()  # Maximize
-                            await self.page.wait_for_timeout(500)
+                            await self.timer.wait("ChatGPT maximize", 500, wait_for_class(self.page, "#miniChatGPT", "minimized", present=False), required=False)
                         
                         # Test close
                         close_btn = await self.page.query_selector("button:has(.fa-times)")
                         if close_btn:
                             await close_btn.click()
-                            await self.page.wait_for_timeout(500)
+                            await self.timer.wait("ChatGPT close", 500, wait_for_display(self.page, "#miniChatGPT", visible=False), required=False)
                             
                             display_after = await chatgpt_widget.evaluate("el => getComputedStyle(el).display")
                             if display_after == "none":
@@ -289,7 +313,7 @@ class FinalIntegrationTester:
                 # Test clicking different tabs
                 for i, tab in enumerate(page_tabs[:3]):
                     await tab.click()
-                    await self.page.wait_for_timeout(500)
+                    await self.timer.wait("Page tab switch", 500, wait_for_class(self.page, tab, "active"), required=False)
                     
                     classes = await tab.get_attribute("class")
                     if "active" in (classes or ""):
@@ -380,8 +404,11 @@ class FinalIntegrationTester:
             return 1
 
 async def main():
+    options = parse_options()
     tester = FinalIntegrationTester()
-    return await tester.run_final_test()
+    result = await tester.run_final_test()
+    tester.timer.report(options.timing_report)
+    return result
 
 if __name__ == "__main__":
     result = asyncio.run(main())
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Heap and Storage Footprint Profiler for IA WebGen Pro
+Uploads N photos through the real file input, generates a site with P pages
+and sends it several times, measuring the JS heap (CDP), DOM size and
+localStorage bytes after each stage. Optionally takes CDP heap snapshots and
+accounts for the data-URL strings they hold.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from ui_harness import BASE_URL, BrowserPool, wait_for_display
+
+PAGE_SETS = {
+    1: ["accueil"],
+    4: ["accueil", "apropos", "services", "contact"],
+    8: ["accueil", "apropos", "services", "portfolio", "equipe", "temoignages", "blog", "contact"]
+}
+
+# UTF-16: every character of every key and value costs two bytes of quota
+LOCAL_STORAGE_BYTES = """() => {
+    let total = 0;
+    for (let i = 0; i < localStorage.length; i++) {
+        const key = localStorage.key(i);
+        total += (key.length + localStorage.getItem(key).length) * 2;
+    }
+    return total;
+}"""
+
+APP_STATE_BYTES = """() => ({
+    uploadedPhotos: uploadedPhotos.reduce((sum, p) => sum + (p.dataURL || '').length, 0),
+    generatedPages: Object.values(generatedPages).reduce((sum, html) => sum + html.length, 0),
+    sentWebsites: JSON.parse(localStorage.getItem('sentWebsites') || '[]').length
+})"""
+
+SELECT_PAGES = """(pages) => {
+    document.querySelectorAll('input[id^="page-"]').forEach(el => {
+        if (!el.disabled) el.checked = pages.includes(el.id.replace('page-', ''));
+    });
+}"""
+
+# Sending needs a signed-in account; without the backend its token is never checked
+SIGN_IN = """() => {
+    currentUser = { name: 'Profiler', email: 'contact@legourmet.fr', token: 'offline' };
+}"""
+
+SEND_AGAIN = """() => {
+    document.getElementById('finalEmailForm').style.display = 'block';
+    sendWebsiteEmail({ preventDefault() {} });
+}"""
+
+
+def fake_jpeg(index, size):
+    """Incompressible bytes with a JPEG header, like a real camera photo"""
+    return {
+        "name": f"photo-{index + 1}.jpg",
+        "mimeType": "image/jpeg",
+        "buffer": b"\xff\xd8\xff\xe0" + os.urandom(size - 4)
+    }
+
+
+def analyze_snapshot(text):
+    """Size of a heap snapshot and of the big / data-URL strings it holds"""
+    snapshot = json.loads(text)
+    data_url_bytes = 0
+    big_strings = 0
+    big_string_bytes = 0
+    for string in snapshot["strings"]:
+        if string.startswith("data:"):
+            data_url_bytes += len(string)
+        if len(string) > 100 * 1024:
+            big_strings += 1
+            big_string_bytes += len(string)
+    return {
+        "snapshot_bytes": len(text),
+        "data_url_string_bytes": data_url_bytes,
+        "strings_over_100kb": big_strings,
+        "strings_over_100kb_bytes": big_string_bytes
+    }
+
+
+class FootprintProfiler:
+    def __init__(self, photo_counts=(0, 1, 3, 5), page_counts=(1, 4, 8), photo_kb=2048, sends=3, snapshot_dir=None):
+        self.photo_counts = list(photo_counts)
+        self.page_counts = list(page_counts)
+        self.photo_kb = photo_kb
+        self.sends = sends
+        self.snapshot_dir = snapshot_dir
+        self.pool = BrowserPool(max_contexts=1, log_console=False)
+        self.rows = []
+
+    async def measure(self, page, cdp, scenario, stage):
+        """Record heap, DOM and storage figures for one stage"""
+        await cdp.send("HeapProfiler.collectGarbage")
+        heap = await cdp.send("Runtime.getHeapUsage")
+        metrics = {m["name"]: m["value"] for m in (await cdp.send("Performance.getMetrics"))["metrics"]}
+        row = {
+            **scenario,
+            "stage": stage,
+            "js_heap_used": heap["usedSize"],
+            "js_heap_total": heap["totalSize"],
+            "dom_nodes": int(metrics.get("Nodes", 0)),
+            "event_listeners": int(metrics.get("JSEventListeners", 0)),
+            "local_storage_bytes": await page.evaluate(LOCAL_STORAGE_BYTES),
+            "state_chars": await page.evaluate(APP_STATE_BYTES)
+        }
+        self.rows.append(row)
+        return row
+
+    async def heap_snapshot(self, cdp, name):
+        """Take a CDP heap snapshot, save it and analyze its strings"""
+        chunks = []
+        cdp.on("HeapProfiler.addHeapSnapshotChunk", lambda event: chunks.append(event["chunk"]))
+        await cdp.send("HeapProfiler.takeHeapSnapshot", {"reportProgress": False})
+        text = "".join(chunks)
+        path = os.path.join(self.snapshot_dir, f"{name}.heapsnapshot")
+        with open(path, "w") as f:
+            f.write(text)
+        return analyze_snapshot(text)
+
+    async def profile(self, photos, pages):
+        """One scenario in its own context, so localStorage starts empty"""
+        scenario = {"photos": photos, "pages": pages}
+        errors = []
+        try:
+            await self.run_scenario(scenario, errors)
+        finally:
+            quota_errors = [error for error in errors if "quota" in error.lower()]
+            if quota_errors:
+                print(f"  ⚠️ {len(quota_errors)} localStorage quota error(s)")
+                self.rows[-1]["quota_errors"] = len(quota_errors)
+
+    async def run_scenario(self, scenario, errors):
+        """Upload, generate and send, measuring after each stage"""
+        photos = scenario["photos"]
+        pages = scenario["pages"]
+        async with self.pool.page() as page:
+            page.on("pageerror", lambda error: errors.append(str(error)))
+            cdp = await page.context.new_cdp_session(page)
+            await cdp.send("Performance.enable")
+            await cdp.send("HeapProfiler.enable")
+
+            await page.goto(BASE_URL, wait_until='domcontentloaded', timeout=10000)
+            await self.measure(page, cdp, scenario, "loaded")
+
+            if photos:
+                await page.set_input_files("#photoInput", [fake_jpeg(i, self.photo_kb * 1024) for i in range(photos)])
+                await page.wait_for_function("n => uploadedPhotos.length >= n", arg=photos, timeout=60000)
+            await self.measure(page, cdp, scenario, "uploaded")
+
+            await page.fill("#businessName", "Restaurant Le Gourmet")
+            await page.select_option("#siteType", "restaurant")
+            await page.fill("#description", "Un restaurant gastronomique français proposant une cuisine raffinée")
+            await page.fill("#userEmail", "contact@legourmet.fr")
+            await page.evaluate(SELECT_PAGES, PAGE_SETS[pages])
+            await page.click("button[type='submit']")
+            await wait_for_display(page, "#qualityTemplates")
+            await page.click(".template-card")
+            await page.click("#continueBtn:not([disabled])")
+            await wait_for_display(page, "#previewSection")
+            await self.measure(page, cdp, scenario, "preview")
+
+            await page.evaluate(SIGN_IN)
+            await page.click("button:has-text('RECEVOIR MON SITE PAR EMAIL')")
+            await wait_for_display(page, "#emailSection")
+            for send in range(1, self.sends + 1):
+                if send == 1:
+                    await page.click("#sendEmailBtn")
+                else:
+                    await page.evaluate(SEND_AGAIN)
+                # Without the backend the send is simulated with a 3 s timer and the
+                # site kept in localStorage
+                await page.wait_for_function(
+                    "n => JSON.parse(localStorage.getItem('sentWebsites') || '[]').length >= n", arg=send, timeout=10000
+                )
+                await self.measure(page, cdp, scenario, f"sent x{send}")
+
+            if self.snapshot_dir:
+                self.rows[-1].update(await self.heap_snapshot(cdp, f"photos{photos}-pages{pages}"))
+
+    async def run(self):
+        await self.pool.start()
+        try:
+            for photos in self.photo_counts:
+                for pages in self.page_counts:
+                    print(f"🔍 Profiling {photos} photo(s) x {pages} page(s)...")
+                    try:
+                        await self.profile(photos, pages)
+                    except Exception as e:
+                        # A full quota stops the send loop; keep what was measured
+                        print(f"  ❌ Stopped early - Error: {str(e)}")
+        finally:
+            await self.pool.stop()
+        return self.rows
+
+    def report(self):
+        print(f"\n📊 {'photos':>6} {'pages':>5} {'stage':<9} {'JS heap':>10} {'DOM nodes':>10} {'localStorage':>13} {'pages HTML':>11}")
+        for row in self.rows:
+            print(f"   {row['photos']:>6} {row['pages']:>5} {row['stage']:<9}"
+                  f" {row['js_heap_used'] / 2**20:>8.1f}MB {row['dom_nodes']:>10}"
+                  f" {row['local_storage_bytes'] / 2**20:>11.2f}MB {row['state_chars']['generatedPages'] / 2**20:>9.2f}MB"
+                  + (f"  heap snapshot: {row['data_url_string_bytes'] / 2**20:.1f}MB of data URLs" if "data_url_string_bytes" in row else ""))
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile heap, DOM and localStorage growth")
+    parser.add_argument("--photos", default="0,1,3,5", help="photo counts to profile")
+    parser.add_argument("--pages", default="1,4,8", help=f"page counts to profile ({', '.join(map(str, PAGE_SETS))})")
+    parser.add_argument("--photo-kb", type=int, default=2048, help="size of each uploaded photo")
+    parser.add_argument("--sends", type=int, default=3, help="how many times the site is sent")
+    parser.add_argument("--snapshots", default=None, help="directory for CDP heap snapshots")
+    parser.add_argument("--json", default=None, help="write the measurements to this file")
+    args = parser.parse_args(argv)
+
+    page_counts = [int(count) for count in args.pages.split(",")]
+    for count in page_counts:
+        if count not in PAGE_SETS:
+            parser.error(f"--pages must be among {', '.join(map(str, PAGE_SETS))}")
+    if args.snapshots:
+        os.makedirs(args.snapshots, exist_ok=True)
+
+    print("🚀 IA WebGen Pro - Heap & Storage Footprint")
+    print("=" * 60)
+
+    profiler = FootprintProfiler([int(count) for count in args.photos.split(",")], page_counts,
+                                 args.photo_kb, args.sends, args.snapshots)
+    await profiler.run()
+    profiler.report()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(profiler.rows, f, indent=2)
+        print(f"\n💾 Measurements written to {args.json}")
+    return 0
+
+if __name__ == "__main__":
+    result = asyncio.run(main())
+    sys.exit(result)
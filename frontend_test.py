@@ -6,29 +6,54 @@ Comprehensive testing of all UI functionality using Playwright
 
 import asyncio
 import sys
-from playwright.async_api import async_playwright
+from ui_harness import (
+    BrowserPool, StepTimer, count_elements, notification_count, parse_options, run_chains,
+    wait_for_class, wait_for_count_above, wait_for_display, wait_for_notification
+)
 
 class IAWebGenUITester:
-    def __init__(self):
+    # Dependency chains for concurrent mode: tests in a chain share one page
+    # and run in order, separate chains run on their own pages. The ChatGPT
+    # chain starts from the state the sequential run reaches it in
+    CHAINS = [
+        [
+            ("Page Loading", "test_page_loading"),
+            ("Form Submission", "test_form_submission"),
+            ("Template Selection", "test_template_selection"),
+            ("Page Navigation", "test_page_navigation"),
+            ("Edit Mode Activation", "test_edit_mode"),
+            ("Customization Options", "test_customization_options"),
+            ("Finalization Flow", "test_finalization_flow")
+        ],
+        [
+            "setup_customized_preview",
+            ("ChatGPT Widget", "test_chatgpt_widget"),
+            ("ChatGPT Image Command", "test_chatgpt_image_command")
+        ]
+    ]
+
+    def __init__(self, pool=None, timer=None):
         self.tests_run = 0
         self.tests_passed = 0
-        self.browser = None
+        self.pool = pool
+        self.owns_pool = pool is None
+        self.timer = timer or StepTimer()
         self.page = None
 
     async def setup(self):
         """Setup browser and page"""
-        playwright = await async_playwright().start()
-        self.browser = await playwright.chromium.launch(headless=True)
-        self.page = await self.browser.new_page()
-        await self.page.set_viewport_size({"width": 1920, "height": 1080})
-        
-        # Enable console logging
-        self.page.on("console", lambda msg: print(f"CONSOLE: {msg.text}"))
+        if self.pool is None:
+            self.pool = BrowserPool()
+        await self.pool.start()
+        self.page = await self.pool.new_page()
 
     async def teardown(self):
         """Cleanup browser"""
-        if self.browser:
-            await self.browser.close()
+        if self.page:
+            await self.pool.close_page(self.page)
+            self.page = None
+        if self.owns_pool:
+            await self.pool.stop()
 
     async def run_test(self, name, test_func):
         """Run a single test"""
@@ -47,6 +72,30 @@ class IAWebGenUITester:
             print(f"❌ Failed - Error: {str(e)}")
             return False
 
+    async def complete_flow(self, page):
+        """Drive the real form-to-preview steps on the given page"""
+        # The pool owns `page` until preview_page returns it
+        self.page = page
+        try:
+            for step in (self.test_page_loading, self.test_form_submission, self.test_template_selection):
+                if not await step():
+                    raise RuntimeError(f"Preview setup failed at {step.__name__}")
+        finally:
+            self.page = None
+
+    async def setup_customized_preview(self):
+        """Preview with edit mode on and the customization applied, as after phase 2
+
+        The form-to-preview steps only run once per pool; later pages get the
+        captured preview restored.
+        """
+        if self.page:
+            await self.pool.close_page(self.page)
+            self.page = None
+        self.page = await self.pool.preview_page(self.complete_flow, key="frontend")
+        if not await self.test_edit_mode() or not await self.test_customization_options():
+            raise RuntimeError("Edit mode setup failed")
+
     async def test_page_loading(self):
         """Test basic page loading"""
         await self.page.goto('http://localhost:8000', wait_until='domcontentloaded', timeout=10000)
@@ -85,6 +134,8 @@ class IAWebGenUITester:
         )
         
         # Check if templates are loaded
+        # The grid is built once the template catalog is loaded
+        await self.page.wait_for_selector(".template-card", timeout=10000)
         template_cards = await self.page.query_selector_all(".template-card")
         return len(template_cards) > 0
 
@@ -125,7 +176,7 @@ class IAWebGenUITester:
         # Click on different tabs
         for i, tab in enumerate(page_tabs[:3]):  # Test first 3 tabs
             await tab.click()
-            await self.page.wait_for_timeout(500)  # Wait for content to load
+            await self.timer.wait("Page tab switch", 500, wait_for_class(self.page, tab, "active"))
             
             # Check if tab is active
             classes = await tab.get_attribute("class")
@@ -142,7 +193,7 @@ class IAWebGenUITester:
             return False
             
         await edit_btn.click()
-        await self.page.wait_for_timeout(1000)
+        await self.timer.wait("Edit mode toggle", 1000, wait_for_class(self.page, "#websitePreview", "edit-mode"))
         
         # Check if edit mode is activated
         body_classes = await self.page.get_attribute("body", "class")
@@ -164,7 +215,7 @@ class IAWebGenUITester:
             return False
             
         await chatgpt_toggle.click()
-        await self.page.wait_for_timeout(1000)
+        await self.timer.wait("ChatGPT open", 1000, wait_for_display(self.page, "#miniChatGPT"))
         
         # Check if ChatGPT widget is visible
         chatgpt_widget = await self.page.query_selector("#miniChatGPT")
@@ -186,8 +237,9 @@ class IAWebGenUITester:
         # Find and click send button
         send_btn = await self.page.query_selector("button:has-text('Envoyer')")
         if send_btn:
+            bot_messages = await count_elements(self.page, ".message.bot")
             await send_btn.click()
-            await self.page.wait_for_timeout(1000)
+            await self.timer.wait("ChatGPT reply", 1000, wait_for_count_above(self.page, ".message.bot", bot_messages))
             
         return True
 
@@ -203,7 +255,7 @@ class IAWebGenUITester:
             # Open ChatGPT first
             chatgpt_toggle = await self.page.query_selector("#chatgptToggle")
             await chatgpt_toggle.click()
-            await self.page.wait_for_timeout(1000)
+            await self.timer.wait("ChatGPT open", 1000, wait_for_display(self.page, "#miniChatGPT"))
         
         # Test image command
         chat_input = await self.page.query_selector("#chatgptInput")
@@ -214,8 +266,9 @@ class IAWebGenUITester:
         
         send_btn = await self.page.query_selector("button:has-text('Envoyer')")
         if send_btn:
+            image_results = await count_elements(self.page, ".image-search-result")
             await send_btn.click()
-            await self.page.wait_for_timeout(2000)  # Wait longer for image search
+            await self.timer.wait("Image search results", 2000, wait_for_count_above(self.page, ".image-search-result", image_results))
             
         return True
 
@@ -242,8 +295,9 @@ class IAWebGenUITester:
         # Click update preview button
         update_btn = await self.page.query_selector("button:has-text('Mettre à jour')")
         if update_btn:
+            notifications = await notification_count(self.page)
             await update_btn.click()
-            await self.page.wait_for_timeout(1000)
+            await self.timer.wait("Preview update", 1000, wait_for_notification(self.page, notifications))
             
         return True
 
@@ -266,39 +320,57 @@ class IAWebGenUITester:
         email_form = await self.page.query_selector("#finalEmailForm")
         return email_form is not None
 
-    async def run_all_tests(self):
-        """Run all tests"""
+    async def run_phases(self):
+        """Run the phases in order on a single page"""
+        # Phase 1: Basic Flow
+        print("\n=== PHASE 1: BASIC FLOW ===")
+        await self.run_test("Page Loading", self.test_page_loading)
+        await self.run_test("Form Submission", self.test_form_submission)
+        await self.run_test("Template Selection", self.test_template_selection)
+        await self.run_test("Page Navigation", self.test_page_navigation)
+        
+        # Phase 2: Edit Mode
+        print("\n=== PHASE 2: EDIT MODE ===")
+        await self.run_test("Edit Mode Activation", self.test_edit_mode)
+        await self.run_test("Customization Options", self.test_customization_options)
+        
+        # Phase 3: ChatGPT Widget
+        print("\n=== PHASE 3: CHATGPT WIDGET ===")
+        await self.run_test("ChatGPT Widget", self.test_chatgpt_widget)
+        await self.run_test("ChatGPT Image Command", self.test_chatgpt_image_command)
+        
+        # Phase 4: Finalization
+        print("\n=== PHASE 4: FINALIZATION ===")
+        await self.run_test("Finalization Flow", self.test_finalization_flow)
+
+    async def run_concurrent(self, concurrency):
+        """Run the dependency chains concurrently on separate pages"""
+        if self.page:
+            await self.pool.close_page(self.page)
+            self.page = None
+        results = await run_chains(self.pool, lambda: IAWebGenUITester(self.pool, self.timer), self.CHAINS, concurrency)
+        self.tests_run += len(results)
+        self.tests_passed += sum(1 for _, passed in results if passed)
+
+    async def run_all_tests(self, concurrency=None):
+        """Run all tests, concurrently by dependency chain if a limit is given"""
         print("🚀 IA WebGen Pro - Frontend UI Testing Started")
         print("=" * 60)
         
         await self.setup()
         
         try:
-            # Phase 1: Basic Flow
-            print("\n=== PHASE 1: BASIC FLOW ===")
-            await self.run_test("Page Loading", self.test_page_loading)
-            await self.run_test("Form Submission", self.test_form_submission)
-            await self.run_test("Template Selection", self.test_template_selection)
-            await self.run_test("Page Navigation", self.test_page_navigation)
-            
-            # Phase 2: Edit Mode
-            print("\n=== PHASE 2: EDIT MODE ===")
-            await self.run_test("Edit Mode Activation", self.test_edit_mode)
-            await self.run_test("Customization Options", self.test_customization_options)
-            
-            # Phase 3: ChatGPT Widget
-            print("\n=== PHASE 3: CHATGPT WIDGET ===")
-            await self.run_test("ChatGPT Widget", self.test_chatgpt_widget)
-            await self.run_test("ChatGPT Image Command", self.test_chatgpt_image_command)
-            
-            # Phase 4: Finalization
-            print("\n=== PHASE 4: FINALIZATION ===")
-            await self.run_test("Finalization Flow", self.test_finalization_flow)
-            
+            if concurrency:
+                await self.run_concurrent(concurrency)
+            else:
+                await self.run_phases()
         finally:
             await self.teardown()
         
-        # Print results
+        return self.report()
+
+    def report(self):
+        """Print results and return the exit code"""
         print("\n" + "=" * 60)
         print(f"📊 Tests Results: {self.tests_passed}/{self.tests_run} passed")
         
@@ -310,8 +382,11 @@ class IAWebGenUITester:
             return 1
 
 async def main():
+    options = parse_options()
     tester = IAWebGenUITester()
-    return await tester.run_all_tests()
+    result = await tester.run_all_tests(concurrency=options.concurrency)
+    tester.timer.report(options.timing_report)
+    return result
 
 if __name__ == "__main__":
     result = asyncio.run(main())
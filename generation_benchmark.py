@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Generation Benchmark for IA WebGen Pro
+Times the in-page site generators through Playwright across templates, site
+types, page sets and photo counts, and compares against a saved JSON baseline
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import sys
+from datetime import datetime
+from ui_harness import BASE_URL, BrowserPool
+
+GENERATORS = [
+    "generateAllPages",
+    "generatePageContent",
+    "generateAccueilContent",
+    "generateBlogContent",
+    "updatePreview"
+]
+
+BENCH_DATA = {
+    "businessName": "Restaurant Le Gourmet",
+    "description": "Un restaurant gastronomique français proposant une cuisine raffinée avec des produits locaux et de saison.",
+    "userEmail": "contact@legourmet.fr",
+    "phone": "01 23 45 67 89",
+    "address": "123 Rue de la Gastronomie, 75001 Paris",
+    "website": "",
+    "slogan": "L'art de la gastronomie française",
+    "teamInfo": "Une équipe de cuisiniers passionnés.",
+    "servicesDetail": "Menu du jour, carte des vins, privatisation.",
+    "socialMedia": {"facebook": "https://facebook.com/legourmet", "instagram": "", "linkedin": "", "twitter": ""},
+    "mainTitle": "Restaurant Le Gourmet",
+    "subtitle": "L'art de la gastronomie française"
+}
+
+# Templates, site types and the default page selection come from the page
+# itself so the matrix follows index.html
+READ_MATRIX = """() => ({
+    templates: TEMPLATES.map(t => t.id),
+    siteTypes: [...document.querySelectorAll('#siteType option')].map(o => o.value).filter(Boolean),
+    allPages: [...document.querySelectorAll('input[id^="page-"]')].map(el => el.id.replace('page-', '')),
+    defaultPages: [...document.querySelectorAll('input[id^="page-"]:checked')].map(el => el.id.replace('page-', ''))
+})"""
+
+MAKE_PHOTOS = """([count, bytes]) => {
+    const payload = 'A'.repeat(Math.ceil(bytes / 3) * 4);
+    window.__benchPhotos = Array.from({ length: count }, (_, i) => ({
+        name: `photo-${i + 1}.jpg`,
+        dataURL: `data:image/jpeg;base64,${payload}`
+    }));
+}"""
+
+# Runs every generator `iterations` times for one combination. Each sample
+# times `batch` back-to-back calls because performance.now() is coarsened.
+RUN_COMBINATION = """([base, combo, iterations, batch]) => {
+    allTemplates = TEMPLATES;
+    selectedTemplate = TEMPLATES.findIndex(t => t.id === combo.template);
+    const template = TEMPLATES[selectedTemplate];
+    uploadedPhotos = window.__benchPhotos.slice(0, combo.photos);
+    websiteData = {
+        ...base,
+        siteType: combo.siteType,
+        selectedPages: combo.pages,
+        photos: uploadedPhotos,
+        primaryColor: template.colors.primary,
+        secondaryColor: template.colors.secondary
+    };
+    document.getElementById('primaryColor').value = websiteData.primaryColor;
+    document.getElementById('secondaryColor').value = websiteData.secondaryColor;
+    document.getElementById('mainTitle').value = websiteData.mainTitle;
+    document.getElementById('subtitle').value = websiteData.subtitle;
+    currentPage = 'accueil';
+
+    const preview = document.getElementById('websitePreview');
+    const targets = {
+        generateAllPages: () => { generateAllPages(); return Object.values(generatedPages).join(''); },
+        generatePageContent: () => generatePageContent('accueil'),
+        generateAccueilContent: () => generateAccueilContent(),
+        generateBlogContent: () => generateBlogContent(),
+        updatePreview: () => { updatePreview(); return preview.innerHTML; }
+    };
+
+    const encoder = new TextEncoder();
+    const results = {};
+    for (const [name, fn] of Object.entries(targets)) {
+        let html = fn();
+        const samples = [];
+        for (let i = 0; i < iterations; i++) {
+            const start = performance.now();
+            for (let j = 0; j < batch; j++) html = fn();
+            samples.push((performance.now() - start) / batch);
+        }
+        results[name] = { samples, htmlBytes: encoder.encode(html).length };
+    }
+    return results;
+}"""
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def combination_key(combo):
+    """Stable baseline key for one matrix cell"""
+    return f"{combo['template']}|{combo['siteType']}|{'+'.join(combo['pages'])}|{combo['photos']}"
+
+
+class GenerationBenchmark:
+    def __init__(self, iterations=10, batch=3, photo_counts=(0, 1, 3, 5), photo_kb=500, quick=False):
+        self.iterations = iterations
+        self.batch = batch
+        self.photo_counts = list(photo_counts)
+        self.photo_kb = photo_kb
+        self.quick = quick
+        self.pool = BrowserPool(max_contexts=1, log_console=False)
+        self.page = None
+        self.results = {}
+
+    async def setup(self):
+        """Open one page on the app"""
+        await self.pool.start()
+        self.page = await self.pool.new_page()
+        await self.page.goto(BASE_URL, wait_until='domcontentloaded', timeout=10000)
+        await self.page.evaluate(MAKE_PHOTOS, [max(self.photo_counts), self.photo_kb * 1024])
+
+    async def teardown(self):
+        """Cleanup browser"""
+        if self.page:
+            await self.pool.close_page(self.page)
+            self.page = None
+        await self.pool.stop()
+
+    async def build_matrix(self):
+        """Templates x site types x page sets x photo counts"""
+        matrix = await self.page.evaluate(READ_MATRIX)
+        templates = matrix["templates"]
+        site_types = matrix["siteTypes"]
+        if self.quick:
+            templates = templates[:3]
+            site_types = site_types[:3]
+        page_sets = [["accueil"], matrix["defaultPages"], matrix["allPages"]]
+
+        return [
+            {"template": template, "siteType": site_type, "pages": pages, "photos": photos}
+            for template, site_type, pages, photos in itertools.product(templates, site_types, page_sets, self.photo_counts)
+        ]
+
+    async def run(self):
+        """Run the whole matrix and return per-combination statistics"""
+        await self.setup()
+        try:
+            matrix = await self.build_matrix()
+            print(f"📐 {len(matrix)} combinations x {len(GENERATORS)} generators, "
+                  f"{self.iterations} samples of {self.batch} calls each")
+
+            for number, combo in enumerate(matrix, 1):
+                raw = await self.page.evaluate(RUN_COMBINATION, [BENCH_DATA, combo, self.iterations, self.batch])
+                self.results[combination_key(combo)] = {
+                    name: {
+                        "median_ms": round(statistics.median(data["samples"]), 4),
+                        "p95_ms": round(percentile(data["samples"], 0.95), 4),
+                        "min_ms": round(min(data["samples"]), 4),
+                        "max_ms": round(max(data["samples"]), 4),
+                        "html_bytes": data["htmlBytes"]
+                    }
+                    for name, data in raw.items()
+                }
+                if number % 50 == 0 or number == len(matrix):
+                    print(f"  ... {number}/{len(matrix)}")
+        finally:
+            await self.teardown()
+        return self.results
+
+    def summary(self):
+        """Print the distribution of each generator across the matrix"""
+        print("\n📊 Generator timings across the matrix (per call):")
+        for name in GENERATORS:
+            medians = [cell[name]["median_ms"] for cell in self.results.values()]
+            sizes = [cell[name]["html_bytes"] for cell in self.results.values()]
+            worst = max(self.results, key=lambda key: self.results[key][name]["p95_ms"])
+            print(f"  {name:<24} median {statistics.median(medians):8.3f} ms  "
+                  f"p95 {percentile(medians, 0.95):8.3f} ms  "
+                  f"html {min(sizes) / 1024:8.1f}-{max(sizes) / 1024:.1f} KB  worst: {worst}")
+
+    def save_baseline(self, path):
+        """Write the results as the new baseline"""
+        with open(path, "w") as f:
+            json.dump({
+                "created": datetime.now().isoformat(),
+                "iterations": self.iterations,
+                "batch": self.batch,
+                "photo_kb": self.photo_kb,
+                "results": self.results
+            }, f, indent=1)
+        print(f"\n💾 Baseline written to {path}")
+
+    def compare(self, path, threshold, noise_floor_ms=0.05):
+        """Compare against a baseline; returns the list of regressions
+
+        A cell regresses when its median time (above the noise floor) or its
+        HTML size grows by more than `threshold` (0.2 = 20%).
+        """
+        with open(path) as f:
+            baseline = json.load(f)["results"]
+
+        regressions = []
+        compared = 0
+        for key, cell in self.results.items():
+            if key not in baseline:
+                continue
+            for name, current in cell.items():
+                previous = baseline[key].get(name)
+                if not previous:
+                    continue
+                compared += 1
+                if (current["median_ms"] - previous["median_ms"] > noise_floor_ms
+                        and current["median_ms"] > previous["median_ms"] * (1 + threshold)):
+                    regressions.append(f"{key} {name}: {previous['median_ms']:.3f} -> {current['median_ms']:.3f} ms")
+                if current["html_bytes"] > previous["html_bytes"] * (1 + threshold):
+                    regressions.append(f"{key} {name}: {previous['html_bytes']} -> {current['html_bytes']} bytes")
+
+        print(f"\n🔎 Compared {compared} measurements against {path} (threshold {threshold:.0%})")
+        return regressions
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the in-page site generators")
+    parser.add_argument("--baseline", default="generation_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown/growth ratio")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=3)
+    parser.add_argument("--photo-kb", type=int, default=500, help="size of each synthetic uploaded photo")
+    parser.add_argument("--quick", action="store_true", help="only the first 3 templates and site types")
+    args = parser.parse_args(argv)
+
+    print("🚀 IA WebGen Pro - Generation Benchmark")
+    print("=" * 60)
+
+    benchmark = GenerationBenchmark(iterations=args.iterations, batch=args.batch,
+                                    photo_kb=args.photo_kb, quick=args.quick)
+    await benchmark.run()
+    benchmark.summary()
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        benchmark.save_baseline(args.baseline)
+        return 0
+
+    regressions = benchmark.compare(args.baseline, args.threshold)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+
+    print("✅ No regression against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    result = asyncio.run(main())
+    sys.exit(result)
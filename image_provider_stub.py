@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the upstream image provider (Unsplash search API)
+Answers GET /search/photos with deterministic results after a configurable
+delay, so the backend can be load tested fully offline:
+
+    python image_provider_stub.py --port 8765 --latency-ms 80
+    UNSPLASH_API_URL=http://127.0.0.1:8765 UNSPLASH_ACCESS_KEY=stub python -m uvicorn server:app --port 8001
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+from urllib.parse import parse_qs, urlsplit
+
+
+class ImageProviderStub:
+    def __init__(self, host="127.0.0.1", port=8765, latency_ms=80, jitter_ms=20, error_rate=0.0):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.requests_served = 0
+        self.server = None
+        self.connections = set()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        return self
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            # Idle keep-alive connections would otherwise outlive the server
+            for task in self.connections:
+                task.cancel()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+            await self.server.wait_closed()
+            self.server = None
+
+    def search_results(self, query, per_page):
+        """Deterministic Unsplash-shaped results for a query"""
+        results = []
+        for i in range(per_page):
+            photo_id = hashlib.sha1(f"{query}:{i}".encode()).hexdigest()[:11]
+            base = f"{self.url}/photos/{photo_id}.jpg"
+            results.append({
+                "id": photo_id,
+                "alt_description": f"{query} {i + 1}",
+                "urls": {
+                    "raw": base,
+                    "full": base,
+                    "regular": f"{base}?w=1080",
+                    "small": f"{base}?w=400",
+                    "thumb": f"{base}?w=200"
+                },
+                "user": {"name": "Stub Photographer"}
+            })
+        return {"total": per_page, "total_pages": 1, "results": results}
+
+    async def respond(self, method, target):
+        """Status and JSON body for one request"""
+        url = urlsplit(target)
+        if method != "GET" or url.path != "/search/photos":
+            return 404, {"errors": ["Not found"]}
+
+        delay = max(0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms))
+        await asyncio.sleep(delay / 1000)
+        if random.random() < self.error_rate:
+            return 503, {"errors": ["Stub failure"]}
+
+        params = parse_qs(url.query)
+        query = params.get("query", [""])[0]
+        per_page = int(params.get("per_page", ["10"])[0])
+        return 200, self.search_results(query, per_page)
+
+    async def handle_connection(self, reader, writer):
+        """Minimal HTTP/1.1 with keep-alive, enough for an httpx client"""
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                keep_alive = True
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    if name.strip().lower() == "connection" and value.strip().lower() == "close":
+                        keep_alive = False
+
+                status, payload = await self.respond(method, target)
+                self.requests_served += 1
+                body = json.dumps(payload).encode()
+                reason = {200: "OK", 404: "Not Found", 503: "Service Unavailable"}[status]
+                writer.write(
+                    f"HTTP/1.1 {status} {reason}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.CancelledError):
+            pass
+        finally:
+            self.connections.discard(task)
+            writer.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the Unsplash search API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = ImageProviderStub(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+    await stub.start()
+    print(f"🖼️ Image provider stub listening on {stub.url}")
+    async with stub.server:
+        await stub.server.serve_forever()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Run every Playwright UI suite for IA WebGen Pro against one shared browser
+Saves a Chromium cold start per suite compared to running the scripts one by one
+"""
+
+import asyncio
+import sys
+from ui_harness import BrowserPool, StepTimer, parse_options
+from frontend_test import IAWebGenUITester
+from detailed_feature_test import DetailedFeatureTester
+from final_integration_test import FinalIntegrationTester
+
+async def main():
+    options = parse_options()
+    concurrency = options.concurrency
+    pool = BrowserPool(max_contexts=max(4, concurrency or 0))
+    timer = StepTimer()
+    await pool.start()
+    
+    try:
+        if concurrency:
+            # Suites only share the browser and the timer, so they can overlap too
+            results = await asyncio.gather(
+                IAWebGenUITester(pool, timer).run_all_tests(concurrency),
+                DetailedFeatureTester(pool, timer).run_detailed_tests(concurrency),
+                FinalIntegrationTester(pool, timer).run_final_test()
+            )
+        else:
+            results = [
+                await IAWebGenUITester(pool, timer).run_all_tests(),
+                await DetailedFeatureTester(pool, timer).run_detailed_tests(),
+                await FinalIntegrationTester(pool, timer).run_final_test()
+            ]
+    finally:
+        await pool.stop()
+    
+    timer.report(options.timing_report)
+    return max(results)
+
+if __name__ == "__main__":
+    result = asyncio.run(main())
+    sys.exit(result)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Load Test for the static servers
+Opens N concurrent connections (1000 by default) against `python -m http.server`
+and static_server.py serving the same build, each connection sending requests
+back to back for a fixed duration over a mix of the app's files, and reports
+throughput, latency percentiles and failures for both:
+
+    python static_load_test.py --connections 1000 --duration 10
+
+Connections are reopened whenever the server closes them (http.server answers
+in HTTP/1.0, one request per connection). Client and servers share the
+machine: run it on more than one core for numbers that reflect the server.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import build_static
+from backend_load_test import percentile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SERVERS = {
+    "http.server": lambda root, port: [sys.executable, "-m", "http.server", str(port), "--bind", "127.0.0.1",
+                                       "--directory", root],
+    "static_server": lambda root, port: [sys.executable, os.path.join(ROOT, "static_server.py"), "--root", root,
+                                         "--host", "127.0.0.1", "--port", str(port)]
+}
+
+
+def default_paths(root):
+    """The first load of the app: the page, the catalog and a few thumbnails"""
+    thumbnails = []
+    for folder, _, names in os.walk(os.path.join(root, "backend", "catalog", "thumbnails")):
+        thumbnails.extend("/" + os.path.relpath(os.path.join(folder, name), root).replace(os.sep, "/")
+                          for name in sorted(names) if name.endswith(".svg"))
+    return ["/", "/backend/catalog/catalog.json"] + sorted(thumbnails)[:8]
+
+
+def raise_file_limit(needed):
+    """Open file limit raised to the hard limit: both ends of every connection need a descriptor"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        wanted = needed if hard == resource.RLIM_INFINITY else min(hard, needed)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_for_port(port, timeout=15):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return True
+        except OSError:
+            await asyncio.sleep(0.1)
+    return False
+
+
+async def read_response(reader):
+    """(status, body bytes, keep-alive) of one response with a Content-Length"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("Connection closed before the response")
+    version, status = status_line.split(b" ", 2)[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    connection = headers.get("connection", "")
+    keep_alive = connection != "close" if version == b"HTTP/1.1" else connection == "keep-alive"
+    return int(status), len(body), keep_alive
+
+
+class StaticLoadGenerator:
+    def __init__(self, port, paths, connections=1000, duration=10, warmup=2, accept_encoding="gzip, br",
+                 timeout=30):
+        self.port = port
+        self.paths = paths
+        self.connections = connections
+        self.duration = duration
+        self.warmup = warmup
+        self.accept_encoding = accept_encoding
+        self.timeout = timeout
+        self.records = []
+        self.connects = 0
+        self.deadline = 0
+
+    def request(self, path):
+        return (f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{self.port}\r\n"
+                f"Accept-Encoding: {self.accept_encoding}\r\n\r\n").encode()
+
+    async def connection(self, deadline):
+        """One client connection sending requests back to back, reconnecting when closed"""
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            error = None
+            size = 0
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", self.port),
+                                                            self.timeout)
+                    self.connects += 1
+                writer.write(self.request(random.choice(self.paths)))
+                status, size, keep_alive = await asyncio.wait_for(read_response(reader), self.timeout)
+                if status != 200:
+                    error = f"HTTP {status}"
+            except (OSError, EOFError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                error = type(e).__name__
+                keep_alive = False
+            if not keep_alive and writer is not None:
+                writer.close()
+                writer = None
+            finished = time.perf_counter()
+            self.records.append({
+                "started": started,
+                "finished": finished,
+                "latency_ms": (finished - started) * 1000,
+                "bytes": size,
+                "error": error
+            })
+        if writer is not None:
+            writer.close()
+
+    async def run(self):
+        start = time.perf_counter()
+        self.deadline = start + self.warmup + self.duration
+        await asyncio.gather(*(self.connection(self.deadline) for _ in range(self.connections)))
+        # Drop the warmup window
+        measured_from = start + self.warmup
+        self.records = [record for record in self.records if record["started"] >= measured_from]
+        return self.records
+
+    def summarize(self):
+        """Throughput over the measured window; latencies also of requests still running at its end"""
+        latencies = [record["latency_ms"] for record in self.records] or [0]
+        errors = sum(1 for record in self.records if record["error"])
+        completed = [record for record in self.records if record["finished"] <= self.deadline]
+        return {
+            "requests": len(self.records),
+            "throughput_rps": round(len(completed) / self.duration, 1),
+            "mb_per_s": round(sum(record["bytes"] for record in completed) / self.duration / 1e6, 2),
+            "error_rate": round(errors / len(self.records), 4) if self.records else 1,
+            "connects": self.connects,
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "max_ms": round(max(latencies), 2)
+        }
+
+
+async def benchmark(name, root, paths, args):
+    port = free_port()
+    server = subprocess.Popen(SERVERS[name](root, port), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not await wait_for_port(port):
+            print(f"❌ {name} did not start")
+            return None
+        generator = StaticLoadGenerator(port, paths, args.connections, args.duration, args.warmup,
+                                        args.accept_encoding)
+        await generator.run()
+        return generator.summarize()
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare python -m http.server and static_server.py under load")
+    parser.add_argument("--root", default=None, help="directory to serve; a fresh build by default")
+    parser.add_argument("--connections", type=int, default=1000, help="concurrent client connections")
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds per server")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds discarded before measuring")
+    parser.add_argument("--accept-encoding", default="gzip, br")
+    parser.add_argument("--servers", default=",".join(SERVERS), help="servers to compare, in order")
+    parser.add_argument("--json", default=None, help="write the summary to this file")
+    args = parser.parse_args(argv)
+
+    print("🚀 IA WebGen Pro - Static Server Load Test")
+    print("=" * 60)
+    limit = raise_file_limit(2 * args.connections + 256)
+    if limit < 2 * args.connections + 256:
+        print(f"⚠️ Open file limit is {limit}: some of the {args.connections} connections will fail")
+
+    root = args.root
+    if root is None:
+        root = tempfile.mkdtemp(prefix="webgen-dist-")
+        build_static.build(root)
+    paths = default_paths(root)
+    summary = {}
+    try:
+        for name in args.servers.split(","):
+            print(f"🔥 {name}: {args.connections} connections, {args.duration:g}s (+{args.warmup:g}s warmup), "
+                  f"{len(paths)} files, Accept-Encoding: {args.accept_encoding}")
+            summary[name] = await benchmark(name, root, paths, args)
+    finally:
+        if args.root is None:
+            shutil.rmtree(root)
+
+    print(f"\n📊 {'server':<14} {'requests':>9} {'req/s':>8} {'MB/s':>7} {'errors':>8} {'connects':>9}"
+          f" {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for name, stats in summary.items():
+        if stats is None:
+            continue
+        print(f"   {name:<14} {stats['requests']:>9} {stats['throughput_rps']:>8} {stats['mb_per_s']:>7}"
+              f" {stats['error_rate']:>8.2%} {stats['connects']:>9} {stats['p50_ms']:>7.1f}ms"
+              f" {stats['p95_ms']:>7.1f}ms {stats['p99_ms']:>7.1f}ms {stats['max_ms']:>7.1f}ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "summary": summary}, f, indent=2)
+        print(f"\n💾 Summary written to {args.json}")
+
+    return 0 if all(stats and stats["error_rate"] == 0 for stats in summary.values()) else 1
+
+if __name__ == "__main__":
+    result = asyncio.run(main())
+    sys.exit(result)
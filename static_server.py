@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Static server for the frontend build and exported sites
+One asyncio process holding thousands of keep-alive connections, where
+`python -m http.server` spends a thread and a new connection per request and
+copies every file through Python buffers:
+
+- bodies go from the page cache to the socket with sendfile(), no copy in Python
+- the precompressed variant (.br, then .gz) written by build_static.py or the
+  site export is answered when the client accepts it
+- strong ETags (a hash of the bytes sent, per variant) and If-None-Match /
+  If-Modified-Since answered with 304
+- single byte ranges (206, If-Range, 416) so large images can be resumed
+- Cache-Control: pages revalidated, hashed names (images/<sha256>/... of the
+  export, app.3fa9c2d1.js) cached for a year as immutable, the rest for
+  --max-age seconds
+
+    python build_static.py && python static_server.py --root dist --port 8000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import mimetypes
+import os
+import re
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from urllib.parse import quote, unquote, urlsplit
+
+# Preferred first when the client gives them the same weight
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+# Content-addressed, never changes: name.<hash>.ext, or the photo variants of
+# an exported site (images/<16 hex digits of the photo's sha256>/w640.jpg)
+HASHED_NAME = re.compile(r"/[^/]+\.[0-9a-f]{8,64}\.[A-Za-z0-9]+$|^/images/[0-9a-f]{16}/[^/]+$")
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Smaller bodies go out with the headers in one write; sendfile() is worth it above
+SENDFILE_MIN_BYTES = 16 * 1024
+MAX_HEADERS = 100
+# Bodies up to this size are read and dropped to keep the connection; larger
+# or chunked ones close it
+MAX_DRAINED_BODY = 64 * 1024
+TEXT_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+def accepted_encodings(header):
+    """{encoding: q} from an Accept-Encoding header"""
+    accepted = {}
+    for part in header.split(","):
+        name, _, parameters = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        parameters = parameters.strip()
+        if parameters.startswith("q="):
+            try:
+                quality = float(parameters[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(header, available):
+    """(encoding, suffix) of the best variant among `available` suffixes, or (None, "")"""
+    accepted = accepted_encodings(header or "")
+    best, best_quality = (None, ""), 0.0
+    for encoding, suffix in ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if suffix in available and quality > best_quality:
+            best, best_quality = (encoding, suffix), quality
+    return best
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def byte_range(header, size):
+    """(start, end) of a single `bytes=` range, end excluded
+
+    None when the header is ignored and the whole file sent: malformed, not
+    in bytes, or several ranges. Raises RangeNotSatisfiable when the range
+    starts past the end of the file.
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, dash, last = ranges.strip().partition("-")
+    if not dash or not (first or last) or not (first + last).isdigit():
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable(header)
+        return max(0, size - length), size
+    start = int(first)
+    end = min(int(last) + 1, size) if last else size
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, end
+
+
+def etag_matches(header, etag):
+    """If-None-Match: any of the listed tags (weak comparison) or *"""
+    if header.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in header.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+
+def content_etag(path):
+    """Strong ETag of a file: a hash of its bytes"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return f'"{digest.hexdigest()}"'
+
+
+class StaticServer:
+    def __init__(self, root, host="127.0.0.1", port=8000, max_age=3600, immutable_max_age=IMMUTABLE_MAX_AGE,
+                 idle_timeout=15, backlog=2048):
+        self.root = os.path.realpath(root)
+        self.host = host
+        self.port = port
+        self.max_age = max_age
+        self.immutable_max_age = immutable_max_age
+        self.idle_timeout = idle_timeout
+        self.backlog = backlog
+        # path -> (mtime_ns, size, etag); hashed once per version of a file
+        self.etags = {}
+        self.date = (0, "")
+        self.server = None
+        self.connections = set()
+        self.requests_served = 0
+        self.not_modified = 0
+        self.partial = 0
+        self.bytes_sent = 0
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port, backlog=self.backlog)
+        # Port 0: the one picked by the system
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            # Idle keep-alive connections would otherwise outlive the server
+            for task in self.connections:
+                task.cancel()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+            await self.server.wait_closed()
+            self.server = None
+
+    def http_date(self):
+        """Date header value, formatted once per second"""
+        now = int(time.time())
+        if self.date[0] != now:
+            self.date = (now, formatdate(now, usegmt=True))
+        return self.date[1]
+
+    def resolve(self, url_path):
+        """(file, redirect) for a URL path: index.html for directories, None when outside the root or missing"""
+        segments = [segment for segment in url_path.split("/") if segment not in ("", ".")]
+        if any(segment == ".." or "\0" in segment or os.sep in segment for segment in segments):
+            return None, None
+        path = os.path.realpath(os.path.join(self.root, *segments))
+        if path != self.root and not path.startswith(self.root + os.sep):
+            return None, None
+        if os.path.isdir(path):
+            if not url_path.endswith("/"):
+                return None, url_path + "/"
+            path = os.path.join(path, "index.html")
+        return (path, None) if os.path.isfile(path) else (None, None)
+
+    def cache_control(self, url_path, path):
+        # Pages name the other files: always revalidated
+        if path.endswith(".html"):
+            return "no-cache"
+        if HASHED_NAME.search(url_path):
+            return f"public, max-age={self.immutable_max_age}, immutable"
+        return f"public, max-age={self.max_age}"
+
+    async def etag(self, path, stat):
+        cached = self.etags.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        etag = await asyncio.get_running_loop().run_in_executor(None, content_etag, path)
+        self.etags[path] = (stat.st_mtime_ns, stat.st_size, etag)
+        return etag
+
+    def head(self, status, headers, keep_alive):
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}", f"Date: {self.http_date()}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    def error(self, writer, status, keep_alive, headers=None):
+        body = f"{status.value} {status.phrase}\n".encode()
+        headers = dict(headers or {}, **{"Content-Type": "text/plain; charset=utf-8", "Content-Length": len(body)})
+        writer.write(self.head(status, headers, keep_alive) + body)
+
+    async def respond(self, writer, method, target, headers, keep_alive):
+        """Write the answer to one request"""
+        if method not in ("GET", "HEAD"):
+            self.error(writer, HTTPStatus.METHOD_NOT_ALLOWED, keep_alive, {"Allow": "GET, HEAD"})
+            return
+        url_path = unquote(urlsplit(target).path)
+        path, redirect = self.resolve(url_path)
+        if redirect:
+            self.error(writer, HTTPStatus.MOVED_PERMANENTLY, keep_alive, {"Location": quote(redirect)})
+            return
+        if path is None:
+            self.error(writer, HTTPStatus.NOT_FOUND, keep_alive)
+            return
+
+        # Ranges are served from the file itself, never from a compressed variant
+        ranged = "range" in headers and method == "GET"
+        available = {suffix for _, suffix in ENCODINGS if os.path.isfile(path + suffix)}
+        encoding, suffix = (None, "") if ranged else choose_encoding(headers.get("accept-encoding"), available)
+        try:
+            f = open(path + suffix, "rb")
+        except OSError:
+            self.error(writer, HTTPStatus.NOT_FOUND, keep_alive)
+            return
+        with f:
+            stat = os.fstat(f.fileno())
+            etag = await self.etag(path + suffix, stat)
+            content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            if content_type.startswith(TEXT_TYPES):
+                content_type += "; charset=utf-8"
+            response_headers = {
+                "Content-Type": content_type,
+                "ETag": etag,
+                "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+                "Cache-Control": self.cache_control(url_path, path),
+                "Accept-Ranges": "bytes"
+            }
+            if available:
+                response_headers["Vary"] = "Accept-Encoding"
+
+            if "if-none-match" in headers:
+                not_modified = etag_matches(headers["if-none-match"], etag)
+            else:
+                not_modified = self.unmodified_since(headers.get("if-modified-since"), stat.st_mtime)
+            if not_modified:
+                self.not_modified += 1
+                writer.write(self.head(HTTPStatus.NOT_MODIFIED, response_headers, keep_alive))
+                return
+
+            status, start, end = HTTPStatus.OK, 0, stat.st_size
+            # If-Range: the range only applies to the version the client holds
+            if ranged and headers.get("if-range", etag) == etag:
+                try:
+                    requested = byte_range(headers["range"], stat.st_size)
+                except RangeNotSatisfiable:
+                    self.error(writer, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, keep_alive,
+                               {"Content-Range": f"bytes */{stat.st_size}"})
+                    return
+                if requested:
+                    status, (start, end) = HTTPStatus.PARTIAL_CONTENT, requested
+                    response_headers["Content-Range"] = f"bytes {start}-{end - 1}/{stat.st_size}"
+                    self.partial += 1
+            if encoding:
+                response_headers["Content-Encoding"] = encoding
+            response_headers["Content-Length"] = end - start
+            head = self.head(status, response_headers, keep_alive)
+
+            if method == "HEAD":
+                writer.write(head)
+                return
+            if end - start < SENDFILE_MIN_BYTES:
+                f.seek(start)
+                writer.write(head + f.read(end - start))
+            else:
+                writer.write(head)
+                await writer.drain()
+                await asyncio.get_running_loop().sendfile(writer.transport, f, start, end - start)
+            self.bytes_sent += end - start
+
+    @staticmethod
+    def unmodified_since(header, mtime):
+        if not header:
+            return False
+        try:
+            return int(mtime) <= parsedate_to_datetime(header).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    async def read_head(self, reader):
+        """(request line, headers) of the next request; (b"", None) at end of stream
+
+        headers is None when there are more than MAX_HEADERS.
+        """
+        while True:
+            request_line = await reader.readline()
+            if not request_line or request_line.strip():
+                break
+        if not request_line:
+            return b"", None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return request_line, headers
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+            if len(headers) > MAX_HEADERS:
+                return request_line, None
+
+    async def handle_connection(self, reader, writer):
+        """HTTP/1.1 with keep-alive; idle connections are closed after idle_timeout"""
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                # The whole head, not only the request line: a client that
+                # stops halfway through its headers is dropped as well
+                try:
+                    request_line, headers = await asyncio.wait_for(self.read_head(reader), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+                    self.error(writer, HTTPStatus.BAD_REQUEST, False)
+                    break
+                if headers is None:
+                    self.error(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, False)
+                    break
+                method, target, version = parts
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+                # A body left unread would be parsed as the next request
+                length = headers.get("content-length", "0")
+                if not length.isdigit():
+                    self.error(writer, HTTPStatus.BAD_REQUEST, False)
+                    break
+                if "transfer-encoding" in headers or int(length) > MAX_DRAINED_BODY:
+                    keep_alive = False
+                elif int(length):
+                    try:
+                        await asyncio.wait_for(reader.readexactly(int(length)), self.idle_timeout)
+                    except asyncio.TimeoutError:
+                        break
+
+                await self.respond(writer, method, target, headers, keep_alive)
+                self.requests_served += 1
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self.connections.discard(task)
+            writer.close()
+
+
+async def serve(args):
+    server = await StaticServer(args.root, args.host, args.port, args.max_age, args.immutable_max_age,
+                                args.idle_timeout).start()
+    print(f"Serving {server.root} on {server.url}")
+    async with server.server:
+        await server.server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the static build or an exported site")
+    parser.add_argument("--root", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "dist"))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-age", type=int, default=3600, help="Cache lifetime of non-HTML files, in seconds")
+    parser.add_argument("--immutable-max-age", type=int, default=IMMUTABLE_MAX_AGE,
+                        help="Cache lifetime of files with a content hash in their path, in seconds")
+    parser.add_argument("--idle-timeout", type=float, default=15, help="Seconds an idle keep-alive connection is kept")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Shared Playwright harness for the IA WebGen Pro UI suites
+One Chromium process, a bounded pool of isolated browser contexts and a cached
+"preview-ready" snapshot so the form-to-preview flow only runs once per pool
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import statistics
+import time
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+BASE_URL = "http://localhost:8000"
+VIEWPORT = {"width": 1920, "height": 1080}
+CONDITION_TIMEOUT = 10000
+
+# Counts showNotification() calls so a step can wait for "the app reported
+# something" instead of sleeping through its synchronous handlers
+COUNT_NOTIFICATIONS = """
+window.__notificationCount = 0;
+document.addEventListener('DOMContentLoaded', () => {
+    const showNotification = window.showNotification;
+    if (!showNotification) return;
+    window.showNotification = function() {
+        window.__notificationCount++;
+        return showNotification.apply(this, arguments);
+    };
+});
+"""
+
+# Everything the app needs to be back in preview mode: its globals, the form
+# fields, which section is visible and the current preview DOM. Photo File
+# objects cannot be serialized, only their name and dataURL or uploaded
+# variant URLs are kept.
+CAPTURE_PREVIEW_STATE = """() => {
+    const photo = ({ file, ...rest }) => rest;
+    const form = {};
+    document.querySelectorAll('#websiteForm input, #websiteForm select, #websiteForm textarea').forEach(el => {
+        if (!el.id || el.type === 'file') return;
+        form[el.id] = el.type === 'checkbox' ? el.checked : el.value;
+    });
+    const sections = {};
+    ['mainSection', 'qualityTemplates', 'previewSection', 'emailSection'].forEach(id => {
+        sections[id] = document.getElementById(id).style.display;
+    });
+    return {
+        websiteData: { ...websiteData, photos: (websiteData.photos || []).map(photo) },
+        uploadedPhotos: uploadedPhotos.map(photo),
+        generatedPages,
+        selectedTemplate,
+        currentPage,
+        form,
+        sections,
+        preview: document.getElementById('websitePreview').innerHTML
+    };
+}"""
+
+RESTORE_PREVIEW_STATE = """async (state) => {
+    Object.entries(state.form).forEach(([id, value]) => {
+        const el = document.getElementById(id);
+        if (!el) return;
+        if (el.type === 'checkbox') el.checked = value; else el.value = value;
+    });
+    uploadedPhotos = state.uploadedPhotos;
+    websiteData = { ...state.websiteData, photos: uploadedPhotos };
+
+    await displayTemplates();
+    selectedTemplate = state.selectedTemplate;
+    const card = document.querySelectorAll('.template-card')[selectedTemplate];
+    if (card) card.classList.add('selected');
+    document.getElementById('continueBtn').disabled = false;
+
+    generatedPages = state.generatedPages;
+    Object.entries(state.sections).forEach(([id, display]) => {
+        document.getElementById(id).style.display = display;
+    });
+    initializeCompletePreview();
+    showPage(state.currentPage);
+    document.getElementById('websitePreview').innerHTML = state.preview;
+}"""
+
+
+class BrowserPool:
+    """One Chromium process handing out isolated browser contexts"""
+
+    def __init__(self, max_contexts=4, headless=True, log_console=True):
+        self.max_contexts = max_contexts
+        self.headless = headless
+        self.log_console = log_console
+        self.browser = None
+        self._playwright = None
+        self._slots = None
+        self._snapshots = {}
+        self._snapshot_lock = None
+
+    async def start(self):
+        """Launch the shared browser (no-op if already running)"""
+        if self.browser:
+            return self
+        self._playwright = await async_playwright().start()
+        self.browser = await self._playwright.chromium.launch(headless=self.headless)
+        self._slots = asyncio.Semaphore(self.max_contexts)
+        self._snapshot_lock = asyncio.Lock()
+        return self
+
+    async def stop(self):
+        """Close the shared browser"""
+        if self.browser:
+            await self.browser.close()
+            self.browser = None
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+        self._snapshots = {}
+
+    async def new_page(self):
+        """Open a page in a fresh browser context, waiting for a free slot"""
+        await self._slots.acquire()
+        try:
+            context = await self.browser.new_context(viewport=VIEWPORT)
+            await context.add_init_script(COUNT_NOTIFICATIONS)
+            page = await context.new_page()
+        except Exception:
+            self._slots.release()
+            raise
+        if self.log_console:
+            page.on("console", lambda msg: print(f"CONSOLE: {msg.text}"))
+        return page
+
+    async def close_page(self, page):
+        """Close a page together with its context and free its slot"""
+        try:
+            await page.context.close()
+        finally:
+            self._slots.release()
+
+    @contextlib.asynccontextmanager
+    async def page(self):
+        """Async context manager around new_page/close_page"""
+        page = await self.new_page()
+        try:
+            yield page
+        finally:
+            await self.close_page(page)
+
+    async def preview_page(self, flow, key="default"):
+        """Return a fresh page already in preview mode
+
+        `flow(page)` drives the real form-to-preview steps. It only runs the
+        first time a given key is requested; later pages get the captured
+        state restored without repeating the UI steps.
+        """
+        page = await self.new_page()
+        try:
+            async with self._snapshot_lock:
+                if key not in self._snapshots:
+                    await flow(page)
+                    self._snapshots[key] = await page.evaluate(CAPTURE_PREVIEW_STATE)
+                    return page
+            await page.goto(BASE_URL, wait_until='domcontentloaded', timeout=10000)
+            await page.evaluate(RESTORE_PREVIEW_STATE, self._snapshots[key])
+        except Exception:
+            await self.close_page(page)
+            raise
+        return page
+
+
+async def run_chains(pool, make_tester, chains, concurrency=4):
+    """Run test chains concurrently, each chain on its own isolated page
+
+    A chain is a list of (name, method name) pairs sharing one page and run
+    in order, for tests that depend on the state left by earlier ones. A
+    chain may start with the name of a setup method (a str), run on the
+    chain's page first and not counted as a test. When a test (or the setup)
+    fails the rest of its chain is skipped and counted as failed.
+    `make_tester()` must return a fresh tester bound to `pool`; at most
+    `concurrency` chains (and never more than the pool's contexts) run at
+    once. Returns a list of (name, passed) in declaration order.
+    """
+    limit = asyncio.Semaphore(concurrency)
+
+    async def run_chain(chain):
+        results = []
+        async with limit:
+            tester = make_tester()
+            tester.page = await pool.new_page()
+            try:
+                if chain and isinstance(chain[0], str):
+                    setup, chain = chain[0], chain[1:]
+                    try:
+                        await getattr(tester, setup)()
+                    except Exception as e:
+                        print(f"❌ Setup {setup} failed - Error: {str(e)}")
+                        for skipped, _ in chain:
+                            print(f"⏭️ Skipped {skipped} (depends on {setup})")
+                            results.append((skipped, False))
+                        return results
+                for index, (name, method) in enumerate(chain):
+                    passed = await tester.run_test(name, getattr(tester, method))
+                    results.append((name, passed))
+                    if not passed:
+                        for skipped, _ in chain[index + 1:]:
+                            print(f"⏭️ Skipped {skipped} (depends on {name})")
+                            results.append((skipped, False))
+                        break
+            finally:
+                if tester.page:
+                    await pool.close_page(tester.page)
+                    tester.page = None
+        return results
+
+    chain_results = await asyncio.gather(*(run_chain(chain) for chain in chains))
+
+    print("\n📋 Concurrent run results:")
+    results = []
+    for chain_result in chain_results:
+        for name, passed in chain_result:
+            print(f"  {'✅' if passed else '❌'} {name}")
+            results.append((name, passed))
+    return results
+
+
+def parse_options(argv=None):
+    """Read the shared suite options from the command line"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="run independent test chains on up to N pages at once")
+    parser.add_argument("--timing-report", default=None,
+                        help="write the per-step UI latency dataset to this JSON file")
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+class StepTimer:
+    """Times UI transitions against the fixed sleep each one used to cost"""
+
+    def __init__(self):
+        self.steps = []
+
+    async def wait(self, name, budget_ms, condition, required=True):
+        """Await `condition` and record its latency next to `budget_ms`
+
+        With required=False a timeout is recorded and returns False instead
+        of raising, for transitions the suites only report on.
+        """
+        start = time.perf_counter()
+        reached = True
+        try:
+            await condition
+        except PlaywrightTimeoutError:
+            reached = False
+            if required:
+                raise
+        finally:
+            self.steps.append({
+                "step": name,
+                "actual_ms": round((time.perf_counter() - start) * 1000, 1),
+                "budget_ms": budget_ms,
+                "reached": reached
+            })
+        return reached
+
+    def report(self, path=None):
+        """Print per-step latencies and the time saved, optionally save them as JSON"""
+        if not self.steps:
+            return
+        
+        by_step = {}
+        for step in self.steps:
+            by_step.setdefault(step["step"], []).append(step)
+        
+        print("\n⏱️ UI transition latency (actual vs old fixed wait):")
+        for name, runs in by_step.items():
+            actual = [run["actual_ms"] for run in runs]
+            timeouts = sum(1 for run in runs if not run["reached"])
+            print(f"  {name:<30} x{len(runs):<3} median {statistics.median(actual):8.1f} ms"
+                  f"  max {max(actual):8.1f} ms  budget {runs[0]['budget_ms']:5d} ms"
+                  + (f"  ⚠️ {timeouts} timeout(s)" if timeouts else ""))
+        
+        total_actual = sum(step["actual_ms"] for step in self.steps) / 1000
+        total_budget = sum(step["budget_ms"] for step in self.steps) / 1000
+        print(f"  Total: {total_actual:.2f}s waiting vs {total_budget:.2f}s of fixed sleeps"
+              f" ({total_budget - total_actual:+.2f}s saved)")
+        
+        if path:
+            with open(path, "w") as f:
+                json.dump({"steps": self.steps}, f, indent=2)
+            print(f"  Latency dataset written to {path}")
+
+
+async def count_elements(page, selector):
+    """Number of elements currently matching `selector`"""
+    return await page.evaluate("selector => document.querySelectorAll(selector).length", selector)
+
+
+async def notification_count(page):
+    """Number of showNotification() calls so far on this page"""
+    return await page.evaluate("window.__notificationCount || 0")
+
+
+def wait_for_count_above(page, selector, count, timeout=CONDITION_TIMEOUT):
+    """Wait until more than `count` elements match `selector` (e.g. a new .message.bot)"""
+    return page.wait_for_function(
+        "([selector, count]) => document.querySelectorAll(selector).length > count",
+        arg=[selector, count], timeout=timeout
+    )
+
+
+def wait_for_class(page, target, class_name, present=True, timeout=CONDITION_TIMEOUT):
+    """Wait until `target` (selector or element handle) gains or loses `class_name`"""
+    return page.wait_for_function(
+        """([target, className, present]) => {
+            const el = typeof target === 'string' ? document.querySelector(target) : target;
+            return !!el && el.classList.contains(className) === present;
+        }""",
+        arg=[target, class_name, present], timeout=timeout
+    )
+
+
+def wait_for_display(page, selector, visible=True, timeout=CONDITION_TIMEOUT):
+    """Wait until `selector` is shown or hidden (computed display)"""
+    return page.wait_for_function(
+        """([selector, visible]) => {
+            const el = document.querySelector(selector);
+            return !!el && (getComputedStyle(el).display !== 'none') === visible;
+        }""",
+        arg=[selector, visible], timeout=timeout
+    )
+
+
+def wait_for_notification(page, count, timeout=CONDITION_TIMEOUT):
+    """Wait for a showNotification() call beyond the first `count`"""
+    return page.wait_for_function("count => window.__notificationCount > count", arg=count, timeout=timeout)